@@ -1,8 +1,8 @@
 # account/filters.py
 
 import django_filters
-from django.db import models
 from .models import CustomUser
+from search.index import search_queryset, search_scope
 
 
 class TeacherFilter(django_filters.FilterSet):
@@ -61,20 +61,8 @@ class TeacherFilter(django_filters.FilterSet):
         return queryset
     
     def filter_by_full_name(self, queryset, name, value):
-        """フルネーム（姓名）で検索"""
+        """フルネーム（姓名）で検索（検索インデックスの氏名を対象。姓名の順序・表記揺れを問わない、ユーザー名は対象外）"""
         if value:
-            # スペースで分割して姓名を検索
-            names = value.split()
-            if len(names) == 1:
-                # 1つの単語の場合、姓または名のどちらかに一致
-                return queryset.filter(
-                    models.Q(first_name__icontains=names[0]) |
-                    models.Q(last_name__icontains=names[0])
-                )
-            elif len(names) >= 2:
-                # 2つ以上の単語の場合、姓と名の組み合わせで検索
-                return queryset.filter(
-                    models.Q(first_name__icontains=names[0], last_name__icontains=names[1]) |
-                    models.Q(first_name__icontains=names[1], last_name__icontains=names[0])
-                )
-        return queryset
\ No newline at end of file
+            scope = search_scope(self.request.user) if self.request else None
+            return search_queryset(queryset, 'user', value, field='name', school_ids=scope, rank=False)
+        return queryset
@@ -0,0 +1,290 @@
+# account/management/commands/seed_scale.py
+
+import random
+import time
+from datetime import date, time as dt_time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from account.models import CustomUser, OwnerProfile, TeacherProfile
+from config.models import Place, Day
+from school.models import School
+from shift.models import FixedShift, Shift
+from shift.slots import rebuild_time_slots
+from shift.intervals import interval_index
+from search.index import index_objects
+
+
+DAY_NAMES = ['月曜日', '火曜日', '水曜日', '木曜日', '金曜日', '土曜日', '日曜日']
+PLACE_NAMES = ['スタジオ', 'プール', 'ジム', 'フロント', 'ガード', 'ガイダンス', '内務']
+LAST_NAMES = ['佐藤', '鈴木', '高橋', '田中', '伊藤', '渡辺', '山本', '中村', '小林', '加藤']
+FIRST_NAMES = ['太郎', '花子', '次郎', '美咲', '翔太', '陽菜', '大輝', '結衣', '蓮', '葵']
+DESCRIPTIONS = ['ヨガ', 'ピラティス', '水泳', '筋トレ指導', '受付', '監視', 'ストレッチ', None]
+
+SHIFT_COLUMNS = ['id', 'date', 'start_time', 'end_time', 'duration_minutes', 'place_id', 'is_empty', 'updated_at']
+SHIFT_TEACHER_COLUMNS = ['id', 'shift_id', 'customuser_id']
+
+
+class Command(BaseCommand):
+    help = 'Generate a large deterministic dataset for load testing (bulk_create in chunks)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schools', type=int, default=10, help='Number of schools')
+        parser.add_argument('--teachers-per-school', type=int, default=50, help='Teachers per school')
+        parser.add_argument('--places', type=int, default=10, help='Places per school')
+        parser.add_argument('--days', type=int, default=7, choices=range(1, 8), metavar='1-7', help='Days per school')
+        parser.add_argument('--fixed-shifts-per-place', type=int, default=40, help='Fixed shifts per place per week')
+        parser.add_argument('--weeks', type=int, default=4, help='Weeks of dated Shift rows generated from the fixed shifts')
+        parser.add_argument('--start-date', type=date.fromisoformat, default=None, help='First Monday of dated shifts (YYYY-MM-DD)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (same seed gives the same data)')
+        parser.add_argument('--prefix', default='scale', help='Prefix for generated usernames and school names')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk_create batch')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.prefix = f"{options['prefix']}{options['seed']}"
+        self.counts = {}
+
+        if School.objects.filter(name__startswith=f'{self.prefix}-').exists():
+            raise CommandError(
+                f'Data with prefix "{self.prefix}" already exists. Use another --prefix or --seed.'
+            )
+
+        start_date = options['start_date'] or date(2025, 4, 7)
+        start_date -= timedelta(days=start_date.weekday())
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            schools = self.create_schools(options['schools'])
+            places, days = self.create_places_and_days(schools, options['places'], options['days'])
+            self.create_users(schools, places, options['teachers_per_school'])
+            fixed_shifts = self.create_fixed_shifts(
+                schools, places, days, options['fixed_shifts_per_place']
+            )
+            self.create_shifts(fixed_shifts, options['weeks'], start_date)
+            # bulk_create はシグナルを通らないため時間スロットカタログ・検索インデックス・講師の時間帯インデックスを作り直す
+            rebuild_time_slots([school.id for school in schools])
+            index_objects('user', CustomUser.objects.filter(schools__in=schools).values_list('id', flat=True))
+            index_objects('fixed_shift', [shift.id for shift in fixed_shifts])
+            interval_index.invalidate_all()
+        elapsed = time.perf_counter() - started
+
+        total = 0
+        for label, count in self.counts.items():
+            total += count
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} rows/s)'
+        ))
+
+    def bulk_create(self, model, objects):
+        """チャンク単位で一括作成し件数を記録"""
+        created = []
+        for i in range(0, len(objects), self.chunk_size):
+            created.extend(model.objects.bulk_create(objects[i:i + self.chunk_size]))
+        table = model._meta.db_table
+        self.counts[table] = self.counts.get(table, 0) + len(objects)
+        return created
+
+    def create_schools(self, count):
+        return self.bulk_create(School, [
+            School(
+                name=f'{self.prefix}-school-{i}',
+                start_time=dt_time(self.rng.choice((6, 7, 8)), 0),
+                end_time=dt_time(self.rng.choice((21, 22, 23)), 0),
+            )
+            for i in range(count)
+        ])
+
+    def create_places_and_days(self, schools, place_count, day_count):
+        places = self.bulk_create(Place, [
+            Place(name=f'{PLACE_NAMES[i % len(PLACE_NAMES)]}{i // len(PLACE_NAMES) + 1}', school=school)
+            for school in schools
+            for i in range(place_count)
+        ])
+        days = self.bulk_create(Day, [
+            Day(order=i, name=DAY_NAMES[i], school=school)
+            for school in schools
+            for i in range(day_count)
+        ])
+
+        places_by_school = {}
+        for place in places:
+            places_by_school.setdefault(place.school_id, []).append(place)
+        days_by_school = {}
+        for day in days:
+            days_by_school.setdefault(day.school_id, []).append(day)
+        return places_by_school, days_by_school
+
+    def create_users(self, schools, places, teachers_per_school):
+        """オーナー（各校1人）と講師を作成し、所属学校・指導可能場所を割り当て"""
+        # パスワードハッシュは全ユーザーで共通（ハッシュ計算が支配的になるのを避ける）
+        password = make_password('password123')
+        users = []
+        for school_index, school in enumerate(schools):
+            users.append(self.build_user(f'{self.prefix}-s{school_index}-owner', password, school, is_owner=True))
+            for i in range(teachers_per_school):
+                users.append(self.build_user(f'{self.prefix}-s{school_index}-t{i}', password, school, is_teacher=True))
+        users = self.bulk_create(CustomUser, users)
+
+        self.bulk_create(OwnerProfile, [OwnerProfile(user=user) for user in users if user.is_owner])
+        self.bulk_create(TeacherProfile, [TeacherProfile(user=user) for user in users if user.is_teacher])
+
+        school_through = CustomUser.schools.through
+        place_through = CustomUser.place.through
+        school_links = []
+        place_links = []
+        school_ids = [school.id for school in schools]
+
+        for user in users:
+            school_links.append(school_through(customuser_id=user.id, school_id=user.current_school_id))
+            if not user.is_teacher:
+                continue
+
+            # 1割の講師は隣の学校でも勤務する（複数校勤務）
+            if len(school_ids) > 1 and self.rng.random() < 0.1:
+                other_id = school_ids[(school_ids.index(user.current_school_id) + 1) % len(school_ids)]
+                school_links.append(school_through(customuser_id=user.id, school_id=other_id))
+
+            # 指導可能場所は所属学校の場所から2〜4か所
+            school_places = places[user.current_school_id]
+            for place in self.rng.sample(school_places, min(len(school_places), self.rng.randint(2, 4))):
+                place_links.append(place_through(customuser_id=user.id, place_id=place.id))
+
+        self.bulk_create(school_through, school_links)
+        self.bulk_create(place_through, place_links)
+
+        eligible = {}
+        for link in place_links:
+            eligible.setdefault(link.place_id, []).append(link.customuser_id)
+        self.eligible_by_place = eligible
+        self.owner_by_school = {user.current_school_id: user.id for user in users if user.is_owner}
+
+    def build_user(self, username, password, school, is_owner=False, is_teacher=False):
+        return CustomUser(
+            username=username,
+            email=f'{username}@example.com',
+            password=password,
+            first_name=self.rng.choice(FIRST_NAMES),
+            last_name=self.rng.choice(LAST_NAMES),
+            is_owner=is_owner,
+            is_teacher=is_teacher,
+            current_school=school,
+        )
+
+    def create_fixed_shifts(self, schools, places, days, per_place):
+        """開校時間内に重なりを含む固定シフトを作成し、指導可能な講師を割り当て"""
+        shifts = []
+        for school in schools:
+            open_minutes = school.start_time.hour * 60
+            close_minutes = school.end_time.hour * 60
+            school_days = days[school.id]
+            for place in places[school.id]:
+                for _ in range(per_place):
+                    length = self.rng.choice((45, 60, 60, 90, 120))
+                    start = self.rng.randrange(open_minutes, close_minutes - length, 15)
+                    end = start + length
+                    shifts.append(FixedShift(
+                        day=self.rng.choice(school_days),
+                        place=place,
+                        start_time=dt_time(start // 60, start % 60),
+                        end_time=dt_time(end // 60, end % 60),
+                        duration_minutes=length,
+                        description=self.rng.choice(DESCRIPTIONS),
+                    ))
+        shifts = self.bulk_create(FixedShift, shifts)
+
+        through = FixedShift.teacher.through
+        links = []
+        self.teachers_by_fixed_shift = {}
+        for shift in shifts:
+            candidates = self.eligible_by_place.get(shift.place_id) or [self.owner_by_school[shift.place.school_id]]
+            # 約1割は未割当のまま残す
+            count = 0 if self.rng.random() < 0.1 else self.rng.choice((1, 1, 1, 2))
+            assigned = self.rng.sample(candidates, min(count, len(candidates)))
+            self.teachers_by_fixed_shift[shift.id] = assigned
+            links.extend(through(fixedshift_id=shift.id, customuser_id=teacher_id) for teacher_id in assigned)
+        self.bulk_create(through, links)
+        return shifts
+
+    def create_shifts(self, fixed_shifts, weeks, start_date):
+        """
+        固定シフトから日付付きシフトを週ごとに生成
+
+        件数が最も多いため、モデルインスタンスを作らずIDを採番して
+        executemany で直接挿入する。
+        """
+        ops = connection.ops
+        now = ops.adapt_datetimefield_value(timezone.now())
+        shift_table = Shift._meta.db_table
+        through = Shift.teacher.through
+        through_table = through._meta.db_table
+
+        next_shift_id = self.next_id(shift_table)
+        next_link_id = self.next_id(through_table)
+
+        # 時刻・日付のDB用変換は固定シフト・日付ごとに1回だけ行う
+        templates = [
+            (
+                fixed_shift.day.order,
+                ops.adapt_timefield_value(fixed_shift.start_time),
+                ops.adapt_timefield_value(fixed_shift.end_time),
+                fixed_shift.duration_minutes,
+                fixed_shift.place_id,
+                self.teachers_by_fixed_shift[fixed_shift.id],
+            )
+            for fixed_shift in fixed_shifts
+        ]
+
+        shift_rows = []
+        link_rows = []
+        for week in range(weeks):
+            week_start = start_date + timedelta(weeks=week)
+            dates = [ops.adapt_datefield_value(week_start + timedelta(days=i)) for i in range(7)]
+            for order, start_time, end_time, duration, place_id, teacher_ids in templates:
+                is_empty = self.rng.random() < 0.02
+                shift_rows.append((next_shift_id, dates[order], start_time, end_time, duration, place_id, is_empty, now))
+                if not is_empty:
+                    for teacher_id in teacher_ids:
+                        link_rows.append((next_link_id, next_shift_id, teacher_id))
+                        next_link_id += 1
+                next_shift_id += 1
+
+                if len(shift_rows) >= self.chunk_size:
+                    self.insert_rows(shift_table, SHIFT_COLUMNS, shift_rows)
+                    self.insert_rows(through_table, SHIFT_TEACHER_COLUMNS, link_rows)
+
+        self.insert_rows(shift_table, SHIFT_COLUMNS, shift_rows)
+        self.insert_rows(through_table, SHIFT_TEACHER_COLUMNS, link_rows)
+
+        # 明示的にIDを指定したのでシーケンスを合わせる（PostgreSQLなど）
+        sequence_sql = ops.sequence_reset_sql(no_style(), [Shift, through])
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+
+    def next_id(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT MAX(id) FROM {connection.ops.quote_name(table)}')
+            return (cursor.fetchone()[0] or 0) + 1
+
+    def insert_rows(self, table, columns, rows):
+        """行タプルを executemany で挿入し、リストを空にする"""
+        if not rows:
+            return
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(table),
+            ', '.join(quote(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        self.counts[table] = self.counts.get(table, 0) + len(rows)
+        rows.clear()
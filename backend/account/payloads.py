@@ -0,0 +1,141 @@
+# account/payloads.py
+
+"""
+講師データの読み取り専用高速シリアライズ
+
+ModelSerializerを経由せず、values_list() のタプルから直接レスポンスを組み立てる。
+出力は TeacherProfileSerializer / TeacherListSerializer と同じ形式。
+fieldset（?fields= / ?expand=）を渡すと出力しないフィールドの取得を省略する。
+"""
+
+from rest_framework import serializers
+
+from fieldsets import includes, prune_rows
+from school.models import School
+from config.models import Place
+from .models import CustomUser, TeacherProfile
+from .serializers import TEACHER_EXPANDABLE_FIELDS
+
+
+_datetime_field = serializers.DateTimeField()
+
+
+def full_name(username, first_name, last_name):
+    """フルネームを取得（姓名が揃っていない場合はユーザー名）"""
+    if last_name and first_name:
+        return f"{last_name} {first_name}"
+    return username
+
+
+def teacher_profile_map(user_ids):
+    """講師の基本情報（TeacherProfileSerializer相当）をIDごとに取得"""
+    rows = CustomUser.objects.filter(id__in=user_ids).values_list(
+        'id', 'username', 'first_name', 'last_name', 'email'
+    )
+    return {
+        user_id: {
+            'id': user_id,
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+            'full_name': full_name(username, first_name, last_name),
+            'email': email,
+        }
+        for user_id, username, first_name, last_name, email in rows
+    }
+
+
+def teacher_list_rows(user_ids, fieldset=None):
+    """講師一覧（TeacherListSerializer相当）を指定IDの順で組み立て"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+
+    def wanted(*names):
+        return any(includes(fieldset, name, name in TEACHER_EXPANDABLE_FIELDS) for name in names)
+
+    users = {
+        row[0]: row for row in CustomUser.objects.filter(id__in=user_ids).values_list(
+            'id', 'username', 'email', 'first_name', 'last_name', 'is_active',
+            'is_teacher', 'current_school_id', 'current_school__name', 'date_joined'
+        )
+    }
+
+    schools_by_user = {}
+    school_ids = set()
+    if wanted('schools', 'schools_info'):
+        for user_id, school_id in CustomUser.schools.through.objects.filter(
+            customuser_id__in=user_ids
+        ).values_list('customuser_id', 'school_id').order_by('id'):
+            schools_by_user.setdefault(user_id, []).append(school_id)
+            school_ids.add(school_id)
+    school_names = {}
+    if wanted('schools_info'):
+        school_names = dict(School.objects.filter(id__in=school_ids).values_list('id', 'name'))
+
+    places_by_user = {}
+    place_ids = set()
+    if wanted('place', 'place_info'):
+        for user_id, place_id in CustomUser.place.through.objects.filter(
+            customuser_id__in=user_ids
+        ).values_list('customuser_id', 'place_id').order_by('id'):
+            places_by_user.setdefault(user_id, []).append(place_id)
+            place_ids.add(place_id)
+    places = {}
+    if wanted('place_info'):
+        places = {
+            place_id: {'id': place_id, 'name': name, 'school': school_id}
+            for place_id, name, school_id in Place.objects.filter(
+                id__in=place_ids
+            ).values_list('id', 'name', 'school_id')
+        }
+
+    profiles = {}
+    if wanted('teacher_profile'):
+        profiles = dict(
+            TeacherProfile.objects.filter(user_id__in=user_ids).values_list('user_id', 'id')
+        )
+
+    results = []
+    for user_id in user_ids:
+        row = users.get(user_id)
+        if row is None:
+            continue
+        (_, username, email, first_name, last_name, is_active,
+         is_teacher, current_school_id, current_school_name, date_joined) = row
+
+        user_school_ids = schools_by_user.get(user_id, [])
+        user_place_ids = places_by_user.get(user_id, [])
+        profile_id = profiles.get(user_id)
+
+        data = {
+            'id': user_id,
+            'username': username,
+            'email': email,
+            'first_name': first_name,
+            'last_name': last_name,
+            'full_name': full_name(username, first_name, last_name),
+            'is_active': is_active,
+            'is_teacher': is_teacher,
+            'current_school': current_school_id,
+        }
+        # 所属学校がない場合はシリアライザーと同様にキー自体を省略
+        if current_school_id is not None:
+            data['current_school_name'] = current_school_name
+        data.update({
+            'schools': user_school_ids,
+            'schools_info': [
+                {'id': school_id, 'name': school_names[school_id]}
+                for school_id in user_school_ids if school_id in school_names
+            ],
+            'place': user_place_ids,
+            'place_info': [places[place_id] for place_id in user_place_ids if place_id in places],
+            'teacher_profile': (
+                {'id': profile_id, 'created_at': profile_id}
+                if profile_id is not None else None
+            ),
+            'date_joined': _datetime_field.to_representation(date_joined),
+        })
+        results.append(data)
+
+    return prune_rows(results, fieldset, TEACHER_EXPANDABLE_FIELDS)
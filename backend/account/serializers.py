@@ -2,13 +2,15 @@
 
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+
+from fieldsets import SparseFieldsetMixin
 from .models import CustomUser, OwnerProfile, TeacherProfile
 from school.models import School
 from school.serializers import SchoolSerializer
 from config.serializers import PlaceSerializer
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """ユーザー情報のシリアライザー"""
     current_school_name = serializers.CharField(source='current_school.name', read_only=True)
     schools = serializers.PrimaryKeyRelatedField(many=True, queryset=School.objects.all(), required=False)
@@ -103,7 +105,7 @@ class OwnerProfileSerializer(serializers.ModelSerializer):
         fields = ['user']
 
 
-class TeacherProfileSerializer(serializers.ModelSerializer):
+class TeacherProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """講師の基本情報シリアライザー"""
     full_name = serializers.SerializerMethodField()
     
@@ -117,7 +119,21 @@ class TeacherProfileSerializer(serializers.ModelSerializer):
         return obj.username
 
 
-class TeacherListSerializer(serializers.ModelSerializer):
+# ?fields= / ?expand= で指定した場合のみ出力する講師一覧・詳細のフィールドと、フィールドごとの関連
+TEACHER_EXPANDABLE_FIELDS = ['schools_info', 'place_info', 'teacher_profile']
+TEACHER_SELECT_RELATED_FIELDS = {
+    'current_school_name': ['current_school'],
+    'teacher_profile': ['teacher_profile'],
+}
+TEACHER_PREFETCH_RELATED_FIELDS = {
+    'schools': ['schools'],
+    'schools_info': ['schools'],
+    'place': ['place'],
+    'place_info': ['place'],
+}
+
+
+class TeacherListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """講師一覧用のシリアライザー"""
     current_school_name = serializers.CharField(
         source='current_school.name', 
@@ -149,6 +165,9 @@ class TeacherListSerializer(serializers.ModelSerializer):
             'date_joined',
         ]
         read_only_fields = ['id', 'username', 'date_joined']
+        expandable = TEACHER_EXPANDABLE_FIELDS
+        select_related_fields = TEACHER_SELECT_RELATED_FIELDS
+        prefetch_related_fields = TEACHER_PREFETCH_RELATED_FIELDS
 
     def get_full_name(self, obj):
         """フルネームを取得"""
@@ -168,7 +187,7 @@ class TeacherListSerializer(serializers.ModelSerializer):
             return None
 
 
-class TeacherDetailSerializer(serializers.ModelSerializer):
+class TeacherDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """講師詳細用のシリアライザー"""
     current_school_name = serializers.CharField(
         source='current_school.name', 
@@ -201,6 +220,9 @@ class TeacherDetailSerializer(serializers.ModelSerializer):
             'date_joined',
         ]
         read_only_fields = ['id', 'username', 'is_teacher', 'date_joined']
+        expandable = TEACHER_EXPANDABLE_FIELDS
+        select_related_fields = TEACHER_SELECT_RELATED_FIELDS
+        prefetch_related_fields = TEACHER_PREFETCH_RELATED_FIELDS
 
     def get_full_name(self, obj):
         """フルネームを取得"""
@@ -1,3 +1,89 @@
 from django.test import TestCase
 
-# Create your tests here.
+from api.views import bootstrap_cache
+from config.models import Place
+from fieldsets import Fieldset
+from school.models import School
+
+from .models import CustomUser
+from .payloads import teacher_list_rows
+
+
+class TeacherBulkActionTests(TestCase):
+    url = '/api/account/teacher/bulk-action/'
+
+    def setUp(self):
+        self.school = School.objects.create(name='学校A')
+        self.other_school = School.objects.create(name='学校B')
+        self.owner = CustomUser.objects.create_user(
+            'owner', email='owner@example.com', password='pass', is_owner=True
+        )
+        self.owner.schools.add(self.school)
+        self.teacher = CustomUser.objects.create_user(
+            'teacher', email='teacher@example.com', password='pass', is_teacher=True
+        )
+        self.teacher.schools.add(self.school, self.other_school)
+        self.client.force_login(self.owner)
+
+    def test_deactivate_invalidates_member_schools(self):
+        versions = [bootstrap_cache.version(school.id) for school in (self.school, self.other_school)]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url, {'teacher_ids': [self.teacher.id], 'action': 'deactivate'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated_count'], 1)
+        for school, version in zip((self.school, self.other_school), versions):
+            self.assertNotEqual(bootstrap_cache.version(school.id), version)
+
+
+class TeacherListFieldsetTests(TestCase):
+    url = '/api/account/teacher/'
+
+    def setUp(self):
+        self.school = School.objects.create(name='学校A')
+        self.place = Place.objects.create(name='教室A', school=self.school)
+        self.owner = CustomUser.objects.create_user(
+            'owner', email='owner@example.com', password='pass', is_owner=True
+        )
+        self.owner.schools.add(self.school)
+        self.teachers = []
+        for index in range(3):
+            teacher = CustomUser.objects.create_user(
+                f'teacher{index}', email=f'teacher{index}@example.com', password='pass', is_teacher=True
+            )
+            teacher.schools.add(self.school)
+            teacher.place.add(self.place)
+            self.teachers.append(teacher)
+        self.client.force_login(self.owner)
+
+    def keys(self, query):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        return sorted(response.json()['results'][0])
+
+    def test_response_keys(self):
+        base = [
+            'current_school', 'date_joined', 'email', 'first_name', 'full_name', 'id',
+            'is_active', 'is_teacher', 'last_name', 'place', 'schools', 'username',
+        ]
+        self.assertEqual(self.keys(''), sorted(base + ['place_info', 'schools_info', 'teacher_profile']))
+        self.assertEqual(self.keys('?fields=id,full_name'), ['full_name', 'id'])
+        self.assertEqual(self.keys('?fields=id&expand=place_info'), ['id', 'place_info'])
+        self.assertEqual(self.keys('?expand=place_info'), sorted(base + ['place_info']))
+        # 空の expand は重いフィールドを全て省略する
+        self.assertEqual(self.keys('?expand='), base)
+
+    def test_unrequested_relations_are_not_queried(self):
+        user_ids = [teacher.id for teacher in self.teachers]
+        with self.assertNumQueries(6):
+            rows = teacher_list_rows(user_ids)
+        self.assertEqual(rows[0]['place_info'], [{'id': self.place.id, 'name': '教室A', 'school': self.school.id}])
+
+        with self.assertNumQueries(1):
+            rows = teacher_list_rows(user_ids, Fieldset(['id', 'full_name']))
+        self.assertEqual([sorted(row) for row in rows], [['full_name', 'id']] * 3)
+
+        with self.assertNumQueries(3):
+            teacher_list_rows(user_ids, Fieldset(expand=()))
@@ -11,6 +11,7 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from django.http import JsonResponse
 from django.utils import timezone
+from django.db import transaction
 from datetime import timedelta
 from django.middleware.csrf import get_token
 from django_filters.rest_framework import DjangoFilterBackend
@@ -22,8 +23,24 @@ from .serializers import (
     TeacherDetailSerializer, TeacherListSerializer,
     TeacherUpdateSerializer, AdminLoginSerializer
 )
+import caching
+from fieldsets import Fieldset, prune_queryset
 from permissions import IsOwnerOrAdmin
 from .filters import TeacherFilter
+from .payloads import teacher_list_rows
+from search.filters import FullTextSearchFilter
+from search.autocomplete import autocomplete as autocomplete_index
+from school.models import School
+
+
+# 一括操作: action -> 更新後の is_active（delete は論理削除）
+BULK_ACTIONS = {'activate': True, 'deactivate': False, 'delete': False}
+BULK_ACTION_LABELS = {'activate': '有効化', 'deactivate': '無効化', 'delete': '削除'}
+BULK_ACTION_FIELDS = ('current_school',)
+BULK_ACTION_CHUNK_SIZE = 500
+
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
 
 
 class OwnerLoginView(APIView):
@@ -189,9 +206,10 @@ class TeacherProfileView(RetrieveUpdateAPIView):
 
 class TeacherViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsOwnerOrAdmin]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     filterset_class = TeacherFilter
     search_fields = ['username', 'first_name', 'last_name', 'email']
+    search_kind = 'user'
     ordering_fields = ['date_joined', 'last_login', 'first_name', 'last_name', 'username']
     ordering = ['-date_joined']
     
@@ -218,6 +236,8 @@ class TeacherViewSet(viewsets.ModelViewSet):
             user_schools = self.request.user.schools.all()
             queryset = queryset.filter(schools__in=user_schools).distinct()
         
+        if self.action == 'retrieve':
+            queryset = prune_queryset(queryset, TeacherDetailSerializer, Fieldset.from_request(self.request))
         return queryset
     
     def list(self, request, *args, **kwargs):
@@ -235,9 +255,10 @@ class TeacherViewSet(viewsets.ModelViewSet):
         end = start + page_size
         
         total_count = queryset.count()
-        teachers = queryset[start:end]
+        teacher_ids = list(queryset.prefetch_related(None).values_list('id', flat=True)[start:end])
         
-        serializer = self.get_serializer(teachers, many=True)
+        # values_list() から直接組み立てる（TeacherListSerializer と同じ形式）
+        results = teacher_list_rows(teacher_ids, Fieldset.from_request(request))
         
         # ページネーション情報を計算
         total_pages = (total_count + page_size - 1) // page_size
@@ -245,7 +266,7 @@ class TeacherViewSet(viewsets.ModelViewSet):
         has_previous = page > 1
         
         return Response({
-            'results': serializer.data,
+            'results': results,
             'pagination': {
                 'count': total_count,
                 'total_pages': total_pages,
@@ -372,6 +393,163 @@ class TeacherViewSet(viewsets.ModelViewSet):
             }
         )
     
+    @action(detail=False, methods=['post'], url_path='bulk-action')
+    def bulk_action(self, request):
+        """
+        複数の講師を一括操作（activate / deactivate / delete）
+
+        delete は destroy と同じく論理削除。data で current_school も同時に変更できる。
+        講師IDは BULK_ACTION_CHUNK_SIZE 件ずつ、権限範囲の絞り込みと update() をまとめて実行する。
+        """
+        teacher_ids = request.data.get('teacher_ids')
+        bulk_action = request.data.get('action')
+        data = request.data.get('data') or {}
+
+        if not isinstance(teacher_ids, list) or not teacher_ids:
+            return Response(
+                {'error': '講師IDのリストが必要です。'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            teacher_ids = list(dict.fromkeys(int(teacher_id) for teacher_id in teacher_ids))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': '講師IDは整数で指定してください。'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if bulk_action not in BULK_ACTIONS:
+            return Response(
+                {'error': f"actionは{', '.join(BULK_ACTIONS)}のいずれかを指定してください。"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not isinstance(data, dict) or set(data) - set(BULK_ACTION_FIELDS):
+            return Response(
+                {'error': f"dataで指定できる項目は{', '.join(BULK_ACTION_FIELDS)}のみです。"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        restrict = request.user.is_owner and not request.user.is_superuser
+        user_school_ids = list(request.user.schools.values_list('id', flat=True)) if restrict else None
+
+        updates = {'is_active': BULK_ACTIONS[bulk_action]}
+        if 'current_school' in data:
+            current_school_id = data['current_school']
+            if current_school_id is not None:
+                try:
+                    current_school_id = int(current_school_id)
+                except (TypeError, ValueError):
+                    return Response(
+                        {'error': '学校IDは整数で指定してください。'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                if restrict and current_school_id not in user_school_ids:
+                    return Response(
+                        {'error': '指定された学校にアクセス権限がありません。'},
+                        status=status.HTTP_403_FORBIDDEN
+                    )
+                if not School.objects.filter(id=current_school_id).exists():
+                    return Response(
+                        {'error': '指定された学校が見つかりません。'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            updates['current_school_id'] = current_school_id
+
+        outcomes = {}
+        affected_school_ids = set()
+        with transaction.atomic():
+            for start in range(0, len(teacher_ids), BULK_ACTION_CHUNK_SIZE):
+                chunk = teacher_ids[start:start + BULK_ACTION_CHUNK_SIZE]
+
+                # 操作可能な講師と現在の値を1クエリで取得
+                teachers = CustomUser.objects.filter(id__in=chunk, is_teacher=True)
+                if restrict:
+                    teachers = teachers.filter(schools__id__in=user_school_ids)
+                current = {
+                    teacher_id: (is_active, school_id)
+                    for teacher_id, is_active, school_id in teachers.values_list(
+                        'id', 'is_active', 'current_school_id'
+                    ).distinct()
+                }
+
+                target = (updates['is_active'], updates.get('current_school_id'))
+                changed_ids = [
+                    teacher_id for teacher_id, (is_active, school_id) in current.items()
+                    if is_active != target[0] or ('current_school_id' in updates and school_id != target[1])
+                ]
+                if changed_ids:
+                    CustomUser.objects.filter(id__in=changed_ids).update(**updates)
+                    # update() はシグナルを通らないためオートコンプリートへ反映
+                    transaction.on_commit(lambda ids=changed_ids: autocomplete_index.refresh_users(ids))
+                    affected_school_ids.update(CustomUser.schools.through.objects.filter(
+                        customuser_id__in=changed_ids
+                    ).values_list('school_id', flat=True))
+
+                changed = set(changed_ids)
+                for teacher_id in chunk:
+                    if teacher_id not in current:
+                        outcomes[teacher_id] = 'not_found'
+                    elif teacher_id in changed:
+                        outcomes[teacher_id] = 'updated'
+                    else:
+                        outcomes[teacher_id] = 'unchanged'
+
+            # 所属学校のキャッシュ（ブートストラップの有効人数など）も update() では無効化されない
+            if affected_school_ids:
+                transaction.on_commit(lambda: caching.invalidate_school(*affected_school_ids))
+
+        updated_count = sum(1 for outcome in outcomes.values() if outcome == 'updated')
+        return Response({
+            'message': f'{updated_count}件の講師を{BULK_ACTION_LABELS[bulk_action]}しました。',
+            'updated_count': updated_count,
+            'unchanged_count': sum(1 for outcome in outcomes.values() if outcome == 'unchanged'),
+            'not_found_count': sum(1 for outcome in outcomes.values() if outcome == 'not_found'),
+            'results': [
+                {'teacher_id': teacher_id, 'status': outcome}
+                for teacher_id, outcome in outcomes.items()
+            ],
+        })
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        講師・オーナーのオートコンプリート（姓・名・姓名・ユーザー名の前方一致）
+
+        プロセス内のインデックスから返すため、入力ごとの呼び出しでもデータベースを検索しない。
+        place_id を指定した場合はその場所で指導可能な講師とオーナーのみ。
+        """
+        school_id = request.query_params.get('school_id')
+        query = request.query_params.get('q', '')
+        place_id = request.query_params.get('place_id')
+
+        if not school_id:
+            return Response(
+                {'error': '学校IDが必要です。'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            school_id = int(school_id)
+            place_id = int(place_id) if place_id else None
+            limit = min(int(request.query_params.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT)), AUTOCOMPLETE_MAX_LIMIT)
+        except ValueError:
+            return Response(
+                {'error': 'パラメータの形式が正しくありません。'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not request.user.is_superuser and not request.user.schools.filter(id=school_id).exists():
+            return Response(
+                {'error': 'この学校にアクセス権限がありません。'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        return Response({
+            'school_id': school_id,
+            'query': query,
+            'results': autocomplete_index.search(school_id, query, limit=limit, place_id=place_id),
+        })
+
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """講師統計情報を取得"""
@@ -0,0 +1,112 @@
+# api/batch.py
+
+"""
+バッチAPIのサブリクエストの実行
+
+サブリクエストは Django の URL リゾルバーで解決したビューを同じプロセス内で直接呼び出す。
+認証は外側のリクエストで済んでいるため、DRF のビューには同じユーザーを強制認証として渡す
+（CSRF の検証も外側のリクエストで行われている）。本文は JSON のみ対応する。
+非同期のビュー（SSE など）とストリーミングのレスポンス（CSV・ファイルのエクスポート）は
+サブリクエストのステータス 501 として返す。
+"""
+
+import json
+import logging
+from io import BytesIO
+
+from asgiref.sync import iscoroutinefunction
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+PATH_PREFIX = '/api/'
+# 外側のリクエストから引き継がない META
+REQUEST_META = ('wsgi.input', 'CONTENT_TYPE', 'CONTENT_LENGTH', 'QUERY_STRING', 'PATH_INFO', 'REQUEST_METHOD')
+
+
+def validate_item(item, batch_path):
+    """サブリクエストの形式の検証（エラーメッセージ、問題なければ None）"""
+    if not isinstance(item, dict):
+        return 'サブリクエストはオブジェクトで指定してください'
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    if method not in METHODS:
+        return f"メソッド「{method}」は使用できません（{', '.join(METHODS)}）"
+    if not isinstance(path, str) or not path.startswith(PATH_PREFIX):
+        return f'パスは {PATH_PREFIX} で始まる必要があります'
+    if path.split('?', 1)[0] == batch_path:
+        return 'バッチAPIを入れ子にすることはできません'
+    return None
+
+
+def build_request(outer, method, path, body=None):
+    """外側のリクエストのヘッダー・ユーザーを引き継いだサブリクエストを作成"""
+    path, _, query = path.partition('?')
+    content = b'' if body is None else json.dumps(body).encode()
+
+    request = HttpRequest()
+    request.method = method
+    request.path = request.path_info = path
+    request.META = {key: value for key, value in outer.META.items() if key not in REQUEST_META}
+    request.META.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+    })
+    request.GET = QueryDict(query)
+    request.COOKIES = outer.COOKIES
+    request._body = content
+    request._stream = BytesIO(content)
+    request._read_started = False
+
+    # 認証済みのユーザーをそのまま使う（DRF の Request が ForcedAuthentication を使う）
+    request.user = outer.user
+    request._force_auth_user = outer.user
+    request._dont_enforce_csrf_checks = True
+    if hasattr(outer, 'session'):
+        request.session = outer.session
+    return request
+
+
+def _response_body(response):
+    if hasattr(response, 'data'):
+        return response.data
+    if hasattr(response, 'render'):
+        response.render()
+    if not response.content:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(response.content)
+    return response.content.decode(response.charset or 'utf-8', errors='replace')
+
+
+def dispatch(outer, item):
+    """1件のサブリクエストを実行して {'status': ..., 'body': ...} を返す"""
+    method = str(item.get('method', 'GET')).upper()
+    path = item['path']
+    try:
+        match = resolve(path.split('?', 1)[0])
+    except Resolver404:
+        return {'status': 404, 'body': {'error': 'パスが見つかりません'}}
+    if iscoroutinefunction(match.func):
+        # 同期の処理の中からは実行できない
+        return {'status': 501, 'body': {'error': '非同期のAPIはバッチAPIでは実行できません'}}
+
+    request = build_request(outer, method, path, item.get('body'))
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+    except Http404:
+        return {'status': 404, 'body': {'error': '見つかりません'}}
+    except Exception:
+        logger.exception('Batch sub-request failed: %s %s', method, path)
+        return {'status': 500, 'body': {'error': 'サブリクエストの処理中にエラーが発生しました'}}
+    if getattr(response, 'streaming', False):
+        # 一時ファイルなどを解放する
+        response.close()
+        return {'status': 501, 'body': {'error': 'ストリーミングのレスポンスはバッチAPIでは取得できません'}}
+    return {'status': response.status_code, 'body': _response_body(response)}
@@ -0,0 +1,39 @@
+# api/management/commands/cache_stats.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+import caching
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss/eviction counts of the tiered cache (caching.TieredCache)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default', help='Cache alias in CACHES')
+        parser.add_argument('--reset', action='store_true', help='Reset the counts after showing them')
+        parser.add_argument('--invalidate-school', type=int, nargs='+', metavar='SCHOOL_ID',
+                            help='Invalidate all namespaced keys of the given schools')
+
+    def handle(self, *args, **options):
+        metrics = caching.metrics(options['alias'])
+        if metrics is None:
+            raise CommandError(f"Cache '{options['alias']}' is not caching.TieredCache.")
+
+        # ヒット・ミス・追い出しの件数は全プロセスの合計、プロセス内の件数はこのプロセスのみ
+        hit_rate = '-' if metrics['hit_rate'] is None else f"{metrics['hit_rate']:.1%}"
+        self.stdout.write(f"local hits:       {metrics['local_hits']}")
+        self.stdout.write(f"shared hits:      {metrics['shared_hits']}")
+        self.stdout.write(f"misses:           {metrics['misses']}")
+        self.stdout.write(f"hit rate:         {hit_rate}")
+        self.stdout.write(f"sets:             {metrics['sets']}")
+        self.stdout.write(f"local evictions:  {metrics['local_evictions']}")
+        self.stdout.write(f"local entries:    {metrics['local_entries']} / {metrics['local_max_entries']} (this process)")
+
+        if options['invalidate_school']:
+            caching.invalidate_school(*options['invalidate_school'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Invalidated schools: {', '.join(map(str, options['invalidate_school']))}"
+            ))
+        if options['reset']:
+            caching.reset_metrics(options['alias'])
+            self.stdout.write(self.style.SUCCESS('Counts reset.'))
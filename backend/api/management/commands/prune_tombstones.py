@@ -0,0 +1,26 @@
+# api/management/commands/prune_tombstones.py
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = 'Delete sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Retention in days (default: SYNC_TOMBSTONE_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30)
+
+        # 保持期間より古いカーソルは全件同期になるため、それより古い記録は参照されない
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones older than {days} days.'))
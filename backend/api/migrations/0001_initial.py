@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:08
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('place', '指導場所'), ('day', '曜日'), ('fixed_shift', '固定シフト'), ('shift', 'シフト')], max_length=20, verbose_name='対象モデル')),
+                ('object_id', models.BigIntegerField(verbose_name='削除されたID')),
+                ('school_id', models.BigIntegerField(verbose_name='学校ID')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='削除日時')),
+            ],
+            options={
+                'verbose_name': '削除記録',
+                'verbose_name_plural': '削除記録',
+                'indexes': [models.Index(fields=['school_id', 'deleted_at'], name='api_tombsto_school__7d3731_idx'), models.Index(fields=['deleted_at'], name='api_tombsto_deleted_d8b137_idx')],
+            },
+        ),
+    ]
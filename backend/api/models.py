@@ -0,0 +1,31 @@
+# api/models.py
+
+from django.db import models
+from django.utils import timezone
+
+
+class Tombstone(models.Model):
+    """差分同期用の削除記録"""
+    MODEL_CHOICES = [
+        ('place', '指導場所'),
+        ('day', '曜日'),
+        ('fixed_shift', '固定シフト'),
+        ('shift', 'シフト'),
+    ]
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES, verbose_name="対象モデル")
+    object_id = models.BigIntegerField(verbose_name="削除されたID")
+    # 学校削除後も記録を残すため外部キーにはしない
+    school_id = models.BigIntegerField(verbose_name="学校ID")
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="削除日時")
+
+    class Meta:
+        verbose_name = "削除記録"
+        verbose_name_plural = "削除記録"
+        indexes = [
+            models.Index(fields=['school_id', 'deleted_at']),
+            models.Index(fields=['deleted_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.model}#{self.object_id} ({self.deleted_at})"
@@ -0,0 +1,76 @@
+# api/signals.py
+
+from django.db.models.signals import pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from config.models import Place, Day
+from shift.models import FixedShift, Shift
+from .models import Tombstone
+
+
+def _record_tombstone(model_name, instance, school_id):
+    Tombstone.objects.create(
+        model=model_name,
+        object_id=instance.id,
+        school_id=school_id,
+    )
+
+
+@receiver(post_delete, sender=Place)
+def place_deleted(sender, instance, **kwargs):
+    _record_tombstone('place', instance, instance.school_id)
+
+
+@receiver(post_delete, sender=Day)
+def day_deleted(sender, instance, **kwargs):
+    _record_tombstone('day', instance, instance.school_id)
+
+
+@receiver(pre_delete, sender=FixedShift)
+@receiver(pre_delete, sender=Shift)
+def shift_pre_delete(sender, instance, **kwargs):
+    # カスケード削除で場所が先に消える場合に備えて学校IDを保持
+    instance._sync_school_id = instance.place.school_id
+
+
+@receiver(post_delete, sender=FixedShift)
+def fixed_shift_deleted(sender, instance, **kwargs):
+    _record_tombstone('fixed_shift', instance, instance._sync_school_id)
+
+
+@receiver(post_delete, sender=Shift)
+def shift_deleted(sender, instance, **kwargs):
+    _record_tombstone('shift', instance, instance._sync_school_id)
+
+
+def _touch_on_teacher_change(model, instance, action, reverse, pk_set):
+    """講師割当の変更時にシフトの更新日時を進める"""
+    related_name = 'fixed_shifts' if model is FixedShift else 'shifts'
+
+    if action == 'pre_clear' and reverse:
+        instance._sync_cleared_ids = list(
+            getattr(instance, related_name).values_list('id', flat=True)
+        )
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        ids = pk_set if action != 'post_clear' else getattr(instance, '_sync_cleared_ids', [])
+    else:
+        ids = [instance.id]
+
+    if ids:
+        model.objects.filter(id__in=ids).update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=FixedShift.teacher.through)
+def fixed_shift_teachers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _touch_on_teacher_change(FixedShift, instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Shift.teacher.through)
+def shift_teachers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _touch_on_teacher_change(Shift, instance, action, reverse, pk_set)
@@ -0,0 +1,162 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+import caching
+
+from account.models import CustomUser
+from config.models import Day, Place
+from school.models import School
+from shift.models import FixedShift
+
+from .models import Tombstone
+
+
+class SyncViewTests(TestCase):
+    def setUp(self):
+        self.school = School.objects.create(name='学校A')
+        self.other = School.objects.create(name='学校B')
+        self.place = Place.objects.create(name='教室A', school=self.school)
+        self.other_place = Place.objects.create(name='教室B', school=self.other)
+        self.user = CustomUser.objects.create_user('teacher', email='teacher@example.com', password='pass')
+        self.user.schools.add(self.school)
+        self.client.force_login(self.user)
+
+    def sync(self, cursor=None):
+        params = {'since': cursor} if cursor else {}
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def place_ids(self, data):
+        return [row[0] for row in data['changes']['places']['rows']]
+
+    def test_delta_sync_with_unchanged_scope(self):
+        cursor = self.sync()['cursor']
+        data = self.sync(cursor)
+        self.assertFalse(data['full'])
+
+    def test_joining_school_forces_full_sync(self):
+        cursor = self.sync()['cursor']
+        self.user.schools.add(self.other)
+
+        data = self.sync(cursor)
+        self.assertTrue(data['full'])
+        self.assertEqual(sorted(self.place_ids(data)), sorted([self.place.id, self.other_place.id]))
+
+    def test_leaving_school_forces_full_sync(self):
+        self.user.schools.add(self.other)
+        cursor = self.sync()['cursor']
+        self.user.schools.remove(self.other)
+
+        data = self.sync(cursor)
+        self.assertTrue(data['full'])
+        self.assertEqual(self.place_ids(data), [self.place.id])
+
+    def test_legacy_cursor_forces_full_sync(self):
+        cursor = self.sync()['cursor'].partition('.')[0]
+        self.assertTrue(self.sync(cursor)['full'])
+
+    def test_sync_does_not_delete_tombstones(self):
+        old = Tombstone.objects.create(
+            model='place', object_id=999, school_id=self.school.id,
+            deleted_at=timezone.now() - timedelta(days=365),
+        )
+        self.sync()
+        self.assertTrue(Tombstone.objects.filter(id=old.id).exists())
+
+        call_command('prune_tombstones', stdout=StringIO())
+        self.assertFalse(Tombstone.objects.filter(id=old.id).exists())
+
+
+class BatchViewTests(TestCase):
+    url = '/api/batch/'
+
+    def setUp(self):
+        self.school = School.objects.create(name='学校A')
+        self.day = Day.objects.create(name='月', order=0, school=self.school)
+        self.place = Place.objects.create(name='教室A', school=self.school)
+        self.owner = CustomUser.objects.create_user('owner', email='owner@example.com', password='pass', is_owner=True)
+        self.owner.schools.add(self.school)
+        self.client.force_login(self.owner)
+
+    def batch(self, requests, **options):
+        return self.client.post(self.url, {'requests': requests, **options}, content_type='application/json')
+
+    def create_shift(self):
+        return {'method': 'POST', 'path': '/api/shift/fixed-shift/', 'body': {
+            'day': self.day.id, 'place': self.place.id, 'start_time': '10:00', 'end_time': '11:00',
+        }}
+
+    def test_atomic_batch_rolls_back_on_failure(self):
+        response = self.batch([
+            self.create_shift(),
+            {'method': 'GET', 'path': '/api/shift/fixed-shift/999999/'},
+            {'method': 'GET', 'path': '/api/bootstrap/'},
+        ], atomic=True)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['rolled_back'])
+        self.assertEqual([item['status'] for item in data['responses']], [201, 404, 424])
+        self.assertFalse(FixedShift.objects.exists())
+
+    def test_non_atomic_batch_keeps_successful_requests(self):
+        response = self.batch([self.create_shift(), {'method': 'GET', 'path': '/api/shift/fixed-shift/999999/'}])
+        self.assertFalse(response.json()['rolled_back'])
+        self.assertEqual(FixedShift.objects.count(), 1)
+
+    def test_atomic_is_parsed_strictly(self):
+        response = self.batch([self.create_shift()], atomic='false')
+        self.assertFalse(response.json()['atomic'])
+
+        response = self.batch([self.create_shift()], atomic='maybe')
+        self.assertEqual(response.status_code, 400)
+
+    def test_async_view_is_rejected_per_item(self):
+        response = self.batch([
+            {'method': 'GET', 'path': f'/api/shift/events/{self.school.id}/'},
+            {'method': 'GET', 'path': '/api/bootstrap/'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['status'] for item in response.json()['responses']], [501, 200])
+
+    def test_streaming_response_is_rejected_per_item(self):
+        response = self.batch([{'method': 'GET', 'path': f'/api/file/export/roster/?school_id={self.school.id}'}])
+        self.assertEqual(response.json()['responses'][0]['status'], 501)
+
+
+
+class AtomicBatchCacheTests(TransactionTestCase):
+    """atomic なバッチのロールバック後に、確定前の内容がキャッシュから返らないこと"""
+
+    def setUp(self):
+        self.school = School.objects.create(name='学校A')
+        # 共有キャッシュは実行をまたいで残るため、学校のバージョンを上げて以前の結果を使わない
+        caching.invalidate_school(self.school.id)
+        self.day = Day.objects.create(name='月', order=0, school=self.school)
+        self.place = Place.objects.create(name='教室A', school=self.school)
+        self.owner = CustomUser.objects.create_user('owner', email='owner@example.com', password='pass', is_owner=True)
+        self.owner.schools.add(self.school)
+        self.client.force_login(self.owner)
+
+    def test_rolled_back_rows_are_not_cached(self):
+        grid = f'/api/shift/fixed-shift/grid/?school_id={self.school.id}'
+        bootstrap = f'/api/bootstrap/?school_id={self.school.id}'
+        response = self.client.post('/api/batch/', {'atomic': True, 'requests': [
+            {'method': 'POST', 'path': '/api/shift/fixed-shift/', 'body': {
+                'day': self.day.id, 'place': self.place.id, 'start_time': '10:00', 'end_time': '11:00',
+            }},
+            {'method': 'GET', 'path': grid},
+            {'method': 'GET', 'path': bootstrap},
+            {'method': 'GET', 'path': '/api/shift/fixed-shift/999999/'},
+        ]}, content_type='application/json')
+        data = response.json()
+        self.assertTrue(data['rolled_back'])
+        self.assertEqual(len(data['responses'][1]['body']['shifts']), 1)
+        self.assertFalse(FixedShift.objects.exists())
+
+        self.assertEqual(self.client.get(grid).json()['shifts'], [])
+        self.assertEqual(self.client.get(bootstrap).json()['time_slots_by_day'], {str(self.day.id): []})
@@ -0,0 +1,10 @@
+# api/urls.py
+
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path('bootstrap/', views.BootstrapView.as_view(), name='bootstrap'),
+    path('batch/', views.BatchView.as_view(), name='batch'),
+]
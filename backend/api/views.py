@@ -0,0 +1,333 @@
+# api/views.py
+
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+import caching
+from params import parse_bool
+from account.models import CustomUser
+from config.models import Place, Day
+from shift.models import FixedShift, Shift, TimeSlot
+from .models import Tombstone
+from . import batch
+
+
+# 同期時に返す列（クライアントは fields の順で rows を解釈する）
+SYNC_FIELDS = {
+    'places': (Place, ['id', 'school_id', 'name'], 'school_id'),
+    'days': (Day, ['id', 'school_id', 'order', 'name'], 'school_id'),
+    'fixed_shifts': (
+        FixedShift,
+        ['id', 'day_id', 'place_id', 'start_time', 'end_time', 'description'],
+        'place__school_id',
+    ),
+    'shifts': (
+        Shift,
+        ['id', 'date', 'place_id', 'start_time', 'end_time', 'is_empty'],
+        'place__school_id',
+    ),
+}
+
+TOMBSTONE_KEYS = {
+    'place': 'places',
+    'day': 'days',
+    'fixed_shift': 'fixed_shifts',
+    'shift': 'shifts',
+}
+
+
+def scope_digest(school_ids):
+    """所属学校の一覧の要約（カーソルに含め、所属が変わったことを検出する）"""
+    value = ','.join(str(school_id) for school_id in sorted(school_ids))
+    return hashlib.sha1(value.encode()).hexdigest()[:12]
+
+
+def encode_cursor(moment, scope):
+    """日時と所属学校の要約をカーソル（エポックからのマイクロ秒.要約）に変換"""
+    delta = moment - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    return f'{delta // timedelta(microseconds=1)}.{scope}'
+
+
+def decode_cursor(value):
+    """カーソルを (日時, 所属学校の要約) に変換（不正な値はValueError、要約のない旧形式は要約 None）"""
+    micros, _, scope = value.partition('.')
+    micros = int(micros)
+    if micros < 0:
+        raise ValueError(value)
+    return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=micros), scope or None
+
+
+class SyncView(APIView):
+    """
+    モバイルアプリ向け差分同期API
+
+    GET /api/sync/?since=<cursor>
+
+    since 以降に更新された指導場所・曜日・固定シフト・シフトと、
+    削除されたIDのみを返す。since を省略した場合は全件を返す。
+
+    カーソルには所属学校の要約を含め、学校への参加・脱退で所属が変わった場合は全件同期にする
+    （参加した学校の既存の行・脱退した学校の行の削除は差分では表せないため）。
+    full が true の場合、クライアントは手元のデータを rows で置き換える。
+    削除記録の保持期間を過ぎたものは manage.py prune_tombstones で削除する。
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        since_param = request.query_params.get('since')
+        since = since_scope = None
+        if since_param:
+            try:
+                since, since_scope = decode_cursor(since_param)
+            except (ValueError, OverflowError):
+                return Response(
+                    {'error': 'カーソルの形式が正しくありません'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        until = timezone.now()
+        retention = timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+        school_ids = list(request.user.schools.values_list('id', flat=True))
+        scope = scope_digest(school_ids)
+
+        # 削除記録の保持期間より古いカーソル・所属学校が変わったカーソルは全件同期に切り替える
+        full = since is None or since < until - retention or since_scope != scope
+        if full:
+            since = None
+        else:
+            # 更新と同時にコミットされた行の取りこぼしを防ぐため少し遡る
+            overlap = timedelta(seconds=getattr(settings, 'SYNC_CURSOR_OVERLAP_SECONDS', 5))
+            since = since - overlap
+
+        changes = {}
+        for key, (model, fields, school_lookup) in SYNC_FIELDS.items():
+            queryset = model.objects.filter(
+                **{f'{school_lookup}__in': school_ids},
+                updated_at__lte=until
+            )
+            if since is not None:
+                queryset = queryset.filter(updated_at__gt=since)
+            rows = [list(row) for row in queryset.order_by('id').values_list(*fields)]
+            changes[key] = {'fields': list(fields), 'rows': rows}
+
+        self._attach_teacher_ids(changes['fixed_shifts'], FixedShift)
+        self._attach_teacher_ids(changes['shifts'], Shift)
+
+        deleted = {key: [] for key in SYNC_FIELDS}
+        if since is not None:
+            tombstones = Tombstone.objects.filter(
+                school_id__in=school_ids,
+                deleted_at__gt=since,
+                deleted_at__lte=until
+            ).values_list('model', 'object_id')
+            for model_name, object_id in tombstones:
+                deleted[TOMBSTONE_KEYS[model_name]].append(object_id)
+
+        return Response({
+            'cursor': encode_cursor(until, scope),
+            'full': full,
+            'changes': changes,
+            'deleted': deleted,
+        })
+
+    def _attach_teacher_ids(self, batch, model):
+        """シフトの行末尾に割当講師IDの一覧を追加"""
+        batch['fields'].append('teacher_ids')
+        if not batch['rows']:
+            return
+
+        through = model.teacher.through
+        shift_field = f'{model._meta.model_name}_id'
+        teacher_map = {}
+        for shift_id, teacher_id in through.objects.filter(
+            **{f'{shift_field}__in': [row[0] for row in batch['rows']]}
+        ).values_list(shift_field, 'customuser_id'):
+            teacher_map.setdefault(shift_id, []).append(teacher_id)
+
+        for row in batch['rows']:
+            row.append(sorted(teacher_map.get(row[0], [])))
+
+
+# 学校ごとの初期表示データ（学校のバージョンが変わると無効になる）
+bootstrap_cache = caching.Namespace('bootstrap', timeout=getattr(settings, 'BOOTSTRAP_CACHE_TIMEOUT', 300))
+
+
+def _full_name(last_name, first_name, username):
+    if last_name and first_name:
+        return f"{last_name} {first_name}"
+    return username
+
+
+def build_school_bootstrap(school_id, include_email=False):
+    """学校の指導場所・曜日・時間スロット・スタッフ一覧（件数によらずクエリ5回）"""
+    places = list(Place.objects.filter(school_id=school_id).order_by('id').values('id', 'name'))
+    days = list(Day.objects.filter(school_id=school_id).order_by('order', 'id').values('id', 'name', 'order'))
+
+    slots_by_day = {day['id']: [] for day in days}
+    for day_id, start_time, end_time, display in TimeSlot.objects.filter(school_id=school_id).order_by(
+        'day_id', 'start_time', 'end_time'
+    ).values_list('day_id', 'start_time', 'end_time', 'display'):
+        slots_by_day.setdefault(day_id, []).append({'start_time': start_time, 'end_time': end_time, 'display': display})
+
+    place_ids = {}
+    for user_id, place_id in CustomUser.place.through.objects.filter(
+        place__school_id=school_id
+    ).values_list('customuser_id', 'place_id'):
+        place_ids.setdefault(user_id, []).append(place_id)
+
+    fields = ['id', 'username', 'first_name', 'last_name', 'is_owner', 'is_teacher', 'is_active']
+    if include_email:
+        fields.append('email')
+    members = []
+    for user in CustomUser.objects.filter(schools__id=school_id).order_by('last_name', 'first_name', 'id').values(*fields):
+        user['full_name'] = _full_name(user['last_name'], user['first_name'], user['username'])
+        user['place_ids'] = sorted(place_ids.get(user['id'], []))
+        members.append(user)
+
+    return {
+        'places': places,
+        'days': days,
+        'time_slots_by_day': slots_by_day,
+        'staff': {
+            'owners': sum(1 for user in members if user['is_owner']),
+            'teachers': sum(1 for user in members if user['is_teacher']),
+            'active': sum(1 for user in members if user['is_active']),
+            'members': members,
+        },
+    }
+
+
+class BootstrapView(APIView):
+    """
+    ダッシュボード・モバイルアプリの初期表示用API
+
+    GET /api/bootstrap/?school_id=<id>
+
+    ユーザー・所属学校と、選択中の学校（省略時は current_school）の指導場所・曜日・
+    時間スロット・スタッフ一覧を1回のレスポンスで返す。
+    学校ごとの部分は学校のバージョン・権限ごとにキャッシュする（ユーザー・所属学校は毎回取得）。
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        schools = list(user.schools.order_by('name').values('id', 'name', 'start_time', 'end_time'))
+        school_ids = [school['id'] for school in schools]
+
+        school_id = request.query_params.get('school_id')
+        if school_id:
+            try:
+                school_id = int(school_id)
+            except ValueError:
+                return Response({'error': '学校IDの形式が正しくありません'}, status=status.HTTP_400_BAD_REQUEST)
+            if school_id not in school_ids:
+                return Response(
+                    {'error': 'この学校にアクセスする権限がありません'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        elif user.current_school_id in school_ids:
+            school_id = user.current_school_id
+        else:
+            school_id = school_ids[0] if school_ids else None
+
+        school_names = {school['id']: school['name'] for school in schools}
+        data = {
+            'user': {
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'is_owner': user.is_owner,
+                'is_teacher': user.is_teacher,
+                'is_superuser': user.is_superuser,
+                'schools': school_ids,
+                'current_school': user.current_school_id,
+                'current_school_name': school_names.get(user.current_school_id),
+                'date_joined': user.date_joined,
+            },
+            'schools': schools,
+            'school_id': school_id,
+        }
+        if school_id is None:
+            return Response(data)
+
+        # メールアドレスはオーナー・管理者のみに返す
+        include_email = user.is_owner or user.is_superuser
+        data.update(bootstrap_cache.get_or_set(
+            school_id, include_email,
+            compute=lambda: build_school_bootstrap(school_id, include_email)
+        ))
+        return Response(data)
+
+
+class _BatchFailed(Exception):
+    """atomic なバッチでサブリクエストが失敗した（ロールバック用）"""
+
+
+class BatchView(APIView):
+    """
+    複数のサブリクエストを1回のHTTPリクエストで実行するAPI
+
+    POST /api/batch/
+    {"requests": [{"method": "GET", "path": "/api/shift/...", "body": {...}}, ...], "atomic": false}
+
+    サブリクエストは順番に実行し、レスポンスも同じ順番で {"status": ..., "body": ...} として返す。
+    atomic が true の場合は1つのトランザクションで実行し、ステータス 400 以上のサブリクエストがあれば
+    全てロールバックして以降は実行しない（未実行のサブリクエストのステータスは 424）。
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        items = request.data.get('requests')
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'requests を配列で指定してください'}, status=status.HTTP_400_BAD_REQUEST)
+        max_requests = getattr(settings, 'BATCH_MAX_REQUESTS', 50)
+        if len(items) > max_requests:
+            return Response(
+                {'error': f'サブリクエストは{max_requests}件までです'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        errors = {
+            index: error for index, error in
+            ((index, batch.validate_item(item, request.path)) for index, item in enumerate(items)) if error
+        }
+        if errors:
+            return Response(
+                {'error': 'サブリクエストの形式が正しくありません', 'details': errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            atomic = parse_bool(request.data.get('atomic', False))
+        except ValueError:
+            return Response({'error': 'atomic は true または false で指定してください'}, status=status.HTTP_400_BAD_REQUEST)
+        responses = []
+        if not atomic:
+            responses = [batch.dispatch(request._request, item) for item in items]
+        else:
+            try:
+                with transaction.atomic():
+                    for item in items:
+                        responses.append(batch.dispatch(request._request, item))
+                        if responses[-1]['status'] >= 400:
+                            raise _BatchFailed
+            except _BatchFailed:
+                responses.extend(
+                    {'status': 424, 'body': {'error': '前のサブリクエストが失敗したため実行されませんでした'}}
+                    for _ in items[len(responses):]
+                )
+
+        return Response({
+            'atomic': atomic,
+            'rolled_back': atomic and any(response['status'] >= 400 for response in responses),
+            'responses': responses,
+        })
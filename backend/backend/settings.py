@@ -12,6 +12,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +51,8 @@ INSTALLED_APPS = [
     'config',
     'shift',
     'file',
+    'api',
+    'search',
 ]
 
 MIDDLEWARE = [
@@ -145,7 +149,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'renderers.ORJSONRenderer',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -156,6 +160,77 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# 固定シフト変更イベント（SSE）設定
+# 複数ワーカー構成では 'shift.events.SQLiteBrokerBackend' を指定する
+SHIFT_EVENTS = {
+    'BACKEND': 'shift.events.InProcessBackend',
+    'OPTIONS': {},
+}
+
+# 差分同期API設定
+SYNC_TOMBSTONE_RETENTION_DAYS = 30  # 削除記録の保持日数（これより古いカーソルは全件同期、manage.py prune_tombstones で削除）
+SYNC_CURSOR_OVERLAP_SECONDS = 5  # 同時コミットの取りこぼし防止のための遡り秒数
+
+# 全文検索設定（SQLite: FTS5 / PostgreSQL: pg_trgm）
+SEARCH_RANKED_RESULTS = 200  # SQLite で関連度順に並べる上位件数（それ以降はID順。件数の上限ではない）
+AUTOCOMPLETE_INDEX_TTL = 300  # オートコンプリート用インデックスの再読み込み間隔（秒、他プロセスの変更の反映用）
+
+# 勤務時間集計設定
+WORKLOAD_STORED_DURATION = True  # 保存済みのシフトの長さを合計する（False: 開始・終了時間からDB上で計算）
+
+# エクスポート設定
+EXPORT_CHUNK_SIZE = 2000  # DBから一度に読み込む行数
+
+# キャッシュ設定
+# プロセス内の LRU（caching.TieredCache）を共有キャッシュの前に置く。
+# 共有キャッシュは REDIS_URL があれば Redis、なければファイル（複数ワーカー構成では Redis を推奨）
+SHARED_CACHE = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'shift-cache')),
+    'TIMEOUT': 300,
+    'OPTIONS': {
+        'MAX_ENTRIES': 10000,  # これを超えると CULL_FREQUENCY 分の1を削除
+        'CULL_FREQUENCY': 4,
+    },
+}
+if os.environ.get('REDIS_URL'):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+        'TIMEOUT': 300,
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'caching.TieredCache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'SHARED': SHARED_CACHE,
+            'LOCAL_MAX_ENTRIES': 1000,  # プロセス内に置く最大件数（古いものから追い出す）
+            'LOCAL_TIMEOUT': 60,  # プロセス内に置く最長秒数
+            'LOCAL_KEY_PREFIXES': ['ns:'],  # プロセス内に置くキー（バージョン付きのキーのみ）
+            'METRICS_FLUSH_INTERVAL': 10,  # ヒット・ミスの件数を共有キャッシュへ加算する間隔（秒）
+        },
+    },
+}
+
+# 同時リクエストの共有設定（singleflight）
+SINGLEFLIGHT_CACHE_TIMEOUT = 30  # 共有結果をキャッシュに保存する秒数（0: 実行中の計算の共有のみ）
+SINGLEFLIGHT_EARLY_RECOMPUTE = 5  # 期限の何秒前から1つのリクエストだけで再計算するか
+SINGLEFLIGHT_LOCK_TIMEOUT = 10  # 再計算中のロックの有効期間（秒）
+
+# 初期表示API設定
+BOOTSTRAP_CACHE_TIMEOUT = 300  # 学校ごとの初期表示データをキャッシュする秒数（変更時は学校のバージョンで無効化）
+
+# バッチAPI設定
+BATCH_MAX_REQUESTS = 50  # 1回のバッチで実行できるサブリクエストの最大件数
+
+# 時間割シミュレーション設定
+SANDBOX_MAX_EDITS = 200  # 1回のシミュレーションで適用できる編集の最大件数
+
+# 複数学校一括登録設定
+ONBOARDING_WORKERS = None  # 学校ごとの検証を行うプロセス数（None: CPU数）
+
 # CORS設定
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Viteのデフォルトポート
@@ -8,4 +8,5 @@ urlpatterns = [
     path('api/shift/', include('shift.urls')),
     path('api/config/', include('config.urls')),
     path('api/file/', include('file.urls')),
+    path('api/', include('api.urls')),
 ]
@@ -0,0 +1,342 @@
+# backend/caching.py
+
+"""
+2層キャッシュ
+
+プロセス内の LRU（件数上限あり）を共有キャッシュ（ファイル・Redis など Django のキャッシュバックエンド）の前に置く。
+CACHES の BACKEND に 'caching.TieredCache' を指定し、OPTIONS['SHARED'] に共有キャッシュの設定を書く。
+
+プロセス内の層に置くのは LOCAL_KEY_PREFIXES で始まるキー（Namespace のバージョン付きキー）のみ。
+バージョン付きキーの値は書き換えられない（変更時はバージョンを上げて別のキーになる）ため、
+他のプロセスの変更を見逃さない。ロック・バージョンなどそれ以外のキーは常に共有キャッシュを参照する。
+
+ヒット・ミス・追い出しの件数はプロセスごとに数え、METRICS_FLUSH_INTERVAL 秒ごとに共有キャッシュへ加算する
+（manage.py cache_stats で確認できる）。
+"""
+
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+NAMESPACE_PREFIX = 'ns:'
+# バージョン・件数などこのモジュールが使うキー（ヒット・ミスの件数に含めない）
+INTERNAL_PREFIX = 'caching:'
+VERSION_KEY = INTERNAL_PREFIX + 'version:{}'
+METRICS_KEY = INTERNAL_PREFIX + 'metrics:{}'
+METRIC_NAMES = ['local_hits', 'shared_hits', 'misses', 'sets', 'local_evictions']
+
+
+class LRUCache:
+    """件数上限のあるプロセス内キャッシュ（期限切れ・上限超過の古いものから追い出す）"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires_at または None, value)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache(BaseCache):
+    """
+    プロセス内 LRU + 共有キャッシュの Django キャッシュバックエンド
+
+    OPTIONS:
+      SHARED: 共有キャッシュの設定（CACHES の1項目と同じ形式）
+      LOCAL_MAX_ENTRIES: プロセス内に置く最大件数
+      LOCAL_TIMEOUT: プロセス内に置く最長秒数（None: 共有キャッシュと同じ）
+      LOCAL_KEY_PREFIXES: プロセス内に置くキーの接頭辞
+      METRICS_FLUSH_INTERVAL: 件数を共有キャッシュへ加算する間隔（秒）
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        shared = dict(options.pop('SHARED'))
+        self.local_timeout = options.pop('LOCAL_TIMEOUT', None)
+        self.local_prefixes = tuple(options.pop('LOCAL_KEY_PREFIXES', [NAMESPACE_PREFIX]))
+        self.flush_interval = options.pop('METRICS_FLUSH_INTERVAL', 10)
+        self.local = LRUCache(options.pop('LOCAL_MAX_ENTRIES', 1000))
+        super().__init__({**params, 'OPTIONS': options})
+
+        backend = import_string(shared.pop('BACKEND'))
+        self.shared = backend(shared.pop('LOCATION', ''), shared)
+
+        self._metrics = Counter()
+        self._metrics_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self._flushed_evictions = 0
+
+    # プロセス内の層
+
+    def _is_local(self, key):
+        return key.startswith(self.local_prefixes)
+
+    def _local_key(self, key, version):
+        return self.make_key(key, version=version)
+
+    def _local_timeout(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if self.local_timeout is None:
+            return timeout
+        return self.local_timeout if timeout is None else min(timeout, self.local_timeout)
+
+    def _count(self, **counts):
+        with self._metrics_lock:
+            self._metrics.update(counts)
+            if time.monotonic() - self._flushed_at < self.flush_interval:
+                return
+            metrics, self._metrics = self._metrics, Counter()
+            metrics['local_evictions'] += self.local.evictions - self._flushed_evictions
+            self._flushed_evictions = self.local.evictions
+            self._flushed_at = time.monotonic()
+        self._flush(metrics)
+
+    def _flush(self, metrics):
+        for name, value in metrics.items():
+            if value:
+                key = METRICS_KEY.format(name)
+                # ファイルキャッシュなどの incr は不可分ではないため、件数は目安
+                self.shared.add(key, 0, timeout=None)
+                try:
+                    self.shared.incr(key, value)
+                except ValueError:
+                    self.shared.set(key, value, timeout=None)
+
+    def flush_metrics(self):
+        """このプロセスで数えた件数を共有キャッシュへ加算"""
+        with self._metrics_lock:
+            self._flushed_at = 0
+        self._count()
+
+    # Django のキャッシュ API
+
+    def get(self, key, default=None, version=None):
+        if self._is_local(key):
+            sentinel = object()
+            value = self.local.get(self._local_key(key, version), sentinel)
+            if value is not sentinel:
+                self._count(local_hits=1)
+                return value
+
+        sentinel = object()
+        value = self.shared.get(key, sentinel, version=version)
+        counted = not key.startswith(INTERNAL_PREFIX)
+        if value is sentinel:
+            if counted:
+                self._count(misses=1)
+            return default
+        if counted:
+            self._count(shared_hits=1)
+        if self._is_local(key):
+            # 共有キャッシュの残り時間は分からないため LOCAL_TIMEOUT までとする
+            self.local.set(self._local_key(key, version), value, self.local_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        found, remaining = {}, []
+        for key in keys:
+            if self._is_local(key):
+                sentinel = object()
+                value = self.local.get(self._local_key(key, version), sentinel)
+                if value is not sentinel:
+                    found[key] = value
+                    continue
+            remaining.append(key)
+
+        shared = self.shared.get_many(remaining, version=version) if remaining else {}
+        for key, value in shared.items():
+            if self._is_local(key):
+                self.local.set(self._local_key(key, version), value, self.local_timeout)
+        found.update(shared)
+        counted = [key for key in remaining if not key.startswith(INTERNAL_PREFIX)]
+        self._count(
+            local_hits=len(keys) - len(remaining),
+            shared_hits=sum(1 for key in counted if key in shared),
+            misses=sum(1 for key in counted if key not in shared),
+        )
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout=timeout, version=version)
+        if self._is_local(key):
+            self.local.set(self._local_key(key, version), value, self._local_timeout(timeout))
+        if not key.startswith(INTERNAL_PREFIX):
+            self._count(sets=1)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            if self._is_local(key) and key not in failed:
+                self.local.set(self._local_key(key, version), value, self._local_timeout(timeout))
+        self._count(sets=sum(1 for key in data if not key.startswith(INTERNAL_PREFIX)))
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # ロックに使うため共有キャッシュで判定する
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added and self._is_local(key):
+            self.local.set(self._local_key(key, version), value, self._local_timeout(timeout))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.local.delete(self._local_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.local.delete(self._local_key(key, version))
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        sentinel = object()
+        if self._is_local(key) and self.local.get(self._local_key(key, version), sentinel) is not sentinel:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(self._local_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+
+def metrics(alias='default'):
+    """全プロセスの件数（共有キャッシュに加算済みのもの）と、このプロセスのプロセス内キャッシュの状態"""
+    backend = caches[alias]
+    if not isinstance(backend, TieredCache):
+        return None
+    backend.flush_metrics()
+    values = backend.shared.get_many([METRICS_KEY.format(name) for name in METRIC_NAMES])
+    result = {name: values.get(METRICS_KEY.format(name), 0) for name in METRIC_NAMES}
+    lookups = result['local_hits'] + result['shared_hits'] + result['misses']
+    result['hit_rate'] = round((result['local_hits'] + result['shared_hits']) / lookups, 4) if lookups else None
+    result['local_entries'] = len(backend.local)
+    result['local_max_entries'] = backend.local.max_entries
+    return result
+
+
+def reset_metrics(alias='default'):
+    backend = caches[alias]
+    if isinstance(backend, TieredCache):
+        backend.shared.delete_many([METRICS_KEY.format(name) for name in METRIC_NAMES])
+
+
+class Namespace:
+    """
+    名前空間・学校ごとのバージョン付きキー
+
+    キーは ns:<名前空間>:<学校ID>:<学校のバージョン>.<名前空間のバージョン>:<パラメーターのハッシュ>。
+    invalidate() はこの名前空間のみ、invalidate_school() は学校の全ての名前空間を無効化する。
+    同じキーの値を上書きする場合は local=False とする（接頭辞 ns: を付けず、プロセス内の層に置かない）。
+    """
+
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT, local=True):
+        self.name = name
+        self.timeout = timeout
+        self.prefix = NAMESPACE_PREFIX if local else ''
+
+    def _version_keys(self, school_id):
+        return VERSION_KEY.format(school_id), VERSION_KEY.format(f'{self.name}:{school_id}')
+
+    def version(self, school_id):
+        school_key, namespace_key = self._version_keys(school_id)
+        versions = cache.get_many([school_key, namespace_key])
+        return f"{versions.get(school_key, 0)}.{versions.get(namespace_key, 0)}"
+
+    def key(self, school_id, *parts):
+        digest = hashlib.md5(repr(parts).encode()).hexdigest()
+        return f'{self.prefix}{self.name}:{school_id}:{self.version(school_id)}:{digest}'
+
+    def _timeout(self, timeout):
+        return self.timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def get(self, school_id, *parts, default=None):
+        return cache.get(self.key(school_id, *parts), default)
+
+    def set(self, school_id, *parts, value, timeout=DEFAULT_TIMEOUT):
+        cache.set(self.key(school_id, *parts), value, self._timeout(timeout))
+
+    def get_or_set(self, school_id, *parts, compute, timeout=DEFAULT_TIMEOUT):
+        """
+        保存済みの値、なければ compute() の結果を保存して返す（None は保存しない）
+
+        トランザクション内では読み書きせずに compute() の結果をそのまま返す（in_transaction() を参照）。
+        """
+        if in_transaction():
+            return compute()
+        key = self.key(school_id, *parts)
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                cache.set(key, value, self._timeout(timeout))
+        return value
+
+    def invalidate(self, school_id):
+        _bump(self._version_keys(school_id)[1])
+
+
+def in_transaction(using=None):
+    """
+    トランザクション内か
+
+    トランザクション内で計算した結果は確定前（ロールバックされる可能性がある）の内容を含み、
+    学校のバージョンも確定時（on_commit）まで上がらないため、結果のキャッシュには読み書きしない。
+    """
+    return transaction.get_connection(using).in_atomic_block
+
+
+def _bump(key):
+    # 他のプロセスと同時に上げても値が変わればよいため、時刻を使う
+    cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_school(*school_ids):
+    """学校の全ての名前空間のキーを無効化"""
+    cache.set_many({VERSION_KEY.format(school_id): time.time_ns() for school_id in school_ids}, timeout=None)
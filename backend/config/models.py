@@ -1,11 +1,37 @@
 # config/models.py
 
+import unicodedata
+
 from django.db import models
 from school.models import School
 
+
+# 曜日名 -> 曜日番号（月曜 = 0）
+WEEKDAY_NAMES = {
+    '月': 0, '火': 1, '水': 2, '木': 3, '金': 4, '土': 5, '日': 6,
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6,
+}
+
+
+def normalize_weekday(name, order):
+    """
+    曜日名（「月」「月曜日」「Mon」など）から曜日番号を求める
+
+    曜日は学校ごとに作成されるため、学校をまたいで同じ曜日を比較する際に使用する。
+    曜日名から判定できない場合は順番から決める。
+    """
+    key = unicodedata.normalize('NFKC', name or '').strip().lower()
+    if key[:1] in WEEKDAY_NAMES:
+        return WEEKDAY_NAMES[key[:1]]
+    if key[:3] in WEEKDAY_NAMES:
+        return WEEKDAY_NAMES[key[:3]]
+    return order % 7
+
+
 class Place(models.Model):
     name = models.CharField(max_length=200, verbose_name="指導場所")
     school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='places')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="更新日時")
 
     class Meta:
         verbose_name = "指導場所"
@@ -19,6 +45,7 @@ class Day(models.Model):
     order = models.IntegerField(unique=False, verbose_name="順番")
     name = models.CharField(max_length=50, verbose_name="曜日名")
     school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='days')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="更新日時")
 
     class Meta:
         verbose_name = "曜日"
@@ -27,3 +54,7 @@ class Day(models.Model):
 
     def __str__(self):
         return self.name
+
+    @property
+    def weekday(self):
+        return normalize_weekday(self.name, self.order)
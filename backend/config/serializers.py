@@ -1,16 +1,18 @@
 # config/serializers.py
 
 from rest_framework import serializers
+
+from fieldsets import SparseFieldsetMixin
 from .models import Place, Day
 
-class PlaceSerializer(serializers.ModelSerializer):
+class PlaceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """場所シリアライザー"""
     class Meta:
         model = Place
         fields = ['id', 'name', 'school']
 
 
-class DaySerializer(serializers.ModelSerializer):
+class DaySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """曜日シリアライザー"""
     class Meta:
         model = Day
@@ -0,0 +1,131 @@
+# backend/fieldsets.py
+
+"""
+レスポンスのフィールドの絞り込み（?fields= / ?expand=）
+
+  ?fields=id,username        指定したフィールドのみ返す
+  ?expand=place_info         重いフィールド（Meta.expandable）を返す
+  どちらも指定しない場合       全てのフィールドを返す（従来どおり）
+
+fields を指定した場合は fields と expand に含まれるフィールドのみ、
+expand のみ指定した場合は expandable 以外のフィールドと expand に含まれるフィールドを返す
+（?expand= のように空で指定すると重いフィールドを全て省略する）。
+
+絞り込むのは出力のみで、入力の検証には影響しない。
+出力しないフィールドは SerializerMethodField も呼び出されず、prune_queryset で
+そのフィールドのための select_related / prefetch_related も外す。
+"""
+
+from rest_framework import serializers
+
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def _split(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class Fieldset:
+    """リクエストで指定されたフィールド"""
+
+    def __init__(self, fields=None, expand=()):
+        self.fields = None if fields is None else set(fields)
+        self.expand = set(expand)
+
+    @classmethod
+    def from_request(cls, request):
+        """クエリパラメーターから作成（どちらも指定されていなければ None）"""
+        if request is None:
+            return None
+        params = getattr(request, 'query_params', request.GET)
+        if FIELDS_PARAM not in params and EXPAND_PARAM not in params:
+            return None
+        fields = _split(params[FIELDS_PARAM]) if FIELDS_PARAM in params else None
+        return cls(fields, _split(params.get(EXPAND_PARAM, '')))
+
+    def includes(self, name, expandable=False):
+        if name in self.expand:
+            return True
+        if self.fields is not None:
+            return name in self.fields
+        return not expandable
+
+    def prune(self, row, expandable=()):
+        """組み立て済みの dict から出力しないフィールドを除く"""
+        return {name: value for name, value in row.items() if self.includes(name, name in expandable)}
+
+
+def includes(fieldset, name, expandable=False):
+    """fieldset が None（指定なし）の場合は全て出力する"""
+    return fieldset is None or fieldset.includes(name, expandable)
+
+
+def prune_rows(rows, fieldset, expandable=()):
+    if fieldset is None:
+        return rows
+    return [fieldset.prune(row, expandable) for row in rows]
+
+
+def prune_queryset(queryset, serializer_class, fieldset):
+    """
+    出力しないフィールドのための select_related / prefetch_related を外す
+
+    Meta.select_related_fields / Meta.prefetch_related_fields: {フィールド名: [ルックアップ, ...]}
+    どちらかを定義したシリアライザーのみ対象で、宣言したルックアップを出力するフィールドの分だけ付け直す。
+    """
+    meta = serializer_class.Meta
+    select = getattr(meta, 'select_related_fields', None)
+    prefetch = getattr(meta, 'prefetch_related_fields', None)
+    if fieldset is None or (select is None and prefetch is None):
+        return queryset
+
+    expandable = getattr(meta, 'expandable', ())
+
+    def needed(relations):
+        return list(dict.fromkeys(
+            lookup for name, lookups in (relations or {}).items()
+            if fieldset.includes(name, name in expandable) for lookup in lookups
+        ))
+
+    if select is not None:
+        queryset = queryset.select_related(None)
+        if needed(select):
+            queryset = queryset.select_related(*needed(select))
+    if prefetch is not None:
+        queryset = queryset.prefetch_related(None)
+        if needed(prefetch):
+            queryset = queryset.prefetch_related(*needed(prefetch))
+    return queryset
+
+
+class SparseFieldsetMixin:
+    """
+    ?fields= / ?expand= に対応するシリアライザーのミックスイン
+
+    Meta.expandable: expand（または fields）で指定した場合のみ出力する重いフィールド
+    ネストされたシリアライザーとしては絞り込まない（ルートのシリアライザーのみ）。
+    context に 'fieldset' があればリクエストより優先する。
+    """
+
+    def _fieldset(self):
+        if not hasattr(self, '_cached_fieldset'):
+            parent = self.parent
+            if isinstance(parent, serializers.ListSerializer):
+                parent = parent.parent
+            if parent is not None:
+                self._cached_fieldset = None
+            elif 'fieldset' in self.context:
+                self._cached_fieldset = self.context['fieldset']
+            else:
+                self._cached_fieldset = Fieldset.from_request(self.context.get('request'))
+        return self._cached_fieldset
+
+    @property
+    def _readable_fields(self):
+        fieldset = self._fieldset()
+        expandable = getattr(self.Meta, 'expandable', ())
+        for field in super()._readable_fields:
+            if includes(fieldset, field.field_name, field.field_name in expandable):
+                yield field
@@ -0,0 +1,137 @@
+# file/exports.py
+
+"""
+時間割・名簿のエクスポート
+
+行は QuerySet.iterator(chunk_size=...) から順に読み込み、担当講師はチャンクごとに1回のクエリで取得する。
+CSV は StreamingHttpResponse でそのまま送り、Excel は openpyxl の書き込み専用ブックを一時ファイルに書き出して送る。
+どちらも件数によらずメモリ使用量は一定。
+"""
+
+import csv
+import tempfile
+from itertools import islice
+
+from django.conf import settings
+from openpyxl import Workbook
+
+from account.models import CustomUser
+from shift.models import FixedShift, Shift
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+FIXED_SHIFT_COLUMNS = ['曜日名', '開始時間', '終了時間', '指導場所名', '内容', '担当講師']
+SHIFT_COLUMNS = ['日付', '開始時間', '終了時間', '指導場所名', '空ける', '担当講師']
+ROSTER_COLUMNS = ['ユーザー名', 'メールアドレス', '姓', '名', '権限', '指導可能場所', '有効']
+
+# 複数の講師・場所は1つのセルにまとめる（取り込み時も同じ区切り文字で分割する）
+SEPARATOR = ','
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _format_time(value):
+    return value.strftime('%H:%M')
+
+
+def _teacher_usernames(model, shift_ids):
+    """{shift_id: [username, ...]}"""
+    key = f'{model._meta.model_name}_id'
+    usernames = {}
+    for shift_id, username in model.teacher.through.objects.filter(
+        **{f'{key}__in': shift_ids}
+    ).order_by('customuser__username').values_list(key, 'customuser__username'):
+        usernames.setdefault(shift_id, []).append(username)
+    return usernames
+
+
+def fixed_shift_rows(school):
+    """固定シフトの時間割（曜日・開始時間・場所の順）"""
+    size = _chunk_size()
+    shifts = FixedShift.objects.filter(place__school=school).order_by(
+        'day__order', 'start_time', 'place__name', 'id'
+    ).values_list('id', 'day__name', 'start_time', 'end_time', 'place__name', 'description')
+
+    for chunk in _chunks(shifts.iterator(chunk_size=size), size):
+        teachers = _teacher_usernames(FixedShift, [row[0] for row in chunk])
+        for shift_id, day_name, start_time, end_time, place_name, description in chunk:
+            yield [
+                day_name, _format_time(start_time), _format_time(end_time), place_name,
+                description or '', SEPARATOR.join(teachers.get(shift_id, ())),
+            ]
+
+
+def shift_rows(school, start_date, end_date):
+    """日付指定シフト（日付・開始時間・場所の順）"""
+    size = _chunk_size()
+    shifts = Shift.objects.filter(
+        place__school=school, date__range=(start_date, end_date)
+    ).order_by('date', 'start_time', 'place__name', 'id').values_list(
+        'id', 'date', 'start_time', 'end_time', 'place__name', 'is_empty'
+    )
+
+    for chunk in _chunks(shifts.iterator(chunk_size=size), size):
+        teachers = _teacher_usernames(Shift, [row[0] for row in chunk])
+        for shift_id, date, start_time, end_time, place_name, is_empty in chunk:
+            yield [
+                date.isoformat(), _format_time(start_time), _format_time(end_time), place_name,
+                'はい' if is_empty else '', SEPARATOR.join(teachers.get(shift_id, ())),
+            ]
+
+
+def roster_rows(school):
+    """学校に所属するオーナー・講師の名簿"""
+    size = _chunk_size()
+    users = CustomUser.objects.filter(schools=school).order_by(
+        '-is_owner', 'last_name', 'first_name', 'username'
+    ).values_list('id', 'username', 'email', 'last_name', 'first_name', 'is_owner', 'is_active')
+
+    for chunk in _chunks(users.iterator(chunk_size=size), size):
+        places = {}
+        for user_id, place_name in CustomUser.place.through.objects.filter(
+            customuser_id__in=[row[0] for row in chunk], place__school=school
+        ).order_by('place__name').values_list('customuser_id', 'place__name'):
+            places.setdefault(user_id, []).append(place_name)
+        for user_id, username, email, last_name, first_name, is_owner, is_active in chunk:
+            yield [
+                username, email, last_name, first_name, 'オーナー' if is_owner else '講師',
+                SEPARATOR.join(places.get(user_id, ())), 'はい' if is_active else 'いいえ',
+            ]
+
+
+class _Echo:
+    """csv.writer の書き込み先（書き込んだ行をそのまま返す）"""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(columns, rows):
+    """CSV を1行ずつ返すジェネレーター（Excel で文字化けしないよう BOM を付ける）"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def xlsx_file(title, columns, rows):
+    """書き込み専用ブックで1シートのエクセルファイルを一時ファイルに作成（先頭に戻した状態で返す）"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(columns)
+    for row in rows:
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,356 @@
+# file/imports.py
+
+"""
+固定シフトの一括取り込み
+
+エクスポートと同じ形式（曜日名・開始時間・終了時間・指導場所名・内容・担当講師）のエクセル・CSV を1行ずつ読み込む。
+曜日・場所・講師の名前は学校ごとに先に読み込んだ辞書で ID に変換する。
+講師の重複は、取り込み後の状態（他の学校の固定シフトを含む）を講師・曜日番号・開始時間の順に並べて1回の走査で検出する。
+登録は bulk_create と中間テーブルの bulk_create で行い、シグナルを通らない分は最後にまとめて反映する。
+
+mode
+  upsert: 曜日・場所・開始時間・終了時間が同じ固定シフトは内容と担当講師を更新し、それ以外は追加する
+  replace: upsert に加えて、シートにない学校の固定シフトを削除する
+"""
+
+import csv
+import io
+from collections import namedtuple
+from datetime import datetime, time
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from openpyxl import load_workbook
+
+import caching
+
+from account.models import CustomUser
+from config.models import Day, Place
+from search.index import index_objects
+from shift import events
+from shift.intervals import interval_index, to_minutes
+from shift.models import FixedShift
+from shift.slots import rebuild_time_slots
+from .exports import FIXED_SHIFT_COLUMNS, SEPARATOR
+
+
+IMPORT_MODES = ('upsert', 'replace')
+SHEET_TITLE = '固定シフト'
+REQUIRED_COLUMNS = ['曜日名', '開始時間', '終了時間', '指導場所名']
+TIME_FORMATS = ('%H:%M', '%H:%M:%S')
+BATCH_SIZE = 1000
+
+ImportedShift = namedtuple(
+    'ImportedShift', 'row day_id weekday place_id start_time end_time description teacher_ids'
+)
+
+
+class ImportPlan:
+    """取り込み内容（登録前に件数の確認にも使う）"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.create = []  # [ImportedShift, ...]
+        self.update = {}  # shift_id -> ImportedShift（内容・担当講師が変わるもの）
+        self.previous_teachers = {}  # shift_id -> 更新前の担当講師
+        self.matched = set()  # シートと一致した既存の shift_id
+        self.delete_ids = []
+        self.errors = []
+
+    def statistics(self):
+        return {
+            'created': len(self.create),
+            'updated': len(self.update),
+            'unchanged': len(self.matched) - len(self.update),
+            'deleted': len(self.delete_ids),
+        }
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    return value.strip() if isinstance(value, str) else value
+
+
+def parse_time(value):
+    """セルの値（時刻・日時・「HH:MM」形式の文字列・1日を1とする小数）を time に変換（変換できなければ None）"""
+    if isinstance(value, datetime):
+        return value.time()
+    if isinstance(value, time):
+        return value
+    if isinstance(value, (int, float)) and 0 <= value < 1:
+        minutes = round(value * 24 * 60)
+        return time(minutes // 60, minutes % 60)
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.strptime(str(value), time_format).time()
+        except ValueError:
+            continue
+    return None
+
+
+def _sheet_rows(file, title):
+    """エクセルファイルの行（読み取り専用モードで1行ずつ読み込む。title のシートがなければ先頭のシート）"""
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook[title] if title in workbook.sheetnames else workbook.worksheets[0]
+        yield from sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(file, columns=FIXED_SHIFT_COLUMNS, required=REQUIRED_COLUMNS, title=SHEET_TITLE):
+    """
+    (行番号, {列名: 値}) を1行ずつ返すジェネレーター（空行は飛ばす）
+
+    拡張子が .csv のファイルは CSV（UTF-8、BOM 付きも可）、それ以外はエクセルファイルとして読み込む。
+    columns のうちファイルにある列のみ返し、required の列がない場合は ValueError。
+    """
+    if file.name.lower().endswith('.csv'):
+        rows = csv.reader(io.TextIOWrapper(file.file, encoding='utf-8-sig', newline=''))
+    else:
+        rows = _sheet_rows(file, title)
+
+    header = [str(_cell(value)) for value in next(rows, ())]
+    missing = [column for column in required if column not in header]
+    if missing:
+        raise ValueError(f"必要な列が見つかりません: {', '.join(missing)}")
+
+    positions = {column: header.index(column) for column in columns if column in header}
+    for row_number, values in enumerate(rows, start=2):
+        values = [_cell(value) for value in values]
+        if not any(value != '' for value in values):
+            continue
+        yield row_number, {
+            column: values[position] if position < len(values) else ''
+            for column, position in positions.items()
+        }
+
+
+class SchoolNames:
+    """学校の曜日名・場所名・講師のユーザー名 -> ID の辞書（取り込み前に一度だけ読み込む）"""
+
+    def __init__(self, school):
+        self.days = {
+            day.name: (day.id, day.weekday) for day in Day.objects.filter(school=school).only('name', 'order')
+        }
+        self.places = dict(Place.objects.filter(school=school).values_list('name', 'id'))
+
+        self.teachers = {}  # username -> (id, is_owner)
+        for user_id, username, is_owner in CustomUser.objects.filter(schools=school).filter(
+            Q(is_teacher=True) | Q(is_owner=True)
+        ).values_list('id', 'username', 'is_owner'):
+            self.teachers[username] = (user_id, is_owner)
+        self.usernames = {user_id: username for username, (user_id, _) in self.teachers.items()}
+
+        self.teacher_places = set(CustomUser.place.through.objects.filter(
+            place__school=school
+        ).values_list('customuser_id', 'place_id'))
+
+    def resolve(self, row_number, values):
+        """1行分の値を ImportedShift に変換（戻り値は (ImportedShift または None, [エラー, ...])）"""
+        errors = []
+
+        def error(message):
+            errors.append(f'{row_number}行目: {message}')
+
+        day = self.days.get(str(values['曜日名']))
+        if day is None:
+            error(f"曜日 '{values['曜日名']}' が見つかりません。")
+
+        place_name = str(values['指導場所名'])
+        place_id = self.places.get(place_name)
+        if place_id is None:
+            error(f"指導場所 '{place_name}' が見つかりません。")
+
+        start_time, end_time = parse_time(values['開始時間']), parse_time(values['終了時間'])
+        if start_time is None or end_time is None:
+            error('開始時間と終了時間はHH:MM形式で入力してください。')
+        elif start_time >= end_time:
+            error('開始時間は終了時間より前である必要があります。')
+
+        teacher_ids = []
+        for username in str(values.get('担当講師', '')).split(SEPARATOR):
+            username = username.strip()
+            if not username:
+                continue
+            teacher = self.teachers.get(username)
+            if teacher is None:
+                error(f"講師 '{username}' はこの学校に所属していません。")
+                continue
+            teacher_id, is_owner = teacher
+            # 指導可能場所チェック（オーナーは全ての場所で指導可能）
+            if place_id is not None and not is_owner and (teacher_id, place_id) not in self.teacher_places:
+                error(f"講師 '{username}' は場所 '{place_name}' での指導権限がありません。")
+            if teacher_id not in teacher_ids:
+                teacher_ids.append(teacher_id)
+
+        if errors:
+            return None, errors
+        return ImportedShift(
+            row_number, day[0], day[1], place_id, start_time, end_time,
+            str(values.get('内容', '')) or None, teacher_ids
+        ), []
+
+
+def parse_fixed_shifts(school, file):
+    """ファイルを読み込んで ([ImportedShift, ...], [エラー, ...], SchoolNames) を返す"""
+    names = SchoolNames(school)
+    shifts, errors, rows = [], [], {}
+    for row_number, values in read_rows(file):
+        shift, row_errors = names.resolve(row_number, values)
+        errors.extend(row_errors)
+        if shift is None:
+            continue
+        key = (shift.day_id, shift.place_id, shift.start_time, shift.end_time)
+        if key in rows:
+            errors.append(f'{row_number}行目: {rows[key]}行目と同じ曜日・時間・場所のシフトです。')
+            continue
+        rows[key] = row_number
+        shifts.append(shift)
+    return shifts, errors, names
+
+
+def find_overlaps(intervals):
+    """
+    重なる区間の組 [(teacher_id, 区間, 区間), ...]
+
+    intervals: [(teacher_id, 曜日番号, 開始分, 終了分, 区間), ...]
+    講師・曜日番号・開始分の順に並べ、それまでで最も遅く終わる区間と比べながら1回走査する。
+    """
+    overlaps = []
+    current = None  # (teacher_id, 曜日番号, 終了分, 区間)
+    for teacher_id, weekday, start, end, interval in sorted(intervals, key=itemgetter(0, 1, 2, 3)):
+        if current is not None and current[:2] == (teacher_id, weekday):
+            if start < current[2]:
+                overlaps.append((teacher_id, current[3], interval))
+            if end <= current[2]:
+                continue
+        current = (teacher_id, weekday, end, interval)
+    return overlaps
+
+
+def plan_fixed_shifts(school, shifts, mode, names):
+    """既存の固定シフトと照合して ImportPlan を作成し、講師の重複を検証する"""
+    plan = ImportPlan(mode)
+    existing = {
+        (day_id, place_id, start_time, end_time): (shift_id, description)
+        for shift_id, day_id, place_id, start_time, end_time, description in FixedShift.objects.filter(
+            place__school=school
+        ).values_list('id', 'day_id', 'place_id', 'start_time', 'end_time', 'description')
+    }
+
+    current_teachers = {}
+    for shift_id, teacher_id in FixedShift.teacher.through.objects.filter(
+        fixedshift__place__school=school
+    ).values_list('fixedshift_id', 'customuser_id'):
+        current_teachers.setdefault(shift_id, set()).add(teacher_id)
+
+    for shift in shifts:
+        match = existing.pop((shift.day_id, shift.place_id, shift.start_time, shift.end_time), None)
+        if match is None:
+            plan.create.append(shift)
+            continue
+        shift_id, description = match
+        plan.matched.add(shift_id)
+        teachers = current_teachers.get(shift_id, set())
+        if (description or None) != shift.description or teachers != set(shift.teacher_ids):
+            plan.update[shift_id] = shift
+            plan.previous_teachers[shift_id] = teachers
+
+    if mode == 'replace':
+        plan.delete_ids = sorted(shift_id for shift_id, _ in existing.values())
+
+    plan.errors = _overlap_errors(school, shifts, plan, names)
+    return plan
+
+
+def _overlap_errors(school, shifts, plan, names):
+    """取り込み後に講師の時間帯が重なる行のエラー"""
+    intervals = []
+    for shift in shifts:
+        start, end = to_minutes(shift.start_time), to_minutes(shift.end_time)
+        intervals.extend((teacher_id, shift.weekday, start, end, shift.row) for teacher_id in shift.teacher_ids)
+
+    # 取り込みで置き換わらない既存の固定シフト（他の学校を含む）は shift_id で区別する
+    replaced = plan.matched | set(plan.delete_ids)
+    for teacher_id, week in interval_index.get({interval[0] for interval in intervals}).items():
+        for shift_id, (weekday, start, end, _) in week.shifts.items():
+            if shift_id not in replaced:
+                intervals.append((teacher_id, weekday, start, end, -shift_id))
+
+    overlaps = [
+        (teacher_id, *sorted((a, b), reverse=True))
+        for teacher_id, a, b in find_overlaps(intervals) if a > 0 or b > 0
+    ]
+    existing = {
+        shift.id: shift for shift in FixedShift.objects.filter(
+            id__in=[-other for _, _, other in overlaps if other < 0]
+        ).select_related('day', 'place__school')
+    }
+
+    errors = []
+    for teacher_id, row, other in sorted(overlaps, key=itemgetter(1, 2)):
+        if other > 0:
+            where = f'{other}行目'
+        else:
+            shift = existing[-other]
+            school_name = '' if shift.place.school_id == school.id else f'{shift.place.school.name}の'
+            where = (
+                f"{school_name}{shift.day.name} {shift.start_time.strftime('%H:%M')}-"
+                f"{shift.end_time.strftime('%H:%M')}（{shift.place.name}）のシフト"
+            )
+        errors.append(f"{row}行目: 講師 '{names.usernames[teacher_id]}' の時間帯が{where}と重複しています。")
+    return errors
+
+
+def _teacher_rows(shift_id, teacher_ids):
+    Through = FixedShift.teacher.through
+    return [Through(fixedshift_id=shift_id, customuser_id=teacher_id) for teacher_id in teacher_ids]
+
+
+@transaction.atomic
+def apply_fixed_shifts(school, plan):
+    """ImportPlan の内容を登録して件数を返す"""
+    Through = FixedShift.teacher.through
+    now = timezone.now()
+
+    if plan.delete_ids:
+        # 削除はシグナルを通す（同期用の削除記録・イベントなど）
+        FixedShift.objects.filter(id__in=plan.delete_ids).delete()
+
+    if plan.update:
+        FixedShift.objects.bulk_update([
+            FixedShift(id=shift_id, description=shift.description, updated_at=now)
+            for shift_id, shift in plan.update.items()
+        ], ['description', 'updated_at'], batch_size=BATCH_SIZE)
+        Through.objects.filter(fixedshift_id__in=plan.update).delete()
+
+    created = FixedShift.objects.bulk_create([
+        FixedShift(
+            day_id=shift.day_id, place_id=shift.place_id,
+            start_time=shift.start_time, end_time=shift.end_time, description=shift.description,
+            duration_minutes=to_minutes(shift.end_time) - to_minutes(shift.start_time),
+        )
+        for shift in plan.create
+    ], batch_size=BATCH_SIZE)
+
+    teacher_rows = []
+    for shift_id, shift in [*plan.update.items(), *((obj.id, shift) for obj, shift in zip(created, plan.create))]:
+        teacher_rows.extend(_teacher_rows(shift_id, shift.teacher_ids))
+    Through.objects.bulk_create(teacher_rows, batch_size=BATCH_SIZE)
+
+    # シグナルを通らない更新の反映
+    changed_ids = [*plan.update, *(obj.id for obj in created)]
+    if created or plan.delete_ids:
+        rebuild_time_slots([school.id])
+    index_objects('fixed_shift', changed_ids)
+
+    previous_teachers = set().union(*plan.previous_teachers.values())
+    statistics = plan.statistics()
+    transaction.on_commit(lambda: interval_index.refresh_shifts(changed_ids, previous_teachers))
+    transaction.on_commit(lambda: events.publish('shift.imported', school.id, mode=plan.mode, **statistics))
+    transaction.on_commit(lambda: caching.invalidate_school(school.id))
+    return statistics
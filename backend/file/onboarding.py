@@ -0,0 +1,202 @@
+# file/onboarding.py
+
+"""
+複数の学校の一括登録
+
+エクセルファイルを学校ごとの unit に分割し（workbook.split_workbook）、
+unit ごとの内容の検証はプロセスプールで並列に行う。
+ユーザー名・メールアドレス・学校名の重複はデータベースと全ての unit をまとめて1回で確認する。
+登録は unit ごとのトランザクションで行い、失敗した学校があっても他の学校は登録する。
+"""
+
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from account.models import OwnerProfile, TeacherProfile
+from config.models import Place, Day
+from school.models import School
+from .workbook import validate_unit
+
+User = get_user_model()
+
+
+def _worker_count(unit_count):
+    workers = getattr(settings, 'ONBOARDING_WORKERS', None) or os.cpu_count() or 1
+    return min(workers, unit_count)
+
+
+def validate_units(units):
+    """unit ごとの内容の検証（unit が複数あればプロセスプールで並列に実行）"""
+    workers = _worker_count(len(units))
+    if workers <= 1:
+        return [validate_unit(unit) for unit in units]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(validate_unit, units))
+
+
+def check_uniqueness(units):
+    """
+    学校名・ユーザー名・メールアドレスの重複の検証（unit ごとのエラーのリストを返す）
+
+    既存のデータとの重複は全ての unit の値をまとめて1回ずつ問い合わせる。
+    """
+    names = {
+        'school': [unit['school']['学校名'] for unit in units],
+        'username': [user['ユーザー名'] for unit in units for user in unit['users']],
+        'email': [user['メールアドレス'] for unit in units for user in unit['users']],
+    }
+    existing = {
+        'school': set(School.objects.filter(name__in=names['school']).values_list('name', flat=True)),
+        'username': set(User.objects.filter(username__in=names['username']).values_list('username', flat=True)),
+        'email': set(User.objects.filter(email__in=names['email']).values_list('email', flat=True)),
+    }
+
+    # 複数の学校に同じユーザーが書かれている場合（学校内の重複は validate_unit で検出）
+    shared = {}
+    for key, column in (('username', 'ユーザー名'), ('email', 'メールアドレス')):
+        counts = Counter(value for unit in units for value in {user[column] for user in unit['users']})
+        shared[key] = {value for value, count in counts.items() if count > 1}
+
+    errors = []
+    for unit in units:
+        unit_errors = []
+        school_name = unit['school']['学校名']
+        if school_name in existing['school']:
+            unit_errors.append(f'学校「{school_name}」は既に登録されています。')
+
+        usernames = [user['ユーザー名'] for user in unit['users']]
+        emails = [user['メールアドレス'] for user in unit['users']]
+        for label, key, values in (('ユーザー名', 'username', usernames), ('メールアドレス', 'email', emails)):
+            registered = [str(value) for value in values if value in existing[key]]
+            if registered:
+                unit_errors.append(f"既に登録されている{label}があります: {', '.join(registered)}")
+            duplicated = [str(value) for value in dict.fromkeys(values) if value in shared[key]]
+            if duplicated:
+                unit_errors.append(f"他の学校と重複する{label}があります: {', '.join(duplicated)}")
+        errors.append(unit_errors)
+    return errors
+
+
+def default_password(username):
+    """一括登録したユーザーの初期パスワード"""
+    return f"{username}123"
+
+
+def _optional(value):
+    return value if value is not None and pd.notna(value) else None
+
+
+@transaction.atomic
+def create_school(unit):
+    """1つの学校と所属するユーザー・指導場所・曜日を登録して結果を返す"""
+    result = {
+        'schools_created': 0,
+        'users_created': 0,
+        'places_created': 0,
+        'days_created': 0,
+        'details': []
+    }
+
+    # 1. 学校の作成
+    school_row = unit['school']
+    school = School.objects.create(
+        name=school_row['学校名'],
+        start_time=_optional(school_row['始業時間']),
+        end_time=_optional(school_row['終業時間'])
+    )
+    result['schools_created'] = 1
+    result['details'].append(f"学校「{school.name}」を作成しました")
+
+    # 2. ユーザーの作成
+    for row in unit['users']:
+        user = User.objects.create_user(
+            username=row['ユーザー名'],
+            email=row['メールアドレス'],
+            first_name=row['名'],
+            last_name=row['姓'],
+            password=default_password(row['ユーザー名']),
+            is_owner=(row['権限'] == 'オーナー'),
+            is_teacher=(row['権限'] == '講師'),
+            current_school=school
+        )
+
+        # 学校をユーザーに関連付け
+        user.schools.add(school)
+
+        # プロフィールの作成
+        if row['権限'] == 'オーナー':
+            OwnerProfile.objects.create(user=user)
+        elif row['権限'] == '講師':
+            TeacherProfile.objects.create(user=user)
+
+        result['users_created'] += 1
+        result['details'].append(
+            f"{row['権限']}「{user.last_name} {user.first_name}」を作成しました "
+            f"(ユーザー名: {user.username})"
+        )
+
+    # 3. 指導場所の作成
+    for row in unit['places']:
+        place = Place.objects.create(name=row['指導場所名'], school=school)
+        result['places_created'] += 1
+        result['details'].append(f"指導場所「{place.name}」を作成しました")
+
+    # 4. 曜日の作成
+    for row in unit['days']:
+        day = Day.objects.create(order=int(row['順番']), name=row['曜日名'], school=school)
+        result['days_created'] += 1
+        result['details'].append(f"曜日「{day.name}」を作成しました (順番: {day.order})")
+
+    result['school_id'] = school.id
+    return result
+
+
+def import_schools(units, dry_run=False):
+    """
+    unit ごとに検証・登録してまとめた結果を返す
+
+    検証に失敗した学校は登録せず、登録中にエラーになった学校はその学校のみロールバックする。
+    dry_run の場合は検証のみ行う。
+    """
+    validation = validate_units(units)
+    uniqueness = check_uniqueness(units)
+
+    report = []
+    totals = Counter()
+    for unit, unit_errors, unique_errors in zip(units, validation, uniqueness):
+        entry = {'school_name': unit['school']['学校名'], 'errors': [*unit_errors, *unique_errors]}
+        if entry['errors']:
+            entry['status'] = 'invalid'
+        elif dry_run:
+            entry['status'] = 'valid'
+        else:
+            try:
+                result = create_school(unit)
+            except Exception as e:
+                entry.update(status='failed', errors=[f'登録中にエラーが発生しました: {str(e)}'])
+            else:
+                entry.update(status='created', school_id=result.pop('school_id'), details=result.pop('details'))
+                entry['statistics'] = result
+                totals.update(result)
+        report.append(entry)
+
+    statuses = Counter(entry['status'] for entry in report)
+    return {
+        'schools': report,
+        'statistics': {
+            'schools_total': len(report),
+            'schools_valid': statuses['valid'],
+            'schools_created': totals['schools_created'],
+            'schools_invalid': statuses['invalid'],
+            'schools_failed': statuses['failed'],
+            'users_created': totals['users_created'],
+            'places_created': totals['places_created'],
+            'days_created': totals['days_created'],
+        }
+    }
@@ -0,0 +1,295 @@
+# file/roster.py
+
+"""
+名簿の同期（既存の学校の講師の一括追加・更新）
+
+名簿エクスポートと同じ形式（ユーザー名・メールアドレス・姓・名・権限・指導可能場所・有効）を読み込み、
+現在のユーザー・所属学校・指導可能場所をまとめて読み込んだ辞書とメモリ上で比較する。
+変更のある行だけを bulk_create / bulk_update と中間テーブルの追加・削除で反映し、変更がなければ書き込みは行わない。
+
+権限は変更しない（新しいユーザーは講師として作成し、オーナーは既存の所属オーナーのみ指定できる）。
+メールアドレス・名前・有効は所属している講師のみ更新する。他の学校のユーザーは名簿のメールアドレスが
+一致する場合に学校へ追加するだけで、管理者（スタッフ・スーパーユーザー）は名簿の対象にしない。
+"""
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+import caching
+
+from account.models import CustomUser, TeacherProfile
+from config.models import Place
+from search.autocomplete import autocomplete
+from search.index import index_objects
+from shift.models import FixedShift
+from .exports import ROSTER_COLUMNS, SEPARATOR, _chunks
+from .imports import read_rows
+from .onboarding import default_password
+
+
+ROSTER_SHEET_TITLE = '名簿'
+ROSTER_REQUIRED_COLUMNS = ['ユーザー名', 'メールアドレス', '姓', '名']
+ACTIVE_VALUES = {'はい': True, 'いいえ': False, '': True}
+USER_FIELDS = {'email': 'メールアドレス', 'last_name': '姓', 'first_name': '名', 'is_active': '有効'}
+# 名前を含む固定シフトの検索文書も作り直す必要があるフィールド
+NAME_FIELDS = {'last_name', 'first_name'}
+LOOKUP_CHUNK_SIZE = 500
+
+
+class RosterPlan:
+    """名簿との差分（プレビューにも使う）"""
+
+    def __init__(self):
+        self.create = []  # [{フィールド: 値, 'place_ids': [...]}, ...]
+        self.update = {}  # user_id -> {フィールド: 新しい値}
+        self.join = []  # 学校に追加する既存ユーザー
+        self.remove = []  # 学校から外すユーザー（remove_missing の場合）
+        self.places_added = []  # [(user_id, place_id), ...]
+        self.places_removed = []  # [(user_id, 中間テーブルの行ID), ...]
+        self.missing = []  # 名簿にない所属ユーザー名
+        self.unchanged = 0
+        self.changes = []  # プレビュー用のユーザーごとの変更内容
+        self.errors = []
+
+    def has_changes(self):
+        return any((self.create, self.update, self.join, self.remove, self.places_added, self.places_removed))
+
+    def statistics(self):
+        return {
+            'created': len(self.create),
+            'updated': len(self.update),
+            'joined': len(self.join),
+            'removed': len(self.remove),
+            'places_added': len(self.places_added),
+            'places_removed': len(self.places_removed),
+            'unchanged': self.unchanged,
+            'missing': len(self.missing),
+        }
+
+
+def _split(value):
+    return [name.strip() for name in str(value).split(SEPARATOR) if name.strip()]
+
+
+def _lookup(model_field, values, fields):
+    """values に一致するユーザー {値: {フィールド: 値}}（SQLite の変数の上限を超えないよう分割して取得）"""
+    result = {}
+    for chunk in _chunks(values, LOOKUP_CHUNK_SIZE):
+        for user in CustomUser.objects.filter(**{f'{model_field}__in': chunk}).values(*fields):
+            result[user[model_field]] = user
+    return result
+
+
+def _read(file):
+    """名簿の行を読み込み、行ごとの値の検証と名簿内の重複の検証を行う"""
+    rows, errors = [], []
+    first_rows = {'ユーザー名': {}, 'メールアドレス': {}}
+    for row_number, values in read_rows(file, ROSTER_COLUMNS, ROSTER_REQUIRED_COLUMNS, ROSTER_SHEET_TITLE):
+        values = {column: str(value) for column, value in values.items()}
+        missing = [column for column in ('ユーザー名', 'メールアドレス') if not values[column]]
+        if missing:
+            errors.append(f"{row_number}行目: {', '.join(missing)}が入力されていません。")
+            continue
+        if values.get('権限', '') not in ('', 'オーナー', '講師'):
+            errors.append(f"{row_number}行目: 権限は「オーナー」または「講師」で入力してください。")
+            continue
+        if values.get('有効', '') not in ACTIVE_VALUES:
+            errors.append(f"{row_number}行目: 有効は「はい」または「いいえ」で入力してください。")
+            continue
+
+        duplicated = False
+        for column, seen in first_rows.items():
+            if values[column] in seen:
+                errors.append(f"{row_number}行目: {column}「{values[column]}」が{seen[values[column]]}行目と重複しています。")
+                duplicated = True
+            seen.setdefault(values[column], row_number)
+        if not duplicated:
+            rows.append((row_number, values))
+    return rows, errors
+
+
+def plan_roster(school, file, remove_missing=False):
+    """名簿ファイルと現在の所属・指導可能場所を比較して RosterPlan を作成"""
+    plan = RosterPlan()
+    rows, plan.errors = _read(file)
+
+    places = dict(Place.objects.filter(school=school).values_list('name', 'id'))
+    place_names = {place_id: name for name, place_id in places.items()}
+    memberships = set(CustomUser.schools.through.objects.filter(school=school).values_list('customuser_id', flat=True))
+    assigned = {}  # user_id -> {place_id: 中間テーブルの行ID}
+    for row_id, user_id, place_id in CustomUser.place.through.objects.filter(
+        place__school=school
+    ).values_list('id', 'customuser_id', 'place_id'):
+        assigned.setdefault(user_id, {})[place_id] = row_id
+
+    fields = ['id', 'username', 'is_owner', 'is_teacher', 'is_staff', 'is_superuser', *USER_FIELDS]
+    users = _lookup('username', [values['ユーザー名'] for _, values in rows], fields)
+    # 新しいユーザー・変更後のメールアドレスが他のユーザーと重複していないか
+    emails = _lookup('email', [
+        values['メールアドレス'] for _, values in rows
+        if values['メールアドレス'] != users.get(values['ユーザー名'], {}).get('email')
+    ], ['id', 'email'])
+
+    seen = set()
+    for row_number, values in rows:
+        username = values['ユーザー名']
+        user = users.get(username)
+        row_errors = []
+
+        place_ids = []
+        for name in _split(values.get('指導可能場所', '')):
+            if name not in places:
+                row_errors.append(f"{row_number}行目: 指導場所 '{name}' が見つかりません。")
+            elif places[name] not in place_ids:
+                place_ids.append(places[name])
+
+        email = values['メールアドレス']
+        if email in emails and (user is None or emails[email]['id'] != user['id']):
+            row_errors.append(f"{row_number}行目: メールアドレス「{email}」は既に使用されています。")
+
+        is_owner = values.get('権限') == 'オーナー'
+        if user is not None and (user['is_staff'] or user['is_superuser']):
+            row_errors.append(f"{row_number}行目: 管理者「{username}」は名簿で変更できません。")
+        elif user is not None and user['id'] not in memberships and user['email'] != email:
+            # 他の学校のユーザーはユーザー名とメールアドレスの両方が一致する場合のみ追加する
+            row_errors.append(f"{row_number}行目: ユーザー名「{username}」は他のユーザーが使用しています。")
+        elif user is None and is_owner:
+            row_errors.append(f"{row_number}行目: 名簿の同期ではオーナーを追加できません。")
+        elif user is not None and user['is_owner'] != is_owner and values.get('権限'):
+            row_errors.append(f"{row_number}行目: ユーザー「{username}」の権限は変更できません。")
+        elif user is not None and user['is_owner'] and user['id'] not in memberships:
+            row_errors.append(f"{row_number}行目: 他の学校のオーナー「{username}」は追加できません。")
+
+        if row_errors:
+            plan.errors.extend(row_errors)
+            continue
+
+        desired = {
+            'email': email,
+            'last_name': values['姓'],
+            'first_name': values['名'],
+            'is_active': ACTIVE_VALUES[values.get('有効', '')],
+        }
+        if user is None:
+            plan.create.append({'username': username, **desired, 'place_ids': place_ids})
+            plan.changes.append({
+                'username': username, 'action': 'create',
+                'places_added': [place_names[place_id] for place_id in place_ids],
+            })
+            continue
+
+        user_id = user['id']
+        seen.add(user_id)
+        change = {'username': username, 'action': 'update'}
+        if user_id in memberships:
+            updates = {field: value for field, value in desired.items() if user[field] != value}
+            if not user['is_owner'] and not user['is_teacher']:
+                updates['is_teacher'] = True
+            if updates:
+                plan.update[user_id] = updates
+                change['fields'] = {field: [user[field], value] for field, value in updates.items()}
+        else:
+            # 他の学校のユーザーは追加のみ（名前・有効などは変更しない）
+            plan.join.append(user_id)
+            change['action'] = 'join'
+
+        current = assigned.get(user_id, {})
+        added = [place_id for place_id in place_ids if place_id not in current]
+        removed = [place_id for place_id in current if place_id not in place_ids]
+        plan.places_added.extend((user_id, place_id) for place_id in added)
+        plan.places_removed.extend((user_id, current[place_id]) for place_id in removed)
+        if added:
+            change['places_added'] = [place_names[place_id] for place_id in added]
+        if removed:
+            change['places_removed'] = [place_names[place_id] for place_id in removed]
+
+        if len(change) > 2 or change['action'] == 'join':
+            plan.changes.append(change)
+        else:
+            plan.unchanged += 1
+
+    # 名簿にない所属ユーザー（オーナー・管理者は外さない）
+    if memberships - seen:
+        for user_id, username in CustomUser.objects.filter(
+            schools=school, is_owner=False, is_staff=False, is_superuser=False
+        ).values_list('id', 'username'):
+            if user_id in seen:
+                continue
+            if remove_missing:
+                plan.remove.append(user_id)
+                plan.places_removed.extend((user_id, row_id) for row_id in assigned.get(user_id, {}).values())
+                plan.changes.append({'username': username, 'action': 'remove'})
+            else:
+                plan.missing.append(username)
+
+    return plan
+
+
+@transaction.atomic
+def apply_roster(school, plan):
+    """RosterPlan の内容を反映して件数を返す（変更がなければ何も書き込まない）"""
+    statistics = plan.statistics()
+    if not plan.has_changes():
+        return statistics
+
+    Membership = CustomUser.schools.through
+    PlaceAssignment = CustomUser.place.through
+
+    created = CustomUser.objects.bulk_create([
+        CustomUser(
+            username=row['username'], email=row['email'], last_name=row['last_name'],
+            first_name=row['first_name'], is_active=row['is_active'], is_teacher=True,
+            current_school=school, password=make_password(default_password(row['username'])),
+        )
+        for row in plan.create
+    ])
+    TeacherProfile.objects.bulk_create([TeacherProfile(user=user) for user in created])
+
+    if plan.update:
+        fields = sorted({field for updates in plan.update.values() for field in updates})
+        current = {
+            user.id: user for user in CustomUser.objects.filter(id__in=plan.update).only(*fields)
+        }
+        for user_id, updates in plan.update.items():
+            for field, value in updates.items():
+                setattr(current[user_id], field, value)
+        CustomUser.objects.bulk_update(current.values(), fields, batch_size=LOOKUP_CHUNK_SIZE)
+
+    Membership.objects.bulk_create([
+        Membership(customuser_id=user_id, school_id=school.id)
+        for user_id in [*plan.join, *(user.id for user in created)]
+    ])
+    PlaceAssignment.objects.bulk_create([
+        *(PlaceAssignment(customuser_id=user_id, place_id=place_id) for user_id, place_id in plan.places_added),
+        *(
+            PlaceAssignment(customuser_id=user.id, place_id=place_id)
+            for user, row in zip(created, plan.create) for place_id in row['place_ids']
+        ),
+    ])
+
+    for chunk in _chunks([row_id for _, row_id in plan.places_removed], LOOKUP_CHUNK_SIZE):
+        PlaceAssignment.objects.filter(id__in=chunk).delete()
+    for chunk in _chunks(plan.remove, LOOKUP_CHUNK_SIZE):
+        Membership.objects.filter(school_id=school.id, customuser_id__in=chunk).delete()
+        CustomUser.objects.filter(id__in=chunk, current_school=school).update(current_school=None)
+
+    # シグナルを通らない更新の反映（検索文書・オートコンプリート）
+    affected = {
+        *(user.id for user in created), *plan.update, *plan.join, *plan.remove,
+        *(user_id for user_id, _ in [*plan.places_added, *plan.places_removed]),
+    }
+    index_objects('user', affected)
+    renamed = [user_id for user_id, updates in plan.update.items() if NAME_FIELDS & set(updates)]
+    if renamed:
+        index_objects('fixed_shift', FixedShift.teacher.through.objects.filter(
+            customuser_id__in=renamed
+        ).values_list('fixedshift_id', flat=True).distinct())
+
+    user_ids = list(affected)
+    transaction.on_commit(lambda: autocomplete.refresh_users(user_ids))
+    # 講師名・有効などは他の学校の時間割・ブートストラップにも含まれるため、更新したユーザーの所属学校も無効化する
+    school_ids = {school.id, *CustomUser.schools.through.objects.filter(
+        customuser_id__in=list(plan.update)
+    ).values_list('school_id', flat=True)}
+    transaction.on_commit(lambda: caching.invalidate_school(*school_ids))
+    return statistics
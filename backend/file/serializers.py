@@ -2,10 +2,11 @@
 
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.db import transaction
 from school.models import School
-from config.models import Place, Day
-from account.models import OwnerProfile, TeacherProfile
+from .workbook import split_workbook
+from .onboarding import create_school
+from .imports import IMPORT_MODES, parse_fixed_shifts, plan_fixed_shifts, apply_fixed_shifts
+from .roster import plan_roster, apply_roster
 import pandas as pd
 import io
 
@@ -217,105 +218,55 @@ class SchoolBulkCreateSerializer(serializers.Serializer):
                 f"曜日設定シートで重複する曜日名があります: {', '.join(duplicated_days)}"
             )
     
-    @transaction.atomic
     def create(self, validated_data):
         """データベースへの一括登録"""
-        excel_data = validated_data['excel_data']
-        
-        result = {
-            'schools_created': 0,
-            'users_created': 0,
-            'places_created': 0,
-            'days_created': 0,
-            'details': []
-        }
-        
+        units, _ = split_workbook(validated_data['excel_data'])
+
         try:
-            # 1. 学校の作成（1校のみ）
-            schools_df = excel_data['学校情報']
-            school_row = schools_df.iloc[0]  # 最初の行のみ取得
-            
-            school = School.objects.create(
-                name=school_row['学校名'],
-                start_time=school_row['始業時間'] if pd.notna(school_row['始業時間']) else None,
-                end_time=school_row['終業時間'] if pd.notna(school_row['終業時間']) else None
-            )
-            result['schools_created'] = 1
-            result['details'].append(f"学校「{school.name}」を作成しました")
-            
-            # 2. ユーザーの作成
-            users_df = excel_data['ユーザー情報']
-            
-            for _, row in users_df.iterrows():
-                # デフォルトパスワードを設定
-                default_password = f"{row['ユーザー名']}123"
-                
-                user = User.objects.create_user(
-                    username=row['ユーザー名'],
-                    email=row['メールアドレス'],
-                    first_name=row['名'],
-                    last_name=row['姓'],
-                    password=default_password,
-                    is_owner=(row['権限'] == 'オーナー'),
-                    is_teacher=(row['権限'] == '講師'),
-                    current_school=school
-                )
-                
-                # 学校をユーザーに関連付け
-                user.schools.add(school)
-                
-                # プロフィールの作成
-                if row['権限'] == 'オーナー':
-                    OwnerProfile.objects.create(user=user)
-                elif row['権限'] == '講師':
-                    TeacherProfile.objects.create(user=user)
-                
-                result['users_created'] += 1
-                result['details'].append(
-                    f"{row['権限']}「{user.last_name} {user.first_name}」を作成しました "
-                    f"(ユーザー名: {user.username})"
-                )
-            
-            # 3. 指導場所の作成
-            places_df = excel_data['指導場所']
-            
-            for _, row in places_df.iterrows():
-                place = Place.objects.create(
-                    name=row['指導場所名'],
-                    school=school
-                )
-                result['places_created'] += 1
-                result['details'].append(f"指導場所「{place.name}」を作成しました")
-            
-            # 4. 曜日の作成
-            days_df = excel_data['曜日設定']
-            
-            for _, row in days_df.iterrows():
-                day = Day.objects.create(
-                    order=int(row['順番']),
-                    name=row['曜日名'],
-                    school=school
-                )
-                result['days_created'] += 1
-                result['details'].append(f"曜日「{day.name}」を作成しました (順番: {day.order})")
-            
-            result['success'] = True
-            result['message'] = (
-                f"学校「{school.name}」の一括登録が完了しました。"
-                f"ユーザー: {result['users_created']}件、"
-                f"指導場所: {result['places_created']}件、"
-                f"曜日: {result['days_created']}件"
-            )
-            
+            result = create_school(units[0])
         except Exception as e:
             # トランザクションが自動的にロールバックされる
-            result['success'] = False
-            result['message'] = f"登録中にエラーが発生しました: {str(e)}"
-            raise serializers.ValidationError(result['message'])
-        
+            raise serializers.ValidationError(f"登録中にエラーが発生しました: {str(e)}")
+
+        result['success'] = True
+        result['message'] = (
+            f"学校「{units[0]['school']['学校名']}」の一括登録が完了しました。"
+            f"ユーザー: {result['users_created']}件、"
+            f"指導場所: {result['places_created']}件、"
+            f"曜日: {result['days_created']}件"
+        )
         return result
 
 
+class MultiSchoolUploadSerializer(serializers.Serializer):
+    """複数学校一括登録用シリアライザー（学校ごとの unit に分割）"""
+    file = serializers.FileField()
+
+    def validate_file(self, value):
+        """ファイル形式の検証"""
+        if not value.name.endswith(('.xlsx', '.xls')):
+            raise serializers.ValidationError("エクセルファイル(.xlsx, .xls)をアップロードしてください。")
+
+        # ファイルサイズ制限 (10MB)
+        if value.size > 10 * 1024 * 1024:
+            raise serializers.ValidationError("ファイルサイズは10MB以下にしてください。")
+
+        return value
+
+    def validate(self, data):
+        try:
+            sheets = pd.read_excel(data['file'], sheet_name=None)
+        except Exception as e:
+            raise serializers.ValidationError(f"エクセルファイルの読み込みに失敗しました: {str(e)}")
+
+        units, errors = split_workbook(sheets)
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        data['units'] = units
+        return data
+
+
 class ExcelTemplateSerializer(serializers.Serializer):
     """エクセルテンプレート生成用シリアライザー"""
     
@@ -369,4 +320,89 @@ class ExcelTemplateSerializer(serializers.Serializer):
             import traceback
             print(f"Template generation error: {str(e)}")
             print(f"Traceback: {traceback.format_exc()}")
-            raise serializers.ValidationError(f"テンプレート生成エラー: {str(e)}")
\ No newline at end of file
+            raise serializers.ValidationError(f"テンプレート生成エラー: {str(e)}")
+
+
+class FixedShiftImportSerializer(serializers.Serializer):
+    """固定シフト一括取り込み用シリアライザー（取り込み先の学校は context['school'] で渡す）"""
+    file = serializers.FileField()
+    mode = serializers.ChoiceField(choices=IMPORT_MODES, default='upsert')
+
+    # エラーが多い場合は先頭のみ返す
+    max_errors = 100
+
+    def validate_file(self, value):
+        """ファイル形式の検証"""
+        if not value.name.lower().endswith(('.xlsx', '.csv')):
+            raise serializers.ValidationError("エクセルファイル(.xlsx)またはCSVファイル(.csv)をアップロードしてください。")
+
+        # ファイルサイズ制限 (10MB)
+        if value.size > 10 * 1024 * 1024:
+            raise serializers.ValidationError("ファイルサイズは10MB以下にしてください。")
+
+        return value
+
+    def validate(self, data):
+        """名前の解決・講師の重複の検証と、登録内容の作成"""
+        school = self.context['school']
+        try:
+            shifts, errors, names = parse_fixed_shifts(school, data['file'])
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        except Exception as e:
+            raise serializers.ValidationError(f"ファイルの読み込みに失敗しました: {str(e)}")
+
+        if not errors:
+            plan = plan_fixed_shifts(school, shifts, data['mode'], names)
+            errors = plan.errors
+        if errors:
+            if len(errors) > self.max_errors:
+                errors = [*errors[:self.max_errors], f"ほか{len(errors) - self.max_errors}件のエラーがあります。"]
+            raise serializers.ValidationError(errors)
+
+        data['plan'] = plan
+        return data
+
+    def create(self, validated_data):
+        return apply_fixed_shifts(self.context['school'], validated_data['plan'])
+
+
+class RosterSyncSerializer(serializers.Serializer):
+    """名簿同期用シリアライザー（同期する学校は context['school'] で渡す）"""
+    file = serializers.FileField()
+    remove_missing = serializers.BooleanField(default=False)
+
+    # エラーが多い場合は先頭のみ返す
+    max_errors = 100
+
+    def validate_file(self, value):
+        """ファイル形式の検証"""
+        if not value.name.lower().endswith(('.xlsx', '.csv')):
+            raise serializers.ValidationError("エクセルファイル(.xlsx)またはCSVファイル(.csv)をアップロードしてください。")
+
+        # ファイルサイズ制限 (10MB)
+        if value.size > 10 * 1024 * 1024:
+            raise serializers.ValidationError("ファイルサイズは10MB以下にしてください。")
+
+        return value
+
+    def validate(self, data):
+        """現在の名簿との差分の作成"""
+        try:
+            plan = plan_roster(self.context['school'], data['file'], data['remove_missing'])
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        except Exception as e:
+            raise serializers.ValidationError(f"ファイルの読み込みに失敗しました: {str(e)}")
+
+        errors = plan.errors
+        if errors:
+            if len(errors) > self.max_errors:
+                errors = [*errors[:self.max_errors], f"ほか{len(errors) - self.max_errors}件のエラーがあります。"]
+            raise serializers.ValidationError(errors)
+
+        data['plan'] = plan
+        return data
+
+    def create(self, validated_data):
+        return apply_roster(self.context['school'], validated_data['plan'])
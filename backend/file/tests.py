@@ -1,3 +1,216 @@
-from django.test import TestCase
+import csv
+import io
+from datetime import time
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from account.models import CustomUser
+from config.models import Day, Place
+from school.models import School
+from shift.intervals import interval_index
+from shift.models import FixedShift
+
+from .exports import FIXED_SHIFT_COLUMNS, ROSTER_COLUMNS, roster_rows
+from .imports import apply_fixed_shifts, find_overlaps, parse_fixed_shifts, plan_fixed_shifts
+from .roster import apply_roster, plan_roster
+
+
+def csv_file(columns, rows, name='import.csv'):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    writer.writerows(rows)
+    return SimpleUploadedFile(name, output.getvalue().encode('utf-8'))
+
+
+class FindOverlapsTests(SimpleTestCase):
+    def test_interval_contained_in_earlier_interval(self):
+        # (0, 600) と (100, 200) が重なっていても、(300, 400) は (0, 600) と重なる
+        intervals = [(1, 0, 0, 600, 'a'), (1, 0, 100, 200, 'b'), (1, 0, 300, 400, 'c')]
+        self.assertEqual(find_overlaps(intervals), [(1, 'a', 'b'), (1, 'a', 'c')])
+
+    def test_different_teachers_and_weekdays_do_not_overlap(self):
+        intervals = [(1, 0, 0, 600, 'a'), (2, 0, 100, 200, 'b'), (1, 1, 100, 200, 'c'), (1, 0, 600, 700, 'd')]
+        self.assertEqual(find_overlaps(intervals), [])
+
+
+class RosterTests(TestCase):
+    def setUp(self):
+        self.school = School.objects.create(name='学校A')
+        self.other_school = School.objects.create(name='学校B')
+        self.place = Place.objects.create(name='教室A', school=self.school)
+        self.teacher = CustomUser.objects.create_user(
+            'teacher', email='teacher@example.com', password='pass',
+            last_name='山田', first_name='太郎', is_teacher=True,
+        )
+        self.teacher.schools.add(self.school)
+        self.teacher.place.add(self.place)
+        self.outsider = CustomUser.objects.create_user(
+            'outsider', email='outsider@example.com', password='pass',
+            last_name='鈴木', first_name='花子', is_teacher=True,
+        )
+        self.outsider.schools.add(self.other_school)
+
+    def plan(self, *rows):
+        return plan_roster(self.school, csv_file(ROSTER_COLUMNS, rows))
+
+    def test_member_is_updated(self):
+        plan = self.plan(['teacher', 'new@example.com', '山田', '次郎', '講師', '教室A', 'はい'])
+        self.assertEqual(plan.errors, [])
+        apply_roster(self.school, plan)
+
+        self.teacher.refresh_from_db()
+        self.assertEqual((self.teacher.email, self.teacher.first_name), ('new@example.com', '次郎'))
+
+    def test_non_member_is_joined_without_changes(self):
+        plan = self.plan(['outsider', 'outsider@example.com', '変更', '変更', '講師', '', 'いいえ'])
+        self.assertEqual(plan.errors, [])
+        self.assertEqual(plan.update, {})
+        apply_roster(self.school, plan)
+
+        self.outsider.refresh_from_db()
+        self.assertTrue(self.outsider.schools.filter(id=self.school.id).exists())
+        self.assertEqual((self.outsider.last_name, self.outsider.is_active), ('鈴木', True))
+
+    def test_non_member_with_other_email_is_rejected(self):
+        plan = self.plan(['outsider', 'attacker@example.com', '鈴木', '花子', '講師', '', 'いいえ'])
+        self.assertEqual(len(plan.errors), 1)
+        self.assertFalse(plan.has_changes())
+
+    def test_superuser_is_not_matched(self):
+        admin = CustomUser.objects.create_superuser('admin', email='admin@example.com', password='pass')
+        plan = self.plan(['admin', 'admin@example.com', '', '', '講師', '', 'いいえ'])
+        self.assertEqual(len(plan.errors), 1)
+        self.assertFalse(plan.has_changes())
+
+        admin.refresh_from_db()
+        self.assertTrue(admin.is_active)
+
+    def test_unchanged_roster_makes_no_writes(self):
+        plan = plan_roster(self.school, csv_file(ROSTER_COLUMNS, list(roster_rows(self.school))))
+        self.assertEqual(plan.errors, [])
+        self.assertFalse(plan.has_changes())
+
+        with CaptureQueriesContext(connection) as context:
+            statistics = apply_roster(self.school, plan)
+        writes = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE')
+        ]
+        self.assertEqual(writes, [])
+        self.assertEqual(statistics['unchanged'], 1)
+
+    def test_dry_run_is_parsed_strictly(self):
+        owner = CustomUser.objects.create_user('owner', email='owner@example.com', password='pass', is_owner=True)
+        owner.schools.add(self.school)
+        self.client.force_login(owner)
+        url = f'/api/file/import/roster/?school_id={self.school.id}'
+        row = ['teacher', 'new@example.com', '山田', '次郎', '講師', '教室A', 'はい']
+
+        def post(dry_run):
+            return self.client.post(url, {'file': csv_file(ROSTER_COLUMNS, [row]), 'dry_run': dry_run})
+
+        for value in ('True', 'yes'):
+            self.assertEqual(post(value).status_code, 200)
+        self.assertEqual(post('maybe').status_code, 400)
+        self.teacher.refresh_from_db()
+        self.assertEqual(self.teacher.first_name, '太郎')
+
+        self.assertEqual(post('false').status_code, 200)
+        self.teacher.refresh_from_db()
+        self.assertEqual(self.teacher.first_name, '次郎')
+
+
+class FixedShiftImportTests(TestCase):
+    def setUp(self):
+        self.school = School.objects.create(name='学校A')
+        self.other_school = School.objects.create(name='学校B')
+        self.day = Day.objects.create(name='月', order=0, school=self.school)
+        self.other_day = Day.objects.create(name='月曜日', order=0, school=self.other_school)
+        self.place = Place.objects.create(name='教室A', school=self.school)
+        self.other_place = Place.objects.create(name='教室B', school=self.other_school)
+        self.teacher = CustomUser.objects.create_user(
+            'teacher', email='teacher@example.com', password='pass', is_teacher=True
+        )
+        self.teacher.schools.add(self.school, self.other_school)
+        self.teacher.place.add(self.place, self.other_place)
+
+        self.kept = self.fixed_shift(self.place, self.day, (9, 0), (10, 0), '国語')
+        self.changed = self.fixed_shift(self.place, self.day, (10, 0), (11, 0), '数学')
+        self.missing = self.fixed_shift(self.place, self.day, (11, 0), (12, 0), '英語')
+
+    def fixed_shift(self, place, day, start, end, description='', teachers=()):
+        shift = FixedShift.objects.create(
+            place=place, day=day, start_time=time(*start), end_time=time(*end), description=description
+        )
+        shift.teacher.set(teachers)
+        interval_index.invalidate_all()
+        return shift
+
+    def plan(self, rows, mode='upsert'):
+        shifts, errors, names = parse_fixed_shifts(self.school, csv_file(FIXED_SHIFT_COLUMNS, rows))
+        self.assertEqual(errors, [])
+        return plan_fixed_shifts(self.school, shifts, mode, names)
+
+    def rows(self):
+        return [
+            ['月', '09:00', '10:00', '教室A', '国語', ''],
+            ['月', '10:00', '11:00', '教室A', '数学', 'teacher'],
+            ['月', '13:00', '14:00', '教室A', '理科', 'teacher'],
+        ]
+
+    def test_upsert_counts(self):
+        plan = self.plan(self.rows())
+        self.assertEqual(plan.errors, [])
+        statistics = apply_fixed_shifts(self.school, plan)
+
+        self.assertEqual(statistics, {'created': 1, 'updated': 1, 'unchanged': 1, 'deleted': 0})
+        self.assertEqual(list(self.changed.teacher.values_list('id', flat=True)), [self.teacher.id])
+        self.assertTrue(FixedShift.objects.filter(id=self.missing.id).exists())
+
+    def test_replace_deletes_missing_shifts(self):
+        statistics = apply_fixed_shifts(self.school, self.plan(self.rows(), mode='replace'))
+
+        self.assertEqual(statistics, {'created': 1, 'updated': 1, 'unchanged': 1, 'deleted': 1})
+        self.assertFalse(FixedShift.objects.filter(id=self.missing.id).exists())
+
+    def test_overlaps_within_sheet_and_other_school(self):
+        self.fixed_shift(self.other_place, self.other_day, (15, 0), (16, 0), teachers=[self.teacher])
+        plan = self.plan([
+            ['月', '09:00', '12:00', '教室A', '', 'teacher'],
+            ['月', '10:00', '10:30', '教室A', '', 'teacher'],
+            ['月', '11:00', '11:30', '教室A', '', 'teacher'],
+            ['月', '15:30', '16:30', '教室A', '', 'teacher'],
+        ])
+        self.assertEqual(len(plan.errors), 3)
+        self.assertIn('学校Bの月曜日 15:00-16:00', plan.errors[2])
+
+    def test_replaced_shift_does_not_overlap_itself(self):
+        self.changed.teacher.set([self.teacher])
+        interval_index.invalidate_all()
+        plan = self.plan([['月', '10:00', '11:00', '教室A', '数学（変更）', 'teacher']], mode='replace')
+        self.assertEqual(plan.errors, [])
+
+    def test_dry_run_is_parsed_strictly(self):
+        owner = CustomUser.objects.create_user('owner', email='owner@example.com', password='pass', is_owner=True)
+        owner.schools.add(self.school)
+        self.client.force_login(owner)
+        url = f'/api/file/import/fixed-shifts/?school_id={self.school.id}'
+
+        def post(dry_run):
+            return self.client.post(url, {'file': csv_file(FIXED_SHIFT_COLUMNS, self.rows()), 'dry_run': dry_run})
+
+        for value in ('True', 'yes', 'on'):
+            response = post(value)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['statistics']['created'], 1)
+        self.assertFalse(FixedShift.objects.filter(description='理科').exists())
+
+        self.assertEqual(post('maybe').status_code, 400)
+        self.assertFalse(FixedShift.objects.filter(description='理科').exists())
+
+        self.assertEqual(post('false').status_code, 201)
+        self.assertTrue(FixedShift.objects.filter(description='理科').exists())
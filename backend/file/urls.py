@@ -2,10 +2,12 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ExcelUploadViewSet
+from .views import ExcelUploadViewSet, ExportViewSet, ImportViewSet
 
 router = DefaultRouter()
 router.register('excel-upload', ExcelUploadViewSet, basename='excel-upload')
+router.register('export', ExportViewSet, basename='export')
+router.register('import', ImportViewSet, basename='import')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -5,9 +5,21 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
-from django.http import HttpResponse
-from permissions import IsAdminUser
-from .serializers import SchoolBulkCreateSerializer, ExcelTemplateSerializer
+from django.http import HttpResponse, FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from datetime import datetime
+from params import parse_bool
+from permissions import IsAdminUser, IsOwnerOrAdmin
+from school.models import School
+from .serializers import (
+    SchoolBulkCreateSerializer, MultiSchoolUploadSerializer, ExcelTemplateSerializer, FixedShiftImportSerializer,
+    RosterSyncSerializer
+)
+from .onboarding import import_schools
+from .exports import (
+    XLSX_CONTENT_TYPE, FIXED_SHIFT_COLUMNS, SHIFT_COLUMNS, ROSTER_COLUMNS,
+    fixed_shift_rows, shift_rows, roster_rows, csv_stream, xlsx_file
+)
 import pandas as pd
 
 
@@ -66,6 +78,54 @@ class ExcelUploadViewSet(viewsets.ViewSet):
                 'error': f'サーバーエラーが発生しました: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['post'], url_path='multi-upload')
+    def multi_upload_schools(self, request):
+        """
+        複数の学校の一括登録（学校ごとに検証・登録し、結果をまとめて返す）
+
+        POST /api/file/excel-upload/multi-upload/
+        dry_run: 1 の場合は検証のみ行う
+        """
+        if 'file' not in request.FILES:
+            return Response({
+                'success': False,
+                'error': 'ファイルが選択されていません。'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = MultiSchoolUploadSerializer(data={'file': request.FILES['file']})
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'error': 'データの検証に失敗しました。',
+                'validation_errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = request.data.get('dry_run') in ('1', 'true')
+        report = import_schools(serializer.validated_data['units'], dry_run=dry_run)
+        statistics = report['statistics']
+        success = statistics['schools_invalid'] == 0 and statistics['schools_failed'] == 0
+
+        if dry_run:
+            message = 'ファイルの検証に成功しました。' if success else 'ファイルの検証に失敗しました。'
+            response_status = status.HTTP_200_OK if success else status.HTTP_400_BAD_REQUEST
+        else:
+            message = (
+                f"{statistics['schools_total']}校中{statistics['schools_created']}校を登録しました。"
+                f"ユーザー: {statistics['users_created']}件、"
+                f"指導場所: {statistics['places_created']}件、"
+                f"曜日: {statistics['days_created']}件"
+            )
+            response_status = (
+                status.HTTP_201_CREATED if statistics['schools_created'] else status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'success': success,
+            'message': message,
+            'schools': report['schools'],
+            'statistics': statistics
+        }, status=response_status)
+
     @action(detail=False, methods=['get'], url_path='download-template')
     def download_template(self, request):
         """
@@ -264,7 +324,7 @@ class ExcelUploadViewSet(viewsets.ViewSet):
                 'ファイルサイズは10MB以下にしてください',
                 'シート名は上記の通りに正確に設定してください',
                 'すべての必須列を含む必要があります',
-                '1回のアップロードで1つの学校のみ登録できます',
+                '1回のアップロードで1つの学校のみ登録できます（複数の学校は multi-upload を使用し、学校情報シートに学校を並べ、他のシートの「学校名」列で学校を指定してください）',
                 'データに重複や不整合がある場合、アップロードは失敗します'
             ]
         }
@@ -272,4 +332,225 @@ class ExcelUploadViewSet(viewsets.ViewSet):
         return Response({
             'success': True,
             'format_guide': format_guide
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        }, status=status.HTTP_200_OK)
+
+
+class SchoolFileMixin:
+    """school_id で指定した学校の取り込み・エクスポート（オーナーは所属する学校のみ）"""
+
+    def get_school(self, request):
+        """school_id の学校（アクセスできない場合は None）"""
+        school_id = request.query_params.get('school_id') or request.data.get('school_id')
+        school = get_object_or_404(School, id=school_id or 0)
+        if request.user.is_superuser or request.user.schools.filter(id=school.id).exists():
+            return school
+        return None
+
+    def forbidden(self):
+        return Response({
+            'success': False,
+            'error': 'この学校にアクセスする権限がありません。'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+
+class ExportViewSet(SchoolFileMixin, viewsets.ViewSet):
+    """
+    時間割・名簿のエクスポート用ビューセット
+
+    output=csv で CSV（ストリーミング）、それ以外はエクセルファイルを返す。
+    オーナー（所属する学校のみ）と管理者がアクセス可能
+    """
+    permission_classes = [IsAuthenticated, IsOwnerOrAdmin]
+
+    def export(self, request, filename, title, columns, rows):
+        if request.query_params.get('output') == 'csv':
+            response = StreamingHttpResponse(csv_stream(columns, rows), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+            return response
+
+        return FileResponse(
+            xlsx_file(title, columns, rows),
+            as_attachment=True,
+            filename=f'{filename}.xlsx',
+            content_type=XLSX_CONTENT_TYPE
+        )
+
+    @action(detail=False, methods=['get'], url_path='fixed-shifts')
+    def fixed_shifts(self, request):
+        """
+        固定シフトの時間割
+
+        GET /api/file/export/fixed-shifts/?school_id=1
+        """
+        school = self.get_school(request)
+        if school is None:
+            return self.forbidden()
+        return self.export(
+            request, f'fixed_shifts_{school.id}', '固定シフト', FIXED_SHIFT_COLUMNS, fixed_shift_rows(school)
+        )
+
+    @action(detail=False, methods=['get'])
+    def shifts(self, request):
+        """
+        日付指定シフト（start_date〜end_date）
+
+        GET /api/file/export/shifts/?school_id=1&start_date=2024-04-01&end_date=2024-04-30
+        """
+        school = self.get_school(request)
+        if school is None:
+            return self.forbidden()
+
+        try:
+            start_date = datetime.strptime(request.query_params.get('start_date', ''), '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.query_params.get('end_date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': '開始日と終了日をYYYY-MM-DD形式で指定してください。'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date:
+            return Response({
+                'success': False,
+                'error': '終了日は開始日以降である必要があります。'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return self.export(
+            request, f'shifts_{school.id}_{start_date:%Y%m%d}_{end_date:%Y%m%d}', 'シフト',
+            SHIFT_COLUMNS, shift_rows(school, start_date, end_date)
+        )
+
+    @action(detail=False, methods=['get'])
+    def roster(self, request):
+        """
+        オーナー・講師の名簿
+
+        GET /api/file/export/roster/?school_id=1
+        """
+        school = self.get_school(request)
+        if school is None:
+            return self.forbidden()
+        return self.export(request, f'roster_{school.id}', '名簿', ROSTER_COLUMNS, roster_rows(school))
+
+
+class ImportViewSet(SchoolFileMixin, viewsets.ViewSet):
+    """
+    時間割・名簿の一括取り込み用ビューセット
+
+    オーナー（所属する学校のみ）と管理者がアクセス可能
+    """
+    permission_classes = [IsAuthenticated, IsOwnerOrAdmin]
+    parser_classes = [MultiPartParser, FormParser]
+
+    @action(detail=False, methods=['post'], url_path='fixed-shifts')
+    def fixed_shifts(self, request):
+        """
+        固定シフトの一括取り込み（エクスポートと同じ形式のエクセル・CSV）
+
+        POST /api/file/import/fixed-shifts/?school_id=1
+        file: 取り込むファイル
+        mode: upsert（既定、一致するシフトを更新して残りを追加）または replace（シートにないシフトを削除）
+        dry_run: 1 の場合は検証と件数の確認のみ行う
+        """
+        school = self.get_school(request)
+        if school is None:
+            return self.forbidden()
+
+        if 'file' not in request.FILES:
+            return Response({
+                'success': False,
+                'error': 'ファイルが選択されていません。'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            dry_run = parse_bool(request.data.get('dry_run', False))
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'dry_run は true または false で指定してください。'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = FixedShiftImportSerializer(data={
+            'file': request.FILES['file'],
+            'mode': request.data.get('mode') or 'upsert',
+        }, context={'school': school})
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'error': 'データの検証に失敗しました。',
+                'validation_errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if dry_run:
+            return Response({
+                'success': True,
+                'message': 'ファイルの検証に成功しました（登録は行っていません）。',
+                'statistics': serializer.validated_data['plan'].statistics()
+            }, status=status.HTTP_200_OK)
+
+        statistics = serializer.save()
+        return Response({
+            'success': True,
+            'message': f"固定シフトを取り込みました（追加 {statistics['created']}件・更新 {statistics['updated']}件・削除 {statistics['deleted']}件）。",
+            'statistics': statistics
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def roster(self, request):
+        """
+        名簿の同期（名簿エクスポートと同じ形式のエクセル・CSV）
+
+        POST /api/file/import/roster/?school_id=1
+        file: 取り込むファイル
+        remove_missing: 1 の場合は名簿にない講師を学校から外す
+        dry_run: 1 の場合は変更内容のプレビューのみ行う
+        """
+        school = self.get_school(request)
+        if school is None:
+            return self.forbidden()
+
+        if 'file' not in request.FILES:
+            return Response({
+                'success': False,
+                'error': 'ファイルが選択されていません。'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            dry_run = parse_bool(request.data.get('dry_run', False))
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'dry_run は true または false で指定してください。'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = RosterSyncSerializer(data={
+            'file': request.FILES['file'],
+            'remove_missing': request.data.get('remove_missing') or False,
+        }, context={'school': school})
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'error': 'データの検証に失敗しました。',
+                'validation_errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        plan = serializer.validated_data['plan']
+        if dry_run:
+            return Response({
+                'success': True,
+                'message': '名簿の変更内容です（反映は行っていません）。',
+                'changes': plan.changes,
+                'missing': plan.missing,
+                'statistics': plan.statistics()
+            }, status=status.HTTP_200_OK)
+
+        statistics = serializer.save()
+        return Response({
+            'success': True,
+            'message': (
+                f"名簿を同期しました（追加 {statistics['created']}件・更新 {statistics['updated']}件・"
+                f"所属追加 {statistics['joined']}件・所属解除 {statistics['removed']}件）。"
+                if plan.has_changes() else '名簿に変更はありません。'
+            ),
+            'changes': plan.changes,
+            'statistics': statistics
+        }, status=status.HTTP_200_OK)
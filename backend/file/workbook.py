@@ -0,0 +1,160 @@
+# file/workbook.py
+
+"""
+学校一括登録用エクセルファイルの学校ごとの分割と検証
+
+複数の学校をまとめる場合は学校情報シートに学校を並べ、ユーザー情報・指導場所・曜日設定シートの
+「学校名」列で各行の学校を指定する。学校が1つの場合は「学校名」列を省略できる。
+
+学校ごとの単位（unit）は dict とリストだけで表し、validate_unit はワーカープロセスで実行する。
+ワーカーで読み込まれるため、このモジュールは Django に依存しない（データベースを使う検証は onboarding で行う）。
+"""
+
+import pandas as pd
+
+
+SCHOOL_COLUMN = '学校名'
+SHEET_COLUMNS = {
+    '学校情報': ['学校名', '始業時間', '終業時間'],
+    'ユーザー情報': ['ユーザー名', 'メールアドレス', '姓', '名', '権限'],
+    '指導場所': ['指導場所名'],
+    '曜日設定': ['順番', '曜日名'],
+}
+# 学校ごとに分ける（学校情報以外の）シート -> unit のキー
+UNIT_SHEETS = {
+    'ユーザー情報': 'users',
+    '指導場所': 'places',
+    '曜日設定': 'days',
+}
+PERMISSIONS = ['オーナー', '講師']
+
+
+def _records(df):
+    """DataFrame を [{列名: 値, 'row': エクセルの行番号}, ...] に変換（空欄は None）"""
+    records = []
+    for index, record in enumerate(df.astype(object).where(df.notna(), None).to_dict('records')):
+        record = {
+            column: value.strip() if isinstance(value, str) else value
+            for column, value in record.items()
+        }
+        record['row'] = index + 2
+        records.append(record)
+    return records
+
+
+def split_workbook(sheets):
+    """
+    シートごとの DataFrame を学校ごとの unit に分割
+
+    戻り値は ([unit, ...], [ファイル全体のエラー, ...])。
+    unit: {'school': {...}, 'users': [...], 'places': [...], 'days': [...]}
+    """
+    missing_sheets = [sheet for sheet in SHEET_COLUMNS if sheet not in sheets]
+    if missing_sheets:
+        return [], [f"必要なシートが見つかりません: {', '.join(missing_sheets)}"]
+
+    errors = []
+    for sheet, columns in SHEET_COLUMNS.items():
+        missing_columns = [column for column in columns if column not in sheets[sheet].columns]
+        if missing_columns:
+            errors.append(f"{sheet}シートに必要な列が見つかりません: {', '.join(missing_columns)}")
+    if errors:
+        return [], errors
+
+    schools = _records(sheets['学校情報'])
+    if not schools:
+        return [], ['学校情報シートにデータがありません。']
+
+    units = {}
+    for school in schools:
+        name = school[SCHOOL_COLUMN]
+        if not name:
+            errors.append(f'学校情報シート {school["row"]}行目: 学校名が入力されていません。')
+        elif name in units:
+            errors.append(f'学校情報シートで学校「{name}」が重複しています。')
+        else:
+            units[name] = {'school': school, **{key: [] for key in UNIT_SHEETS.values()}}
+
+    single = next(iter(units)) if len(schools) == 1 and units else None
+    for sheet, key in UNIT_SHEETS.items():
+        has_school_column = SCHOOL_COLUMN in sheets[sheet].columns
+        if not has_school_column and single is None:
+            errors.append(f'複数の学校を登録する場合は{sheet}シートに「{SCHOOL_COLUMN}」列が必要です。')
+            continue
+        for record in _records(sheets[sheet]):
+            name = record.get(SCHOOL_COLUMN) if has_school_column else single
+            if name not in units:
+                errors.append(f'{sheet}シート {record["row"]}行目: 学校「{name}」が学校情報シートにありません。')
+                continue
+            units[name][key].append(record)
+
+    return list(units.values()), errors
+
+
+def _duplicates(values):
+    seen, duplicates = set(), []
+    for value in values:
+        if value in seen and value not in duplicates:
+            duplicates.append(value)
+        seen.add(value)
+    return duplicates
+
+
+def validate_unit(unit):
+    """1つの学校の内容の検証（データベースは参照しない）。エラーのリストを返す"""
+    errors = []
+    users, places, days = unit['users'], unit['places'], unit['days']
+
+    # ユーザー情報
+    if not users:
+        errors.append('ユーザー情報シートにデータがありません。')
+    for user in users:
+        missing = [column for column in SHEET_COLUMNS['ユーザー情報'] if user.get(column) is None]
+        if missing:
+            errors.append(f"ユーザー情報シート {user['row']}行目: {', '.join(missing)}が入力されていません。")
+
+    invalid_permissions = list(dict.fromkeys(
+        user['権限'] for user in users if user['権限'] not in PERMISSIONS
+    ))
+    if invalid_permissions:
+        errors.append(
+            f"無効な権限が指定されています: {', '.join(map(str, invalid_permissions))}。"
+            f"有効な値: {', '.join(PERMISSIONS)}"
+        )
+
+    duplicates = _duplicates(user['ユーザー名'] for user in users)
+    if duplicates:
+        errors.append(f"ユーザー情報シートで重複するユーザー名があります: {', '.join(map(str, duplicates))}")
+    email_duplicates = _duplicates(user['メールアドレス'] for user in users)
+    if email_duplicates:
+        errors.append(f"ユーザー情報シートで重複するメールアドレスがあります: {', '.join(map(str, email_duplicates))}")
+
+    owners = sum(1 for user in users if user['権限'] == 'オーナー')
+    if owners == 0:
+        errors.append('オーナーが設定されていません。1人のオーナーが必要です。')
+    elif owners > 1:
+        errors.append(f'オーナーは1人のみ設定できます。現在{owners}人のオーナーが設定されています。')
+    if not any(user['権限'] == '講師' for user in users):
+        errors.append('講師が設定されていません。少なくとも1人の講師が必要です。')
+
+    # 指導場所
+    if not places:
+        errors.append('指導場所シートにデータがありません。')
+    duplicates = _duplicates(place['指導場所名'] for place in places)
+    if duplicates:
+        errors.append(f"指導場所シートで重複する指導場所名があります: {', '.join(map(str, duplicates))}")
+
+    # 曜日設定
+    if not days:
+        errors.append('曜日設定シートにデータがありません。')
+    for day in days:
+        if pd.isna(pd.to_numeric(day['順番'], errors='coerce')):
+            errors.append(f"曜日設定シート {day['row']}行目: 順番は数値で入力してください。")
+    duplicated_orders = _duplicates(day['順番'] for day in days)
+    if duplicated_orders:
+        errors.append(f"曜日設定シートで重複する順番があります: {', '.join(map(str, duplicated_orders))}")
+    duplicated_days = _duplicates(day['曜日名'] for day in days)
+    if duplicated_days:
+        errors.append(f"曜日設定シートで重複する曜日名があります: {', '.join(map(str, duplicated_days))}")
+
+    return errors
@@ -0,0 +1,22 @@
+# backend/params.py
+
+"""
+リクエストのパラメーターの解釈
+
+bool() では文字列の 'false' も真になるため、真偽値は parse_bool で厳密に解釈する。
+"""
+
+from rest_framework.fields import BooleanField
+
+
+def parse_bool(value):
+    """JSON の真偽値・'true' / 'false'・1 / 0 などを真偽値に変換（それ以外は ValueError）"""
+    try:
+        if value in BooleanField.TRUE_VALUES:
+            return True
+        if value in BooleanField.FALSE_VALUES:
+            return False
+    except TypeError:
+        # リストなどハッシュできない値
+        pass
+    raise ValueError(value)
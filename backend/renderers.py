@@ -0,0 +1,43 @@
+# backend/renderers.py
+
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    orjsonを使った高速JSONレンダラー
+
+    標準のJSONRendererと同じ出力になるよう、日時・Decimal・遅延文字列などの
+    変換はDRFのJSONEncoderに任せる。
+    NumPy 配列はそのまま配列としてシリアライズする。
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+
+    def __init__(self):
+        self._encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        options = self.options
+        if self.get_indent(accepted_media_type):
+            options |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=self._encoder.default, option=options)
+
+    def get_indent(self, accepted_media_type):
+        """Acceptヘッダーで indent が指定されているか"""
+        if not accepted_media_type:
+            return False
+        for param in accepted_media_type.split(';')[1:]:
+            key, _, value = param.strip().partition('=')
+            if key == 'indent' and value:
+                return True
+        return False
@@ -1,9 +1,11 @@
 # school/serializers.py
 
 from rest_framework import serializers
+
+from fieldsets import SparseFieldsetMixin
 from school.models import School
 
-class SchoolSerializer(serializers.ModelSerializer):
+class SchoolSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """学校のシリアライザー"""
     
     class Meta:
@@ -0,0 +1,219 @@
+# search/autocomplete.py
+
+"""
+講師・オーナーのオートコンプリート（プロセス内の前方一致インデックス）
+
+学校ごとに (正規化済みキー, ユーザーID) のソート済み配列を持ち、二分探索で前方一致を返す。
+インデックスは初回検索時に読み込み、CustomUser の変更はシグナルから差分で反映する。
+他のプロセスでの変更は AUTOCOMPLETE_INDEX_TTL 秒ごとの再読み込みで反映される。
+DBからの読み込みはロックの外で行い、読み込み中も他の学校の検索や再読み込み前のインデックスでの検索は待たせない。
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Q
+
+from account.models import CustomUser
+from account.payloads import full_name
+from .normalize import normalize
+
+
+def normalize_key(text):
+    """検索キー（正規化して空白を除去）"""
+    return ''.join(normalize(text).split())
+
+
+def keys_for(user):
+    """姓・名・姓名・名姓・ユーザー名の各キー"""
+    first_name, last_name = user['first_name'] or '', user['last_name'] or ''
+    keys = {
+        normalize_key(value)
+        for value in (last_name, first_name, last_name + first_name, first_name + last_name, user['username'])
+    }
+    keys.discard('')
+    return keys
+
+
+class SchoolPrefixIndex:
+    """1校分の前方一致インデックス"""
+
+    def __init__(self, school_id, users):
+        self.school_id = school_id
+        self.built_at = time.monotonic()
+        self.users = {user['id']: user for user in users}
+        # (key, user_id) の昇順（読み込み時は1回だけ並べ替える）
+        self.entries = sorted((key, user_id) for user_id, user in self.users.items() for key in keys_for(user))
+
+    def add(self, user):
+        self.users[user['id']] = user
+        for key in keys_for(user):
+            insort(self.entries, (key, user['id']))
+
+    def remove(self, user_id):
+        user = self.users.pop(user_id, None)
+        if user is None:
+            return
+        for key in keys_for(user):
+            index = bisect_left(self.entries, (key, user_id))
+            if index < len(self.entries) and self.entries[index] == (key, user_id):
+                del self.entries[index]
+
+    def search(self, key, limit, place_id=None):
+        results = {}
+        index = bisect_left(self.entries, (key,))
+        while index < len(self.entries) and len(results) < limit:
+            entry_key, user_id = self.entries[index]
+            if not entry_key.startswith(key):
+                break
+            user = self.users[user_id]
+            # オーナーは全ての場所で指導可能
+            if place_id is None or user['is_owner'] or place_id in user['place_ids']:
+                results.setdefault(user_id, user)
+            index += 1
+        return list(results.values())
+
+
+def load_users(user_ids=None, school_ids=None):
+    """
+    インデックス用のユーザー情報を読み込む
+
+    {user_id: (ユーザー情報, 所属学校IDの集合)}、場所IDは学校ごとに {school_id: [place_id, ...]}
+    """
+    users = CustomUser.objects.filter(is_active=True).filter(Q(is_teacher=True) | Q(is_owner=True))
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    if school_ids is not None:
+        users = users.filter(schools__id__in=school_ids).distinct()
+
+    rows = {
+        user_id: {
+            'id': user_id,
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+            'full_name': full_name(username, first_name, last_name),
+            'is_teacher': is_teacher,
+            'is_owner': is_owner,
+        }
+        for user_id, username, first_name, last_name, is_teacher, is_owner in users.values_list(
+            'id', 'username', 'first_name', 'last_name', 'is_teacher', 'is_owner'
+        )
+    }
+
+    schools = {}
+    memberships = CustomUser.schools.through.objects.filter(customuser_id__in=rows)
+    if school_ids is not None:
+        memberships = memberships.filter(school_id__in=school_ids)
+    for user_id, school_id in memberships.values_list('customuser_id', 'school_id'):
+        schools.setdefault(user_id, set()).add(school_id)
+
+    places = {}
+    for user_id, place_id, school_id in CustomUser.place.through.objects.filter(
+        customuser_id__in=rows
+    ).values_list('customuser_id', 'place_id', 'place__school_id'):
+        places.setdefault((user_id, school_id), []).append(place_id)
+
+    return rows, schools, places
+
+
+class AutocompleteRegistry:
+    """学校ごとのインデックスを保持（プロセス内で共有）"""
+
+    def __init__(self):
+        self._indexes = {}
+        # インデックスの参照・入れ替え・差分の反映（DBの読み込み中は保持しない）
+        self._lock = threading.RLock()
+        # 学校ごとの読み込み（同じ学校は同時に1つのスレッドだけが読み込む）
+        self._build_locks = defaultdict(threading.Lock)
+        # ユーザーの差分の反映（読み込みと反映の順序を保つ）
+        self._refresh_lock = threading.Lock()
+        # 読み込み中の学校 -> 読み込み中に変更されたユーザーID（入れ替え後に反映する）
+        self._changed = {}
+
+    def _build(self, school_id):
+        rows, schools, places = load_users(school_ids=[school_id])
+        return SchoolPrefixIndex(school_id, [
+            {**user, 'place_ids': places.get((user_id, school_id), [])}
+            for user_id, user in rows.items() if school_id in schools.get(user_id, ())
+        ])
+
+    def get(self, school_id):
+        ttl = getattr(settings, 'AUTOCOMPLETE_INDEX_TTL', 300)
+        with self._lock:
+            index = self._indexes.get(school_id)
+            build_lock = self._build_locks[school_id]
+        if index is not None and time.monotonic() - index.built_at <= ttl:
+            return index
+
+        # 期限切れのインデックスがあれば、他のスレッドが読み込み中はそれを使う
+        if not build_lock.acquire(blocking=index is None):
+            return index
+        try:
+            with self._lock:
+                current = self._indexes.get(school_id)
+                if current is not None and current is not index:
+                    # 待っている間に他のスレッドが読み込んだ
+                    return current
+                self._changed[school_id] = set()
+            try:
+                built = self._build(school_id)
+            finally:
+                with self._lock:
+                    changed = self._changed.pop(school_id)
+            with self._lock:
+                self._indexes[school_id] = built
+            if changed:
+                self.refresh_users(changed)
+            return built
+        finally:
+            build_lock.release()
+
+    def search(self, school_id, query, limit=10, place_id=None):
+        key = normalize_key(query)
+        if not key:
+            return []
+        index = self.get(school_id)
+        with self._lock:
+            return index.search(key, limit, place_id)
+
+    def refresh_users(self, user_ids):
+        """読み込み済みのインデックスにユーザーの変更を反映"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        with self._refresh_lock:
+            with self._lock:
+                for changed in self._changed.values():
+                    changed.update(user_ids)
+                if not self._indexes:
+                    return
+            rows, schools, places = load_users(user_ids=user_ids)
+            with self._lock:
+                for school_id, index in self._indexes.items():
+                    for user_id in user_ids:
+                        index.remove(user_id)
+                        if user_id in rows and school_id in schools.get(user_id, ()):
+                            index.add({**rows[user_id], 'place_ids': places.get((user_id, school_id), [])})
+
+    def remove_users(self, user_ids):
+        with self._lock:
+            for changed in self._changed.values():
+                changed.update(user_ids)
+            for index in self._indexes.values():
+                for user_id in user_ids:
+                    index.remove(user_id)
+
+    def remove_school(self, school_id):
+        with self._lock:
+            self._indexes.pop(school_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+autocomplete = AutocompleteRegistry()
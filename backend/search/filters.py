@@ -0,0 +1,27 @@
+# search/filters.py
+
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+from .index import search_queryset, search_scope
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    検索インデックスを使う SearchFilter
+
+    ビューの search_kind（'user' / 'fixed_shift'）の文書を検索し、ランク順に並べる。
+    ordering パラメータが指定された場合はその並び順を優先するため、OrderingFilter より後に置く。
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        kind = getattr(view, 'search_kind', None)
+        if kind is None:
+            return super().filter_queryset(request, queryset, view)
+
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+
+        rank = not request.query_params.get(api_settings.ORDERING_PARAM)
+        return search_queryset(queryset, kind, query, school_ids=search_scope(request.user), rank=rank)
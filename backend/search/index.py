@@ -0,0 +1,366 @@
+# search/index.py
+
+"""
+検索インデックス
+
+ユーザー・固定シフトの検索対象文字列を正規化して SearchDocument に保存し、
+データベースに応じたバックエンドで一致する対象に queryset を絞り込み、ランク順に並べる。
+一致する対象はサブクエリで絞り込むため件数の上限はなく、ビューの他の絞り込み・ページングと同じクエリで処理される。
+SQLite では関連度順に並べるのは上位 SEARCH_RANKED_RESULTS 件までで、それ以降はID順になる。
+
+- SQLite: FTS5 仮想テーブル（2文字組トークン、bm25 でランク付け）
+- PostgreSQL: pg_trgm のトライグラムインデックス（similarity でランク付け）
+- その他: 正規化済み文字列への部分一致
+"""
+
+from functools import reduce
+from operator import or_
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.expressions import RawSQL
+
+from .normalize import normalize, words, bigrams, tokenize
+
+
+FTS_TABLE = 'search_document_fts'
+CHUNK_SIZE = 500
+
+
+def _chunks(values, size=CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _scope(school_ids):
+    return ''.join(f' s{school_id}' for school_id in sorted(set(school_ids))) + ' ' if school_ids else ''
+
+
+def _order_by_ids(queryset, ids):
+    """ids の順に並べ、ids に含まれない対象はその後にID順で並べる"""
+    if not ids:
+        return queryset.order_by('pk')
+    position = Case(
+        *[When(pk=pk, then=Value(index)) for index, pk in enumerate(ids)],
+        default=Value(len(ids)), output_field=IntegerField()
+    )
+    return queryset.order_by(position, 'pk')
+
+
+def _name_terms(first_name, last_name):
+    # 「山田 太郎」「山田太郎」のどちらでも一致させる（ユーザー名は氏名ではないため text に入れる）
+    return f"{last_name or ''} {first_name or ''} {last_name or ''}{first_name or ''}"
+
+
+def build_user_documents(object_ids, apps=global_apps):
+    """{user_id: (name, text, scope)}"""
+    User = apps.get_model('account', 'CustomUser')
+
+    schools = {}
+    for user_id, school_id in User.schools.through.objects.filter(
+        customuser_id__in=object_ids
+    ).values_list('customuser_id', 'school_id'):
+        schools.setdefault(user_id, []).append(school_id)
+
+    return {
+        user_id: (
+            normalize(_name_terms(first_name, last_name)),
+            normalize(f'{username} {email}'),
+            _scope(schools.get(user_id, ())),
+        )
+        for user_id, username, first_name, last_name, email in User.objects.filter(
+            id__in=object_ids
+        ).values_list('id', 'username', 'first_name', 'last_name', 'email')
+    }
+
+
+def build_fixed_shift_documents(object_ids, apps=global_apps):
+    """{fixed_shift_id: (講師名, 内容・講師のユーザー名, scope)}"""
+    FixedShift = apps.get_model('shift', 'FixedShift')
+
+    teachers, usernames = {}, {}
+    for shift_id, username, first_name, last_name in FixedShift.teacher.through.objects.filter(
+        fixedshift_id__in=object_ids
+    ).values_list('fixedshift_id', 'customuser__username', 'customuser__first_name', 'customuser__last_name'):
+        teachers.setdefault(shift_id, []).append(_name_terms(first_name, last_name))
+        usernames.setdefault(shift_id, []).append(username)
+
+    return {
+        shift_id: (
+            normalize(' '.join(teachers.get(shift_id, ()))),
+            normalize(f"{description or ''} {' '.join(usernames.get(shift_id, ()))}"),
+            _scope([school_id]),
+        )
+        for shift_id, description, school_id in FixedShift.objects.filter(
+            id__in=object_ids
+        ).values_list('id', 'description', 'place__school_id')
+    }
+
+
+BUILDERS = {
+    'user': build_user_documents,
+    'fixed_shift': build_fixed_shift_documents,
+}
+
+SOURCES = {
+    'user': ('account', 'CustomUser'),
+    'fixed_shift': ('shift', 'FixedShift'),
+}
+
+
+class BaseSearchBackend:
+    """SearchDocument の変更を検索用の構造へ反映し、検索する"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self):
+        pass
+
+    def drop(self):
+        pass
+
+    def write(self, rows):
+        """rows: [(document_id, name, text, scope), ...]"""
+        pass
+
+    def delete(self, document_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def filter(self, queryset, kind, terms, field, school_ids, rank):
+        """queryset を一致する対象に絞り込む（rank が真ならランク順に並べる）"""
+        raise NotImplementedError
+
+
+class LikeBackend(BaseSearchBackend):
+    """正規化済み文字列への部分一致（ランク付けなし）"""
+
+    def documents(self, kind, terms, field, school_ids):
+        from .models import SearchDocument
+
+        documents = SearchDocument.objects.using(self.connection.alias).filter(kind=kind)
+        for term in terms:
+            condition = Q(name__contains=term)
+            if field is None:
+                condition |= Q(text__contains=term)
+            documents = documents.filter(condition)
+        if school_ids is not None:
+            documents = documents.filter(
+                reduce(or_, [Q(scope__contains=f' s{school_id} ') for school_id in school_ids])
+            )
+        return documents
+
+    def rank_value(self, terms, field):
+        """文書のランク（大きいほど上位、None はランク付けなし）"""
+        return None
+
+    def filter(self, queryset, kind, terms, field, school_ids, rank):
+        documents = self.documents(kind, terms, field, school_ids)
+        queryset = queryset.filter(pk__in=documents.values('object_id'))
+        if not rank:
+            return queryset
+        rank_value = self.rank_value(terms, field)
+        if rank_value is None:
+            return queryset.order_by('pk')
+        ranks = documents.filter(object_id=OuterRef('pk')).annotate(rank=rank_value).values('rank')[:1]
+        return queryset.annotate(search_rank=Subquery(ranks)).order_by('-search_rank', 'pk')
+
+
+class TrigramBackend(LikeBackend):
+    """PostgreSQL（pg_trgm）: トライグラムインデックスで部分一致し、類似度でランク付け"""
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for column in ('name', 'text'):
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS search_document_{column}_trgm '
+                    f'ON search_searchdocument USING gin ({column} gin_trgm_ops)'
+                )
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            for column in ('name', 'text'):
+                cursor.execute(f'DROP INDEX IF EXISTS search_document_{column}_trgm')
+
+    def rank_value(self, terms, field):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        query = ' '.join(terms)
+        rank = TrigramSimilarity('name', query)
+        if field is None:
+            rank = rank + TrigramSimilarity('text', query)
+        return rank
+
+
+class FTS5Backend(BaseSearchBackend):
+    """SQLite: FTS5 仮想テーブル（rowid = SearchDocument.id）"""
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                f'USING fts5(name, text, scope, tokenize="unicode61 remove_diacritics 0")'
+            )
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+    def write(self, rows):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, text, scope) VALUES (%s, %s, %s, %s)',
+                [(document_id, tokenize(name), tokenize(text), scope) for document_id, name, text, scope in rows]
+            )
+
+    def delete(self, document_ids):
+        with self.connection.cursor() as cursor:
+            for chunk in _chunks(document_ids):
+                cursor.execute(
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(chunk))})", chunk
+                )
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def match_expression(self, terms, field, school_ids):
+        tokens = []
+        for term in terms:
+            if len(term) == 1:
+                tokens.append(f'"{term}"*')
+            else:
+                tokens.extend(f'"{gram}"' for gram in dict.fromkeys(bigrams(term)))
+        columns = field or 'name text'
+        expression = f"{{{columns}}} : ({' AND '.join(tokens)})"
+        if school_ids is not None:
+            schools = ' OR '.join(f'"s{school_id}"' for school_id in school_ids)
+            expression += f' AND scope : ({schools})'
+        return expression
+
+    def filter(self, queryset, kind, terms, field, school_ids, rank):
+        # 2文字組の一致だけでは語順を問わないため、正規化済み文字列への部分一致でも確認する
+        haystack = 'd.name' if field == 'name' else "d.name || ' ' || d.text"
+        # CROSS JOIN で FTS5 から読ませる（逆順では文書ごとに rowid を指定した全文検索になり遅い）
+        matches = (
+            f'SELECT d.object_id FROM {FTS_TABLE} f '
+            f'CROSS JOIN search_searchdocument d ON d.id = f.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND d.kind = %s '
+            + ''.join(f'AND instr({haystack}, %s) > 0 ' for _ in terms)
+        )
+        params = [self.match_expression(terms, field, school_ids), kind, *terms]
+        matched = queryset.filter(pk__in=RawSQL(matches, params))
+        if not rank:
+            return matched
+
+        # bm25 は検索ごとに全体の統計を求めるため行ごとには計算せず、ビューの絞り込みを含めた
+        # 1回の検索で上位の対象を求めて並べる（それ以降はID順）
+        try:
+            visible, visible_params = queryset.order_by().values('pk').query.sql_with_params()
+        except EmptyResultSet:
+            return matched
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'{matches}AND d.object_id IN ({visible}) '
+                f'ORDER BY bm25({FTS_TABLE}, 2.0, 1.0, 0.0), d.object_id LIMIT %s',
+                [*params, *visible_params, getattr(settings, 'SEARCH_RANKED_RESULTS', 200)]
+            )
+            return _order_by_ids(matched, [row[0] for row in cursor.fetchall()])
+
+
+BACKENDS = {
+    'sqlite': FTS5Backend,
+    'postgresql': TrigramBackend,
+}
+
+
+def get_backend(using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, LikeBackend)(connection)
+
+
+def index_objects(kind, object_ids, apps=global_apps, using=DEFAULT_DB_ALIAS):
+    """対象の文書を作成・更新（存在しなくなった対象は削除）"""
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    backend = get_backend(using)
+
+    for chunk in _chunks(set(object_ids)):
+        documents = BUILDERS[kind](chunk, apps=apps)
+        missing = [object_id for object_id in chunk if object_id not in documents]
+        if missing:
+            remove_objects(kind, missing, apps=apps, using=using)
+        if not documents:
+            continue
+
+        with transaction.atomic(using=using):
+            existing = {
+                document.object_id: document
+                for document in SearchDocument.objects.using(using).filter(kind=kind, object_id__in=documents)
+            }
+            created = []
+            for object_id, (name, text, scope) in documents.items():
+                document = existing.get(object_id)
+                if document is None:
+                    created.append(SearchDocument(kind=kind, object_id=object_id, name=name, text=text, scope=scope))
+                else:
+                    document.name, document.text, document.scope = name, text, scope
+
+            SearchDocument.objects.using(using).bulk_update(existing.values(), ['name', 'text', 'scope', 'updated_at'])
+            created = SearchDocument.objects.using(using).bulk_create(created)
+
+            backend.write([
+                (document.id, document.name, document.text, document.scope)
+                for document in [*existing.values(), *created]
+            ])
+
+
+def remove_objects(kind, object_ids, apps=global_apps, using=DEFAULT_DB_ALIAS):
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    backend = get_backend(using)
+
+    for chunk in _chunks(set(object_ids)):
+        documents = SearchDocument.objects.using(using).filter(kind=kind, object_id__in=chunk)
+        backend.delete(list(documents.values_list('id', flat=True)))
+        documents.delete()
+
+
+def rebuild_index(kinds=None, apps=global_apps, using=DEFAULT_DB_ALIAS):
+    """インデックスを全件作り直す（シグナルを通らない一括登録の後に使用）"""
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    backend = get_backend(using)
+
+    for kind in kinds or BUILDERS:
+        documents = SearchDocument.objects.using(using).filter(kind=kind)
+        backend.delete(list(documents.values_list('id', flat=True)))
+        documents.delete()
+
+        Model = apps.get_model(*SOURCES[kind])
+        index_objects(kind, Model.objects.using(using).values_list('id', flat=True), apps=apps, using=using)
+
+
+def search_queryset(queryset, kind, query, field=None, school_ids=None, rank=True):
+    """
+    queryset を検索語に一致する対象に絞り込み、rank が真ならランク順に並べる
+
+    field='name' の場合は氏名（固定シフトは講師名）のみを対象にする。
+    school_ids を指定した場合はその学校に属する対象のみ。
+    """
+    terms = list(dict.fromkeys(words(query)))
+    if not terms or school_ids is not None and not school_ids:
+        return queryset.none()
+    return get_backend(queryset.db).filter(queryset, kind, terms, field, school_ids, rank)
+
+
+def search_scope(user):
+    """ユーザーが検索できる学校ID（管理者は制限なし）"""
+    if user.is_superuser:
+        return None
+    return list(user.schools.values_list('id', flat=True))
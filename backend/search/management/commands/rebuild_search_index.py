@@ -0,0 +1,20 @@
+# search/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand
+
+from search.index import BUILDERS, rebuild_index
+from search.models import SearchDocument
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index (after bulk imports that bypass signals)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=list(BUILDERS), action='append', dest='kinds', help='Only rebuild this kind (repeatable)')
+
+    def handle(self, *args, **options):
+        rebuild_index(options['kinds'])
+
+        for kind in options['kinds'] or BUILDERS:
+            count = SearchDocument.objects.filter(kind=kind).count()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt search index for {kind}: {count} documents'))
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:28
+
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    from search.index import get_backend, rebuild_index
+
+    alias = schema_editor.connection.alias
+    get_backend(alias).create()
+    rebuild_index(apps=apps, using=alias)
+
+
+def drop_search_index(apps, schema_editor):
+    from search.index import get_backend
+
+    get_backend(schema_editor.connection.alias).drop()
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('account', '0002_remove_customuser_is_admin'),
+        ('shift', '0003_timeslot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'ユーザー'), ('fixed_shift', '固定シフト')], max_length=20, verbose_name='対象')),
+                ('object_id', models.BigIntegerField(verbose_name='対象ID')),
+                ('name', models.TextField(blank=True, verbose_name='氏名')),
+                ('text', models.TextField(blank=True, verbose_name='その他の検索対象')),
+                ('scope', models.TextField(blank=True, verbose_name='学校')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': '検索文書',
+                'verbose_name_plural': '検索文書',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
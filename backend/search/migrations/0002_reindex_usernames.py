@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:00
+
+from django.db import migrations
+
+
+def rebuild_search_index(apps, schema_editor):
+    # ユーザー名を氏名（name）から text へ移したため作り直す
+    from search.index import rebuild_index
+
+    rebuild_index(apps=apps, using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# search/models.py
+
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    検索インデックスの文書（正規化済みの検索対象文字列）
+
+    SQLite では FTS5 仮想テーブル、PostgreSQL ではトライグラムインデックスから参照される。
+    """
+    KIND_CHOICES = [
+        ('user', 'ユーザー'),
+        ('fixed_shift', '固定シフト'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="対象")
+    object_id = models.BigIntegerField(verbose_name="対象ID")
+    name = models.TextField(blank=True, verbose_name="氏名")
+    text = models.TextField(blank=True, verbose_name="その他の検索対象")
+    # 所属学校（" s1 s2 " 形式）
+    scope = models.TextField(blank=True, verbose_name="学校")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    class Meta:
+        verbose_name = "検索文書"
+        verbose_name_plural = "検索文書"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}#{self.object_id}"
@@ -0,0 +1,45 @@
+# search/normalize.py
+
+"""
+検索用の文字列正規化
+
+全角・半角の統一（NFKC）、小文字化、カタカナのひらがな化を行い、
+「ﾔﾏﾀﾞ」「ヤマダ」「やまだ」や「ＡＢＣ」「abc」を同じ文字列として扱う。
+"""
+
+import re
+import unicodedata
+
+
+# カタカナ（ァ〜ヶ）-> ひらがな
+KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def normalize(text):
+    if not text:
+        return ''
+    return unicodedata.normalize('NFKC', text).lower().translate(KATAKANA_TO_HIRAGANA)
+
+
+def words(text):
+    """正規化した単語の一覧（空白・記号で分割）"""
+    return WORD_PATTERN.findall(normalize(text))
+
+
+def bigrams(word):
+    return [word[i:i + 2] for i in range(len(word) - 1)]
+
+
+def tokenize(text):
+    """
+    索引用のトークン列
+
+    日本語は単語の区切りが無いため、各単語を2文字組に分割し、末尾の1文字も加える
+    （1文字の検索は前方一致で全ての位置に一致させるため）。
+    """
+    tokens = []
+    for word in words(text):
+        tokens.extend(bigrams(word))
+        tokens.append(word[-1])
+    return ' '.join(tokens)
@@ -0,0 +1,135 @@
+# search/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from account.models import CustomUser
+from config.models import Place
+from school.models import School
+from shift.models import FixedShift
+from .index import index_objects, remove_objects
+from .autocomplete import autocomplete
+
+
+# 検索対象に含まれるユーザーのフィールド（last_login のみの更新などは無視）
+USER_SEARCH_FIELDS = {'username', 'first_name', 'last_name', 'email'}
+USER_AUTOCOMPLETE_FIELDS = {'username', 'first_name', 'last_name', 'is_active', 'is_teacher', 'is_owner'}
+
+
+def _changed_user_ids(instance, action, reverse, pk_set, cleared_attr):
+    """ユーザー側の多対多変更で影響を受けるユーザーID（reverse はユーザー以外からの変更）"""
+    if not reverse:
+        return [instance.id]
+    if action == 'post_clear':
+        return getattr(instance, cleared_attr, [])
+    return list(pk_set or ())
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not USER_SEARCH_FIELDS & set(update_fields):
+        return
+    index_objects('user', [instance.id])
+    if not created:
+        # 講師名を含む固定シフトも更新
+        index_objects('fixed_shift', instance.fixed_shifts.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=CustomUser)
+def user_pre_delete(sender, instance, **kwargs):
+    # 中間テーブルの行はシグナルなしで削除されるため、対象の固定シフトを事前に記録
+    instance._search_fixed_shift_ids = list(instance.fixed_shifts.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    remove_objects('user', [instance.id])
+    index_objects('fixed_shift', getattr(instance, '_search_fixed_shift_ids', []))
+
+
+@receiver(m2m_changed, sender=CustomUser.schools.through)
+def user_schools_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """所属学校の変更（検索範囲）"""
+    if action == 'pre_clear' and reverse:
+        instance._search_cleared_user_ids = list(instance.customuser_set.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    index_objects('user', _changed_user_ids(instance, action, reverse, pk_set, '_search_cleared_user_ids'))
+
+
+@receiver(post_save, sender=FixedShift)
+def fixed_shift_saved(sender, instance, **kwargs):
+    index_objects('fixed_shift', [instance.id])
+
+
+@receiver(post_delete, sender=FixedShift)
+def fixed_shift_deleted(sender, instance, **kwargs):
+    remove_objects('fixed_shift', [instance.id])
+
+
+@receiver(m2m_changed, sender=FixedShift.teacher.through)
+def fixed_shift_teachers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """担当講師の変更（講師名）"""
+    if action == 'pre_clear' and reverse:
+        instance._search_cleared_shift_ids = list(instance.fixed_shifts.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        shift_ids = pk_set if action != 'post_clear' else getattr(instance, '_search_cleared_shift_ids', [])
+    else:
+        shift_ids = [instance.id]
+    index_objects('fixed_shift', shift_ids)
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved_autocomplete(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not USER_AUTOCOMPLETE_FIELDS & set(update_fields):
+        return
+    user_ids = [instance.id]
+    transaction.on_commit(lambda: autocomplete.refresh_users(user_ids))
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted_autocomplete(sender, instance, **kwargs):
+    # 削除後は instance.id が None になるため先に取得
+    user_ids = [instance.id]
+    transaction.on_commit(lambda: autocomplete.remove_users(user_ids))
+
+
+@receiver(m2m_changed, sender=CustomUser.schools.through)
+@receiver(m2m_changed, sender=CustomUser.place.through)
+def user_relations_changed_autocomplete(sender, instance, action, reverse, pk_set, **kwargs):
+    """所属学校・指導可能場所の変更"""
+    if action == 'pre_clear' and reverse:
+        instance._autocomplete_cleared_user_ids = list(
+            sender.objects.filter(**{sender._meta.get_field(instance._meta.model_name).attname: instance.id})
+            .values_list('customuser_id', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    user_ids = _changed_user_ids(instance, action, reverse, pk_set, '_autocomplete_cleared_user_ids')
+    transaction.on_commit(lambda: autocomplete.refresh_users(user_ids))
+
+
+@receiver(pre_delete, sender=Place)
+def place_pre_delete_autocomplete(sender, instance, **kwargs):
+    # 指導可能場所の中間テーブルの行はシグナルなしで削除されるため、対象のユーザーを事前に記録
+    instance._autocomplete_user_ids = list(instance.teacher_profiles.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Place)
+def place_deleted_autocomplete(sender, instance, **kwargs):
+    user_ids = getattr(instance, '_autocomplete_user_ids', [])
+    if user_ids:
+        transaction.on_commit(lambda: autocomplete.refresh_users(user_ids))
+
+
+@receiver(post_delete, sender=School)
+def school_deleted_autocomplete(sender, instance, **kwargs):
+    school_id = instance.id
+    transaction.on_commit(lambda: autocomplete.remove_school(school_id))
@@ -0,0 +1,130 @@
+import threading
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from account.models import CustomUser
+from config.models import Place
+from school.models import School
+
+from .autocomplete import AutocompleteRegistry, SchoolPrefixIndex, autocomplete
+
+
+@override_settings(SEARCH_RANKED_RESULTS=2)
+class TeacherSearchTests(TestCase):
+    url = '/api/account/teacher/'
+
+    def setUp(self):
+        self.school = School.objects.create(name='学校A')
+        self.other_school = School.objects.create(name='学校B')
+        self.owner = CustomUser.objects.create_user(
+            'owner', email='owner@example.com', password='pass', is_owner=True
+        )
+        self.owner.schools.add(self.school)
+
+        for index in range(5):
+            self.teacher(f'yamada{index}', '山田', f'太郎{index}', self.school)
+        self.teacher('yamada-other', '山田', '花子', self.other_school)
+        # ユーザー名のみ「yamada」を含む講師
+        self.teacher('yamada-suzuki', '鈴木', '一郎', self.school)
+        self.client.force_login(self.owner)
+
+    def teacher(self, username, last_name, first_name, school):
+        user = CustomUser.objects.create_user(
+            username, email=f'{username}@example.com', password='pass',
+            last_name=last_name, first_name=first_name, is_teacher=True,
+        )
+        user.schools.add(school)
+        return user
+
+    def count(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['pagination']['count']
+
+    def test_search_count_is_not_truncated_by_ranking(self):
+        # 上位2件のみ関連度順で、残りも件数・結果に含まれる
+        self.assertEqual(self.count(search='山田', page_size=2), 5)
+
+        response = self.client.get(self.url, {'search': '山田', 'page': 3, 'page_size': 2})
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_search_applies_view_scope(self):
+        # 他の学校の講師は含まれず、検索（search）ではユーザー名にも一致する
+        self.assertEqual(self.count(search='yamada'), 6)
+
+    def test_full_name_does_not_match_usernames(self):
+        self.assertEqual(self.count(full_name='yamada'), 0)
+        self.assertEqual(self.count(full_name='山田 太郎'), 5)
+        self.assertEqual(self.count(full_name='一郎 鈴木'), 1)
+
+
+class SchoolPrefixIndexTests(SimpleTestCase):
+    def user(self, user_id, username, last_name='', first_name=''):
+        return {
+            'id': user_id, 'username': username, 'first_name': first_name, 'last_name': last_name,
+            'is_owner': False, 'place_ids': [],
+        }
+
+    def test_prefix_search(self):
+        index = SchoolPrefixIndex(1, [
+            self.user(1, 'sato', 'サトウ', 'ハナコ'), self.user(2, 'saito', '斎藤'), self.user(3, 'kato', '加藤'),
+        ])
+        self.assertEqual(index.entries, sorted(index.entries))
+        self.assertEqual([user['id'] for user in index.search('sa', 10)], [2, 1])
+        self.assertEqual([user['id'] for user in index.search('さとう', 10)], [1])
+
+        index.remove(1)
+        self.assertEqual([user['id'] for user in index.search('sa', 10)], [2])
+
+
+class BlockingRegistry(AutocompleteRegistry):
+    """学校1の読み込みを止めるレジストリ"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def _build(self, school_id):
+        if school_id == 1:
+            self.started.set()
+            self.release.wait(5)
+        return SchoolPrefixIndex(school_id, [])
+
+
+class AutocompleteRegistryTests(SimpleTestCase):
+    def test_build_does_not_block_other_schools(self):
+        registry = BlockingRegistry()
+        thread = threading.Thread(target=registry.get, args=(1,))
+        thread.start()
+        try:
+            self.assertTrue(registry.started.wait(5))
+            # 学校1の読み込み中も学校2は検索できる
+            self.assertEqual(registry.search(2, 'a'), [])
+        finally:
+            registry.release.set()
+            thread.join()
+
+
+class AutocompletePlaceTests(TestCase):
+    def setUp(self):
+        autocomplete.clear()
+        self.school = School.objects.create(name='学校A')
+        self.place = Place.objects.create(name='教室A', school=self.school)
+        self.teacher = CustomUser.objects.create_user(
+            'yamada', email='yamada@example.com', password='pass', is_teacher=True
+        )
+        self.teacher.schools.add(self.school)
+        self.teacher.place.add(self.place)
+
+    def tearDown(self):
+        autocomplete.clear()
+
+    def test_place_delete_removes_place_from_index(self):
+        self.assertEqual(len(autocomplete.search(self.school.id, 'yam', place_id=self.place.id)), 1)
+
+        place_id = self.place.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place.delete()
+        self.assertEqual(autocomplete.search(self.school.id, 'yam', place_id=place_id), [])
+        self.assertEqual(len(autocomplete.search(self.school.id, 'yam')), 1)
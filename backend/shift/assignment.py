@@ -0,0 +1,230 @@
+# shift/assignment.py
+
+"""
+未割当の固定シフトへの講師自動割当
+
+学校の固定シフト・指導可能場所・既存の割当をメモリ上の整数配列に読み込み、
+増加路（augmenting path）による二部マッチングで割当を求める。
+講師ごとに曜日単位の区間リスト（開始時刻順）を持ち、同じ講師が
+重複する時間帯に割り当てられないようにする。
+
+曜日は曜日番号（config.models.normalize_weekday）で扱い、既存の割当は interval_index から
+他の学校の固定シフトも含めて読み込む。既存の割当同士が重なっている場合もあるため、
+重複の探索は曜日ごとの最長区間の分だけ遡って行う。
+"""
+
+from bisect import bisect_left, insort
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed
+
+from account.models import CustomUser
+from config.models import normalize_weekday
+from .intervals import interval_index, to_minutes
+from .models import FixedShift
+
+
+class AssignmentSolver:
+    """
+    講師割当ソルバー
+
+    shifts: {shift_id: (weekday, start_minute, end_minute, place_id)}
+    eligible: {place_id: [teacher_id, ...]}  指導可能な講師
+    busy: {teacher_id: [(weekday, start_minute, end_minute, shift_id), ...]}  既存の割当（重なっていてもよい）
+    """
+
+    def __init__(self, shifts, eligible, busy, max_minutes=None, fairness=True):
+        self.shifts = shifts
+        self.eligible = eligible
+        self.max_minutes = max_minutes
+        self.fairness = fairness
+
+        # (teacher_id, day_key) -> 開始時刻順の [start, end, shift_id, 移動可能か]
+        self.intervals = {}
+        # (teacher_id, day_key) -> 最長区間（重複区間の探索範囲）
+        self.max_length = {}
+        self.load = {}
+        for teacher_id, entries in busy.items():
+            for day_key, start, end, shift_id in entries:
+                self._insert(teacher_id, day_key, start, end, shift_id, movable=False)
+
+        self.assignment = {}
+
+    def _insert(self, teacher_id, day_key, start, end, shift_id, movable):
+        key = (teacher_id, day_key)
+        insort(self.intervals.setdefault(key, []), [start, end, shift_id, movable])
+        self.max_length[key] = max(self.max_length.get(key, 0), end - start)
+        self.load[teacher_id] = self.load.get(teacher_id, 0) + (end - start)
+
+    def _remove(self, teacher_id, day_key, start, end, shift_id):
+        entries = self.intervals[(teacher_id, day_key)]
+        entries.pop(bisect_left(entries, [start, end, shift_id, True]))
+        self.load[teacher_id] -= end - start
+
+    def _conflicts(self, teacher_id, day_key, start, end):
+        """[start, end) と重なる区間"""
+        key = (teacher_id, day_key)
+        entries = self.intervals.get(key)
+        if not entries:
+            return []
+        # 開始が end より前で、開始が start - 最長区間 より後の区間だけを調べる
+        index = bisect_left(entries, [end])
+        lower = start - self.max_length[key]
+        conflicts = []
+        while index > 0 and entries[index - 1][0] > lower:
+            index -= 1
+            if entries[index][1] > start:
+                conflicts.append(entries[index])
+        return conflicts
+
+    def _candidates(self, shift_id):
+        candidates = self.eligible.get(self.shifts[shift_id][3], ())
+        if self.fairness:
+            # 割当時間の少ない講師を優先
+            return sorted(candidates, key=lambda teacher_id: self.load.get(teacher_id, 0))
+        return candidates
+
+    def _fits(self, teacher_id, extra_minutes):
+        return self.max_minutes is None or self.load.get(teacher_id, 0) + extra_minutes <= self.max_minutes
+
+    def _assign(self, shift_id, teacher_id):
+        day_key, start, end, _ = self.shifts[shift_id]
+        self._insert(teacher_id, day_key, start, end, shift_id, movable=True)
+        self.assignment[shift_id] = teacher_id
+
+    def _unassign(self, shift_id):
+        teacher_id = self.assignment.pop(shift_id)
+        day_key, start, end, _ = self.shifts[shift_id]
+        self._remove(teacher_id, day_key, start, end, shift_id)
+        return teacher_id
+
+    def _augment(self, shift_id, visited):
+        day_key, start, end, _ = self.shifts[shift_id]
+        duration = end - start
+
+        for teacher_id in self._candidates(shift_id):
+            if teacher_id in visited:
+                continue
+            visited.add(teacher_id)
+
+            conflicts = self._conflicts(teacher_id, day_key, start, end)
+            if not conflicts:
+                if self._fits(teacher_id, duration):
+                    self._assign(shift_id, teacher_id)
+                    return True
+                continue
+
+            # 重なるのが自動割当したシフト1件だけなら、そのシフトを別の講師へ移せるか試す
+            if len(conflicts) != 1 or not conflicts[0][3]:
+                continue
+            other_start, other_end, other_id, _ = conflicts[0]
+            if not self._fits(teacher_id, duration - (other_end - other_start)):
+                continue
+
+            self._unassign(other_id)
+            self._assign(shift_id, teacher_id)
+            if self._augment(other_id, visited):
+                return True
+            self._unassign(shift_id)
+            self._assign(other_id, teacher_id)
+
+        return False
+
+    def solve(self, shift_ids):
+        """指定シフトに1人ずつ割り当て、割り当てられなかったシフトIDを返す"""
+        # 候補の少ないシフトから順に処理
+        ordered = sorted(
+            shift_ids,
+            key=lambda shift_id: (len(self.eligible.get(self.shifts[shift_id][3], ())), self.shifts[shift_id][:3])
+        )
+        unassigned = []
+        for shift_id in ordered:
+            if not self._augment(shift_id, set()):
+                unassigned.append(shift_id)
+        return unassigned
+
+
+def load_problem(school, include_owners=False, shift_ids=None):
+    """
+    学校のデータを読み込み、ソルバーへの入力・未割当シフトID・{shift_id: day_id} を返す
+
+    既存の割当は候補の講師ごとに interval_index から読み込むため、他の学校の固定シフトとも重ならない。
+    shift_ids は整数のリスト（呼び出し側で検証済み）で、指定した場合は対象をそのIDに絞る。
+    """
+    rows = FixedShift.objects.filter(place__school=school).values_list(
+        'id', 'day_id', 'day__name', 'day__order', 'start_time', 'end_time', 'place_id'
+    )
+    shifts, day_ids = {}, {}
+    for shift_id, day_id, day_name, day_order, start_time, end_time, place_id in rows:
+        shifts[shift_id] = (
+            normalize_weekday(day_name, day_order), to_minutes(start_time), to_minutes(end_time), place_id
+        )
+        day_ids[shift_id] = day_id
+
+    staffed = set(FixedShift.teacher.through.objects.filter(
+        fixedshift_id__in=shifts.keys()
+    ).values_list('fixedshift_id', flat=True))
+
+    roles = Q(is_teacher=True) | Q(is_owner=True) if include_owners else Q(is_teacher=True)
+    members = CustomUser.objects.filter(roles, schools=school, is_active=True).distinct()
+    eligible = {}
+    for teacher_id, place_id in CustomUser.place.through.objects.filter(
+        customuser__in=members.filter(is_teacher=True), place__school=school
+    ).values_list('customuser_id', 'place_id'):
+        eligible.setdefault(place_id, []).append(teacher_id)
+    if include_owners:
+        # オーナーは全ての場所で指導可能
+        owner_ids = list(members.filter(is_owner=True).values_list('id', flat=True))
+        for place_id in {shift[3] for shift in shifts.values()}:
+            eligible.setdefault(place_id, []).extend(
+                owner_id for owner_id in owner_ids if owner_id not in eligible.get(place_id, ())
+            )
+
+    busy = {}
+    candidates = {teacher_id for teacher_ids in eligible.values() for teacher_id in teacher_ids}
+    for teacher_id, week in interval_index.get(candidates).items():
+        busy[teacher_id] = [
+            (weekday, start, end, shift_id) for shift_id, (weekday, start, end, _) in week.shifts.items()
+        ]
+
+    targets = [shift_id for shift_id in shifts if shift_id not in staffed]
+    if shift_ids is not None:
+        wanted = set(shift_ids)
+        targets = [shift_id for shift_id in targets if shift_id in wanted]
+
+    return shifts, eligible, busy, targets, day_ids
+
+
+@transaction.atomic
+def apply_assignment(assignment):
+    """割当結果を1トランザクションで保存し、適用した {shift_id: teacher_id} を返す"""
+    through = FixedShift.teacher.through
+
+    # 計算中に他の操作で講師が割り当てられたシフトは対象外
+    staffed = set(through.objects.filter(
+        fixedshift_id__in=assignment.keys()
+    ).values_list('fixedshift_id', flat=True))
+    applied = {shift_id: teacher_id for shift_id, teacher_id in assignment.items() if shift_id not in staffed}
+
+    through.objects.bulk_create([
+        through(fixedshift_id=shift_id, customuser_id=teacher_id)
+        for shift_id, teacher_id in applied.items()
+    ])
+
+    # bulk_create はシグナルを送らないため、講師側からの追加として通知する
+    shifts_by_teacher = {}
+    for shift_id, teacher_id in applied.items():
+        shifts_by_teacher.setdefault(teacher_id, set()).add(shift_id)
+    for teacher in CustomUser.objects.filter(id__in=shifts_by_teacher):
+        m2m_changed.send(
+            sender=through,
+            instance=teacher,
+            action='post_add',
+            reverse=True,
+            model=FixedShift,
+            pk_set=shifts_by_teacher[teacher.id],
+            using='default',
+        )
+
+    return applied
@@ -0,0 +1,216 @@
+# shift/coverage.py
+
+"""
+配置人数ヒートマップ
+
+場所 × 列（曜日または日付）× 15分単位のビンごとに、配置されている講師数と
+講師が未割当のシフト数を数える。
+
+シフトごとに開始ビンへ +人数、終了ビンへ -人数 を加えた差分配列を作り、
+ビン方向の累積和を取ることで Python のループを使わずに集計する。
+ビンの一部でも重なるシフトはそのビンに含める。
+"""
+
+import numpy as np
+from django.db import connections
+from django.db.models import Case, CharField, F, Q, Value, When
+from django.db.models.functions import Cast
+
+from config.models import Day, Place
+from .models import FixedShift, Shift
+
+
+BIN_MINUTES = 15
+
+
+def _as_text(field):
+    # 行ごとの time / date オブジェクトへの変換を避け、文字列のまま取得して NumPy で解析する
+    return Cast(field, CharField())
+
+
+def _minutes(values):
+    """'HH:MM[:SS]' の文字列の列を 0時からの分に変換"""
+    digits = np.asarray(values, dtype='S5').view(np.uint8).reshape(-1, 5).astype(np.int64) - ord('0')
+    return (digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 3] * 10 + digits[:, 4]
+
+
+def _fetch_array(queryset, fields):
+    """
+    values_list の結果を NumPy の構造化配列で返す
+
+    fields: {フィールド名: dtype}。行を列へ転置せず、取得した行から直接配列を作る。
+    """
+    query = queryset.order_by().values_list(*fields).query
+    names = [*query.extra_select, *query.values_select, *query.annotation_select]
+    compiler = query.get_compiler(queryset.db)
+    sql, params = compiler.as_sql()
+    # values_list の行ごとの並べ替えを通さずに取得する。
+    # バックエンドの変換（converters）がある列を選んだときのみ行ごとに変換する
+    converters = compiler.get_converters([expression for expression, _, _ in compiler.select])
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if converters:
+        rows = list(compiler.apply_converters(rows, converters))
+    return np.array(rows, dtype=[(name, fields[name]) for name in names])
+
+
+def _flag(condition):
+    """条件を '1' / '0' の文字列で取得する式（真偽値の行ごとの変換を避ける）"""
+    return Case(When(condition, then=Value('1')), default=Value('0'), output_field=CharField())
+
+
+def _shift_columns(model, filters, column, column_dtype):
+    """場所ID・列の値（column の式）・開始分・終了分・講師数・空けるシフトか の列ごとの配列"""
+    shifts = _fetch_array(
+        model.objects.filter(**filters).annotate(
+            column=column,
+            start_text=_as_text('start_time'),
+            end_text=_as_text('end_time'),
+            empty_flag=_flag(Q(is_empty=True)) if model is Shift else Value('0', output_field=CharField()),
+        ),
+        {
+            'id': np.int64, 'place_id': np.int64, 'column': column_dtype,
+            'start_text': 'S8', 'end_text': 'S8', 'empty_flag': 'S1',
+        }
+    )
+
+    # 講師数は中間テーブルから別に数える（シフトとの GROUP BY を避ける）。
+    # シフトとの結合も避け、ID の範囲で取得して対象外のシフトの行は _lookup で除く
+    staff = np.zeros(len(shifts), dtype=np.int64)
+    if len(shifts):
+        name = model._meta.model_name
+        assigned = _fetch_array(
+            model.teacher.through.objects.filter(**{
+                f'{name}__gte': int(shifts['id'].min()), f'{name}__lte': int(shifts['id'].max()),
+            }),
+            {f'{name}_id': np.int64}
+        )[f'{name}_id']
+        staff = np.bincount(_lookup(shifts['id'], assigned) + 1, minlength=len(shifts) + 1)[1:]
+
+    return [
+        shifts['place_id'], shifts['column'], _minutes(shifts['start_text']), _minutes(shifts['end_text']),
+        staff, shifts['empty_flag'] == b'1',
+    ]
+
+
+def _lookup(keys, values):
+    """values の各要素の keys 内での添字（見つからない要素は -1）"""
+    keys = np.asarray(keys, dtype=np.int64)
+    values = np.asarray(values, dtype=np.int64)
+    if not len(keys):
+        return np.full(len(values), -1, dtype=np.int64)
+    order = np.argsort(keys)
+    position = np.clip(np.searchsorted(keys, values, sorter=order), 0, len(keys) - 1)
+    index = order[position]
+    return np.where(keys[index] == values, index, -1)
+
+
+def accumulate(rows, shape, start_minute, end_minute):
+    """
+    差分配列と累積和でビンごとの合計を求める
+
+    rows: (場所の添字, 列の添字, 開始分, 終了分, 重み) の配列（N × 5）
+    shape: (場所数, 列数)
+    戻り値: (場所数, 列数, ビン数) の int32 配列
+    """
+    bins = -(-(end_minute - start_minute) // BIN_MINUTES)
+    places, columns = shape
+    if not len(rows):
+        return np.zeros((places, columns, bins), dtype=np.int32)
+
+    place_index, column_index, starts, ends, weights = rows.T
+    first = np.clip((starts - start_minute) // BIN_MINUTES, 0, bins)
+    last = np.clip(-(-(ends - start_minute) // BIN_MINUTES), 0, bins)
+    valid = last > first
+    cell = (place_index * columns + column_index)[valid] * (bins + 1)
+
+    # 各セルに bins + 1 個の差分を確保し、開始と終了の位置へ重みを加える
+    length = places * columns * (bins + 1)
+    diff = (
+        np.bincount(cell + first[valid], weights=weights[valid], minlength=length)
+        - np.bincount(cell + last[valid], weights=weights[valid], minlength=length)
+    )
+    return np.cumsum(
+        diff.reshape(places, columns, bins + 1), axis=2
+    )[:, :, :bins].round().astype(np.int32)
+
+
+def _coverage(place_index, column_index, columns, shape, start_minute, end_minute):
+    """講師数と未割当シフト数のヒートマップ"""
+    _, _, starts, ends, staff, is_empty = columns
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    staff = np.asarray(staff, dtype=np.int64)
+    # 空けるシフトは未割当として数えない
+    unstaffed = ((staff == 0) & ~np.asarray(is_empty, dtype=bool)).astype(np.int64)
+
+    valid = (place_index >= 0) & (column_index >= 0) & (column_index < shape[1])
+    rows = np.column_stack([place_index, column_index, starts, ends, staff, unstaffed])[valid]
+    return (
+        accumulate(rows[:, :5], shape, start_minute, end_minute),
+        accumulate(rows[:, [0, 1, 2, 3, 5]], shape, start_minute, end_minute),
+    )
+
+
+def _payload(school, places, columns, staff, unstaffed, start_minute, end_minute):
+    """
+    シフトのあるセルだけを列ごとの配列で返す
+
+    cells[i] = [場所の添字, 列の添字] のセルについて、staff[i] / unstaffed[i] がビンごとの
+    講師数・未割当シフト数。配列は NumPy のまま返し、レンダラーでそのままシリアライズする。
+    """
+    occupied = (staff != 0).any(axis=2) | (unstaffed != 0).any(axis=2)
+    return {
+        'school_id': school.id,
+        'bin_minutes': BIN_MINUTES,
+        'start_minute': start_minute,
+        'end_minute': end_minute,
+        'bin_count': staff.shape[2],
+        'places': places,
+        'columns': columns,
+        'cells': np.argwhere(occupied),
+        'staff': staff[occupied],
+        'unstaffed': unstaffed[occupied],
+    }
+
+
+def _places(school):
+    return [
+        {'id': place_id, 'name': name}
+        for place_id, name in Place.objects.filter(school=school).order_by('name').values_list('id', 'name')
+    ]
+
+
+def fixed_shift_coverage(school, start_minute, end_minute):
+    """固定シフトの曜日ごとのヒートマップ"""
+    places = _places(school)
+    days = [
+        {'id': day_id, 'name': name}
+        for day_id, name in Day.objects.filter(school=school).order_by('order').values_list('id', 'name')
+    ]
+    columns = _shift_columns(FixedShift, {'place__school': school}, F('day_id'), np.int64)
+    staff, unstaffed = _coverage(
+        _lookup([place['id'] for place in places], columns[0]),
+        _lookup([day['id'] for day in days], columns[1]),
+        columns, (len(places), len(days)), start_minute, end_minute
+    )
+    return _payload(school, places, days, staff, unstaffed, start_minute, end_minute)
+
+
+def shift_coverage(school, start_date, end_date, start_minute, end_minute):
+    """日付指定シフトの日付ごとのヒートマップ（start_date から end_date まで）"""
+    places = _places(school)
+    first = np.datetime64(start_date, 'D')
+    dates = np.arange(first, np.datetime64(end_date, 'D') + 1)
+    columns = _shift_columns(
+        Shift, {'place__school': school, 'date__range': (start_date, end_date)}, _as_text('date'), 'datetime64[D]'
+    )
+    staff, unstaffed = _coverage(
+        _lookup([place['id'] for place in places], columns[0]),
+        (columns[1] - first).astype(np.int64),
+        columns, (len(places), len(dates)), start_minute, end_minute
+    )
+    return _payload(
+        school, places, [{'date': str(value)} for value in dates], staff, unstaffed, start_minute, end_minute
+    )
@@ -0,0 +1,247 @@
+# shift/events.py
+
+"""
+固定シフト変更イベントの配信ハブ
+
+シグナルから発行された変更イベントを学校ごとの購読者（SSE接続）へ配信する。
+ワーカー間の共有はバックエンドで切り替える。
+
+- InProcessBackend: 同一プロセス内のみで配信（開発・単一ワーカー用）
+- SQLiteBrokerBackend: ローカルのSQLiteファイルを簡易ブローカーとして使い、
+  複数ワーカー間でイベントを共有する
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """1つのSSE接続に対応する購読"""
+
+    def __init__(self, school_id, loop, maxsize=256):
+        self.school_id = school_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        # キューが溢れた場合はクライアントに再取得を促す
+        self.overflowed = False
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def deliver(self, event):
+        """任意のスレッドからイベントを渡す"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # イベントループが既に閉じている
+            pass
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventHub:
+    """学校ごとの購読者へイベントを配信するプロセス内ハブ"""
+
+    def __init__(self, backlog=256):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        # Last-Event-ID による再接続時の取りこぼし補完用
+        self._recent = defaultdict(lambda: deque(maxlen=backlog))
+
+    def subscribe(self, school_id, loop):
+        subscription = Subscription(school_id, loop)
+        with self._lock:
+            self._subscribers[school_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.school_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.school_id]
+
+    def replay(self, school_id, last_event_id):
+        """
+        指定ID以降のイベントを返す
+
+        保持範囲より古いID、または保持している最新より新しいID（サーバーの再起動で
+        InProcessBackend のIDが1から振り直された場合など）は補完できないため None を返す。
+        """
+        with self._lock:
+            recent = list(self._recent.get(school_id, ()))
+        if not recent:
+            return None
+        if recent[0]['id'] > last_event_id + 1 or recent[-1]['id'] < last_event_id:
+            return None
+        return [event for event in recent if event['id'] > last_event_id]
+
+    def dispatch(self, event):
+        """バックエンドから受け取ったイベントを購読者へ配る"""
+        school_id = event['school_id']
+        with self._lock:
+            self._recent[school_id].append(event)
+            subscribers = list(self._subscribers.get(school_id, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+
+class BaseEventBackend:
+    """イベント共有バックエンドの基底クラス"""
+
+    def __init__(self, hub, **options):
+        self.hub = hub
+
+    def start(self):
+        """受信側の準備（必要なバックエンドのみ）"""
+
+    def publish(self, event):
+        raise NotImplementedError
+
+
+class InProcessBackend(BaseEventBackend):
+    """同一プロセス内でのみイベントを配信するバックエンド"""
+
+    def __init__(self, hub, **options):
+        super().__init__(hub, **options)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        with self._lock:
+            event['id'] = next(self._ids)
+        self.hub.dispatch(event)
+
+
+class SQLiteBrokerBackend(BaseEventBackend):
+    """
+    ローカルのSQLiteファイルをブローカー代わりに使うバックエンド
+
+    発行側はイベントを行として追記し、各ワーカーのポーリングスレッドが
+    新しい行を読み出して自プロセスのハブへ配る。イベントIDは行IDなので
+    ワーカーをまたいでも単調増加する。
+    """
+
+    def __init__(self, hub, path=None, poll_interval=0.2, retention_seconds=300, **options):
+        super().__init__(hub, **options)
+        self.path = str(path or settings.BASE_DIR / 'shift_events.sqlite3')
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        self._poller = None
+        self._poller_lock = threading.Lock()
+        self._init_schema()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS shift_event ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' school_id INTEGER NOT NULL,'
+            ' payload TEXT NOT NULL,'
+            ' created REAL NOT NULL)'
+        )
+
+    def start(self):
+        if self._poller is not None:
+            return
+        with self._poller_lock:
+            if self._poller is None:
+                self._poller = threading.Thread(
+                    target=self._poll, name='shift-event-poller', daemon=True
+                )
+                self._poller.start()
+
+    def publish(self, event):
+        self.start()
+        self._connection().execute(
+            'INSERT INTO shift_event (school_id, payload, created) VALUES (?, ?, ?)',
+            (event['school_id'], json.dumps(event, default=str), time.time())
+        )
+
+    def _poll(self):
+        conn = self._connection()
+        row = conn.execute('SELECT MAX(id) FROM shift_event').fetchone()
+        last_id = row[0] or 0
+        last_prune = time.monotonic()
+
+        while True:
+            try:
+                rows = conn.execute(
+                    'SELECT id, payload FROM shift_event WHERE id > ? ORDER BY id',
+                    (last_id,)
+                ).fetchall()
+                for row_id, payload in rows:
+                    event = json.loads(payload)
+                    event['id'] = row_id
+                    self.hub.dispatch(event)
+                    last_id = row_id
+
+                # 古いイベントを定期的に削除
+                if time.monotonic() - last_prune > self.retention_seconds:
+                    conn.execute(
+                        'DELETE FROM shift_event WHERE created < ?',
+                        (time.time() - self.retention_seconds,)
+                    )
+                    last_prune = time.monotonic()
+            except sqlite3.Error:
+                logger.exception('Shift event polling failed: %s', self.path)
+            time.sleep(self.poll_interval)
+
+
+hub = EventHub()
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """設定されたバックエンドを取得（初回のみ生成）"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = getattr(settings, 'SHIFT_EVENTS', {})
+                backend_class = import_string(
+                    config.get('BACKEND', 'shift.events.InProcessBackend')
+                )
+                backend = backend_class(hub, **config.get('OPTIONS', {}))
+                backend.start()
+                _backend = backend
+    return _backend
+
+
+def publish(event_type, school_id, **payload):
+    """変更イベントを発行"""
+    if school_id is None:
+        return
+    event = {
+        'type': event_type,
+        'school_id': school_id,
+        'ts': time.time(),
+    }
+    event.update(payload)
+    get_backend().publish(event)
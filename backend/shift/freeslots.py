@@ -0,0 +1,117 @@
+# shift/freeslots.py
+
+"""
+空き時間の検索
+
+講師・場所の1週間の使用状況を分単位のビット列（Python の int、曜日番号 × 1440 + 分 のビット）で表す。
+空き時間は「検索する時間帯のビット列 & ~使用中のビット列」で求め、
+指定した長さ以上の連続した空きはビットシフトと AND の繰り返しで判定する。
+"""
+
+from functools import reduce
+from operator import and_
+
+from config.models import normalize_weekday
+from .intervals import interval_index, to_minutes
+from .models import FixedShift
+
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def format_minutes(minutes):
+    """0時からの分を TimeField と同じ形式（HH:MM:SS）で文字列化（24:00 も表せる）"""
+    return f'{minutes // 60:02d}:{minutes % 60:02d}:00'
+
+
+def interval_bits(weekday, start, end):
+    """曜日番号・開始分・終了分の区間のビット列"""
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << (weekday * MINUTES_PER_DAY + start)
+
+
+def window_bits(weekdays, start, end):
+    """検索する時間帯（各曜日の start〜end）のビット列"""
+    return reduce(lambda bits, weekday: bits | interval_bits(weekday, start, end), weekdays, 0)
+
+
+def teacher_occupancy(teacher_ids):
+    """{teacher_id: 使用中のビット列}（全ての学校の固定シフトを曜日番号で重ねる）"""
+    occupancy = {}
+    for teacher_id, week in interval_index.get(teacher_ids).items():
+        bits = 0
+        for weekday, entries in week.days.items():
+            for start, end, _ in entries:
+                bits |= interval_bits(weekday, start, end)
+        occupancy[teacher_id] = bits
+    return occupancy
+
+
+def place_occupancy(place_ids):
+    """{place_id: 使用中のビット列}"""
+    occupancy = dict.fromkeys(place_ids, 0)
+    for place_id, day_name, day_order, start_time, end_time in FixedShift.objects.filter(
+        place_id__in=place_ids
+    ).values_list('place_id', 'day__name', 'day__order', 'start_time', 'end_time'):
+        occupancy[place_id] |= interval_bits(
+            normalize_weekday(day_name, day_order), to_minutes(start_time), to_minutes(end_time)
+        )
+    return occupancy
+
+
+def run_starts(bits, length):
+    """長さ length 以上の連続した1の開始位置になり得るビット（0 なら該当なし）"""
+    covered = 1
+    while covered < length and bits:
+        step = min(covered, length - covered)
+        bits &= bits >> step
+        covered += step
+    return bits
+
+
+def free_windows(bits, weekdays, min_length):
+    """空きのビット列から [(曜日番号, 開始分, 終了分), ...] を求める（min_length 分以上の連続した空きのみ）"""
+    day_mask = (1 << MINUTES_PER_DAY) - 1
+    windows = []
+    for weekday in sorted(weekdays):
+        day = (bits >> (weekday * MINUTES_PER_DAY)) & day_mask
+        while day:
+            start = (day & -day).bit_length() - 1
+            # start から続く1の並びの長さ
+            length = (~(day >> start) & ((day >> start) + 1)).bit_length() - 1
+            if length >= min_length:
+                windows.append((weekday, start, start + length))
+            day &= ~(((1 << length) - 1) << start)
+    return windows
+
+
+def _free_bits(teacher_ids, weekdays, start, end, place_id):
+    window = window_bits(weekdays, start, end)
+    if place_id is not None:
+        window &= ~place_occupancy([place_id])[place_id]
+    return window, {teacher_id: window & ~bits for teacher_id, bits in teacher_occupancy(teacher_ids).items()}
+
+
+def find_free_slots(teacher_ids, weekdays, start, end, min_length, place_id=None):
+    """
+    講師ごとの空き時間 {teacher_id: [(曜日番号, 開始分, 終了分), ...]}（空きのある講師のみ）
+
+    place_id を指定すると場所も空いている時間に限る。
+    """
+    _, free = _free_bits(teacher_ids, weekdays, start, end, place_id)
+    slots = {}
+    for teacher_id, bits in free.items():
+        # 連続した空きがない講師は区間を取り出さずに除外する
+        if run_starts(bits, min_length):
+            windows = free_windows(bits, weekdays, min_length)
+            if windows:
+                slots[teacher_id] = windows
+    return slots
+
+
+def find_common_free_slots(teacher_ids, weekdays, start, end, min_length, place_id=None):
+    """指定した講師全員が同時に空いている時間 [(曜日番号, 開始分, 終了分), ...]"""
+    window, free = _free_bits(teacher_ids, weekdays, start, end, place_id)
+    common = reduce(and_, free.values(), window)
+    return free_windows(common, weekdays, min_length) if run_starts(common, min_length) else []
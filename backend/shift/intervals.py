@@ -0,0 +1,202 @@
+# shift/intervals.py
+
+"""
+講師ごとの週間時間帯インデックス
+
+曜日は学校ごとの Day ではなく曜日番号（config.models.normalize_weekday）で扱い、
+複数の学校に所属する講師の重複も検出できるようにする。
+
+講師ごとに曜日別の開始時刻順の区間リストを持ち、重複判定は二分探索で行う。
+インデックスはプロセス内に講師単位で読み込み、固定シフトの変更はシグナルから差分で反映する。
+他のプロセスでの変更はキャッシュ上の講師ごとのバージョンで検出し、次回参照時に読み直す。
+"""
+
+import threading
+import uuid
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+
+from config.models import normalize_weekday
+from .models import FixedShift
+
+
+VERSION_KEY = 'shift:teacher-week:{}'
+GENERATION_KEY = 'shift:teacher-week:generation'
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+class TeacherWeek:
+    """1人の講師の週間時間帯（曜日番号 -> (開始分, 終了分, shift_id) の開始順リスト）"""
+
+    def __init__(self):
+        self.days = {}
+        self.shifts = {}  # shift_id -> (weekday, start, end, school_id)
+        self.max_length = {}  # 曜日ごとの最長区間（重複区間の探索範囲）
+
+    def add(self, shift_id, weekday, start, end, school_id):
+        self.remove(shift_id)
+        insort(self.days.setdefault(weekday, []), (start, end, shift_id))
+        self.shifts[shift_id] = (weekday, start, end, school_id)
+        self.max_length[weekday] = max(self.max_length.get(weekday, 0), end - start)
+
+    def remove(self, shift_id):
+        slot = self.shifts.pop(shift_id, None)
+        if slot is None:
+            return
+        weekday, start, end, _ = slot
+        entries = self.days[weekday]
+        del entries[bisect_left(entries, (start, end, shift_id))]
+
+    def overlapping(self, weekday, start, end, exclude=()):
+        """[start, end) と重なる shift_id の一覧"""
+        entries = self.days.get(weekday)
+        if not entries:
+            return []
+        # 開始が end より前で、開始が start - 最長区間 より後の区間だけを調べる
+        index = bisect_left(entries, (end,))
+        lower = start - self.max_length[weekday]
+        result = []
+        while index > 0 and entries[index - 1][0] > lower:
+            index -= 1
+            entry_start, entry_end, shift_id = entries[index]
+            if entry_end > start and shift_id not in exclude:
+                result.append(shift_id)
+        return result
+
+    def conflicts(self):
+        """重複している (shift_id, shift_id) の組（曜日ごとに開始順に走査）"""
+        pairs = []
+        for entries in self.days.values():
+            active = []
+            for start, end, shift_id in entries:
+                active = [entry for entry in active if entry[0] > start]
+                pairs.extend((other_id, shift_id) for _, other_id in active)
+                active.append((end, shift_id))
+        return pairs
+
+
+class WeeklyIntervalIndex:
+    """全講師の週間時間帯インデックス（プロセス内で共有）"""
+
+    def __init__(self):
+        self._teachers = {}
+        self._versions = {}
+        self._generation = None
+        self._lock = threading.RLock()
+
+    def _load(self, teacher_ids):
+        weeks = {teacher_id: TeacherWeek() for teacher_id in teacher_ids}
+        rows = FixedShift.teacher.through.objects.filter(customuser_id__in=teacher_ids).values_list(
+            'customuser_id', 'fixedshift_id', 'fixedshift__day__name', 'fixedshift__day__order',
+            'fixedshift__start_time', 'fixedshift__end_time', 'fixedshift__place__school_id'
+        )
+        for teacher_id, shift_id, day_name, day_order, start_time, end_time, school_id in rows:
+            weeks[teacher_id].add(
+                shift_id, normalize_weekday(day_name, day_order),
+                to_minutes(start_time), to_minutes(end_time), school_id
+            )
+        return weeks
+
+    def get(self, teacher_ids):
+        """{teacher_id: TeacherWeek}（未読み込み・他プロセスで変更された講師は読み直す）"""
+        teacher_ids = list(set(teacher_ids))
+        with self._lock:
+            versions = cache.get_many([GENERATION_KEY, *(VERSION_KEY.format(t) for t in teacher_ids)])
+            if versions.get(GENERATION_KEY) != self._generation:
+                self._teachers.clear()
+                self._versions.clear()
+                self._generation = versions.get(GENERATION_KEY)
+
+            stale = [
+                teacher_id for teacher_id in teacher_ids
+                if teacher_id not in self._teachers
+                or self._versions.get(teacher_id) != versions.get(VERSION_KEY.format(teacher_id))
+            ]
+            if stale:
+                self._teachers.update(self._load(stale))
+                for teacher_id in stale:
+                    self._versions[teacher_id] = versions.get(VERSION_KEY.format(teacher_id))
+
+            return {teacher_id: self._teachers[teacher_id] for teacher_id in teacher_ids}
+
+    def _bump(self, teacher_ids):
+        """講師のバージョンを更新して他プロセスに通知"""
+        tokens = {teacher_id: uuid.uuid4().hex for teacher_id in teacher_ids}
+        cache.set_many({VERSION_KEY.format(t): token for t, token in tokens.items()}, timeout=None)
+        return tokens
+
+    def refresh_shifts(self, shift_ids, teacher_ids=()):
+        """
+        固定シフトの変更を反映
+
+        teacher_ids には担当から外れた講師など、現在の割当からは分からない講師を渡す。
+        """
+        shift_ids = set(shift_ids)
+        if not shift_ids:
+            return
+        rows = FixedShift.teacher.through.objects.filter(fixedshift_id__in=shift_ids).values_list(
+            'customuser_id', 'fixedshift_id', 'fixedshift__day__name', 'fixedshift__day__order',
+            'fixedshift__start_time', 'fixedshift__end_time', 'fixedshift__place__school_id'
+        )
+
+        with self._lock:
+            affected = set(teacher_ids) | {
+                teacher_id for teacher_id, week in self._teachers.items()
+                if not shift_ids.isdisjoint(week.shifts)
+            }
+            affected.update(row[0] for row in rows)
+
+            versions = cache.get_many([VERSION_KEY.format(t) for t in affected])
+            for teacher_id in affected:
+                week = self._teachers.get(teacher_id)
+                if week is None:
+                    continue
+                if self._versions.get(teacher_id) != versions.get(VERSION_KEY.format(teacher_id)):
+                    # 他プロセスの変更を取りこぼさないよう、差分を適用せず次回読み直す
+                    self.forget([teacher_id])
+                    continue
+                for shift_id in shift_ids:
+                    week.remove(shift_id)
+
+            for teacher_id, shift_id, day_name, day_order, start_time, end_time, school_id in rows:
+                week = self._teachers.get(teacher_id)
+                if week is not None:
+                    week.add(
+                        shift_id, normalize_weekday(day_name, day_order),
+                        to_minutes(start_time), to_minutes(end_time), school_id
+                    )
+
+            for teacher_id, token in self._bump(affected).items():
+                if teacher_id in self._teachers:
+                    self._versions[teacher_id] = token
+
+    def forget(self, teacher_ids):
+        with self._lock:
+            for teacher_id in teacher_ids:
+                self._teachers.pop(teacher_id, None)
+                self._versions.pop(teacher_id, None)
+
+    def invalidate_all(self):
+        """全プロセスのインデックスを破棄（シグナルを通らない一括登録の後に使用）"""
+        cache.set(GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+        with self._lock:
+            self._teachers.clear()
+            self._versions.clear()
+
+    def find_conflicts(self, teacher_ids, weekday, start_time, end_time, exclude_shift_id=None):
+        """指定した曜日・時間帯に既にシフトがある講師 {teacher_id: [shift_id, ...]}"""
+        start, end = to_minutes(start_time), to_minutes(end_time)
+        exclude = {exclude_shift_id} if exclude_shift_id else ()
+        conflicts = {}
+        for teacher_id, week in self.get(teacher_ids).items():
+            overlapping = week.overlapping(weekday, start, end, exclude)
+            if overlapping:
+                conflicts[teacher_id] = overlapping
+        return conflicts
+
+
+interval_index = WeeklyIntervalIndex()
@@ -0,0 +1,115 @@
+# shift/layout.py
+
+"""
+時間割グリッドのレイアウト（重なる固定シフトの列の割り当て）
+
+(曜日, 場所) のセルごとに、固定シフトを開始順に並べて空いている列（レーン）に割り当てる
+（区間グラフの彩色。終了時刻のヒープから最も早く空く列を再利用するため、列数は同時に重なる最大数になる）。
+互いに重なるシフトのまとまり（グループ）ごとの列数も返し、クライアントは幅を 1/グループの列数 にして表示できる。
+
+表示する時間帯はシフトと学校の始業・終業時間から求め、slot_minutes 単位の行番号と行数（span）を返す。
+"""
+
+import heapq
+import math
+from collections import defaultdict
+
+
+SLOT_MINUTES = (15, 30, 60)
+DEFAULT_SLOT_MINUTES = 30
+# シフトも始業・終業時間もない場合の表示時間帯
+DEFAULT_HOURS = (8, 18)
+
+
+def _minutes(value):
+    """'HH:MM[:SS]' を0時からの分に変換"""
+    return int(value[:2]) * 60 + int(value[3:5])
+
+
+def assign_lanes(intervals):
+    """
+    重なる区間を列に割り当てる
+
+    intervals: [(開始分, 終了分, キー), ...]
+    戻り値: ({キー: (列番号, グループの列数)}, 全体の列数)
+    """
+    lanes = {}
+    free = []  # 空いた列番号（小さい順に再利用する）
+    active = []  # (終了分, 列番号)
+    group, group_lanes = [], 0
+    lane_count = 0
+
+    def close_group():
+        for key in group:
+            lanes[key] = (lanes[key], group_lanes)
+
+    for start, end, key in sorted(intervals, key=lambda interval: (interval[0], interval[1])):
+        while active and active[0][0] <= start:
+            heapq.heappush(free, heapq.heappop(active)[1])
+        if not active:
+            # 重なりが途切れたらグループを閉じ、列番号を0から使い直す
+            close_group()
+            group, group_lanes, free = [], 0, []
+        lane = heapq.heappop(free) if free else len(active)
+        heapq.heappush(active, (end, lane))
+        lanes[key] = lane
+        group.append(key)
+        group_lanes = max(group_lanes, lane + 1)
+        lane_count = max(lane_count, group_lanes)
+    close_group()
+    return lanes, lane_count
+
+
+def _hour_range(shifts, school_start_time, school_end_time):
+    """シフトと始業・終業時間を含む時間帯（時単位）"""
+    starts = [_minutes(shift['start_time']) for shift in shifts]
+    ends = [_minutes(shift['end_time']) for shift in shifts]
+    if school_start_time:
+        starts.append(_minutes(school_start_time))
+    if school_end_time:
+        ends.append(_minutes(school_end_time))
+    if not starts or not ends:
+        return DEFAULT_HOURS
+    start_hour = min(starts) // 60
+    end_hour = max(math.ceil(max(ends) / 60), start_hour + 1)
+    return start_hour, min(end_hour, 24)
+
+
+def grid_layout(payload, slot_minutes=DEFAULT_SLOT_MINUTES):
+    """grid_payload() の結果からレイアウトを作成"""
+    shifts = payload['shifts']
+    start_hour, end_hour = _hour_range(shifts, payload['school_start_time'], payload['school_end_time'])
+    origin = start_hour * 60
+
+    cells = defaultdict(list)
+    for shift in shifts:
+        start, end = _minutes(shift['start_time']), _minutes(shift['end_time'])
+        cells[(shift['day'], shift['place'])].append((start, max(end, start), shift['id']))
+
+    layout_cells = []
+    for (day_id, place_id), intervals in cells.items():
+        lanes, lane_count = assign_lanes(intervals)
+        layout_shifts = []
+        for start, end, shift_id in sorted(intervals):
+            row = (start - origin) // slot_minutes
+            lane, group_lanes = lanes[shift_id]
+            layout_shifts.append({
+                'id': shift_id,
+                'lane': lane,
+                'lanes': group_lanes,
+                'row': row,
+                'span': max(math.ceil((end - origin) / slot_minutes) - row, 1),
+            })
+        layout_cells.append({'day': day_id, 'place': place_id, 'lanes': lane_count, 'shifts': layout_shifts})
+
+    order = {day['id']: index for index, day in enumerate(payload['days'])}
+    place_order = {place['id']: index for index, place in enumerate(payload['places'])}
+    layout_cells.sort(key=lambda cell: (order.get(cell['day'], 0), place_order.get(cell['place'], 0)))
+
+    return {
+        'start_hour': start_hour,
+        'end_hour': end_hour,
+        'slot_minutes': slot_minutes,
+        'rows': (end_hour - start_hour) * 60 // slot_minutes,
+        'cells': layout_cells,
+    }
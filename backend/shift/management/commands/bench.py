@@ -0,0 +1,270 @@
+# shift/management/commands/bench.py
+
+import io
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from account.models import CustomUser
+from config.models import Place, Day
+from school.models import School
+from shift.models import FixedShift
+
+
+ENDPOINTS = [
+    'grid', 'conflicts', 'available_teachers', 'teachers_by_place', 'copy_week',
+    'bulk_create', 'teacher_list', 'statistics', 'excel_upload',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark API endpoints against the current (seeded) dataset and report latency percentiles, query counts and peak memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school-id', type=int, help='School to benchmark (default: the school with the most fixed shifts)')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per endpoint before measuring')
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS, help='Endpoints to run')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Baseline JSON file from a previous run')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative p95 slowdown before a regression is reported (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        # 書き込み系エンドポイントも含めて全て最後にロールバックする。
+        # @coalesce の結果のキャッシュは使わず、毎回ビューの処理を計測する（実行中の計算の共有のみ）
+        with override_settings(SINGLEFLIGHT_CACHE_TIMEOUT=0), transaction.atomic():
+            self.setup(options['school_id'])
+            results = {}
+            for name in options['endpoints']:
+                self.stdout.write(f'Running {name}...')
+                results[name] = self.run_endpoint(name, options['iterations'], options['warmup'])
+            transaction.set_rollback(True)
+
+        report = {
+            'meta': {
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'school_id': self.school.id,
+                'iterations': options['iterations'],
+                'dataset': self.dataset,
+            },
+            'results': results,
+        }
+
+        self.print_results(results)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = self.compare(baseline['results'], results, options['threshold'])
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s) detected')
+            self.stdout.write(self.style.SUCCESS('No regressions detected'))
+
+    def setup(self, school_id):
+        """対象の学校・ユーザー・リクエストパラメータを準備"""
+        if school_id:
+            school = School.objects.filter(id=school_id).first()
+        else:
+            school = School.objects.annotate(
+                shift_count=Count('places__fixed_shifts')
+            ).order_by('-shift_count', 'id').first()
+        if not school:
+            raise CommandError('No school found. Seed data first, e.g. python manage.py seed_scale')
+
+        owner = CustomUser.objects.filter(schools=school, is_owner=True).first()
+        if not owner:
+            raise CommandError(f'School {school.id} has no owner')
+
+        admin = CustomUser.objects.filter(is_superuser=True).first()
+        if not admin:
+            admin = CustomUser.objects.create_superuser(
+                username='bench-admin', email='bench-admin@example.com', password='bench-admin'
+            )
+
+        shift = FixedShift.objects.filter(place__school=school).select_related('day', 'place').first()
+        day = shift.day if shift else Day.objects.filter(school=school).first()
+        place = shift.place if shift else Place.objects.filter(school=school).first()
+        if not (day and place):
+            raise CommandError(f'School {school.id} has no days or places')
+
+        self.school = school
+        self.day = day
+        self.place = place
+        self.shift = shift
+        self.copy_target = owner.schools.exclude(id=school.id).first() or school
+
+        self.owner_client = Client(HTTP_HOST='localhost')
+        self.owner_client.force_login(owner)
+        self.admin_client = Client(HTTP_HOST='localhost')
+        self.admin_client.force_login(admin)
+
+        self.dataset = {
+            'fixed_shifts': FixedShift.objects.filter(place__school=school).count(),
+            'places': Place.objects.filter(school=school).count(),
+            'days': Day.objects.filter(school=school).count(),
+            'users': CustomUser.objects.filter(schools=school).count(),
+        }
+
+    def build_request(self, name, iteration):
+        """エンドポイント名から (client, method, path, kwargs, 書き込み有無) を組み立て"""
+        school_id = self.school.id
+        if name == 'grid':
+            return self.owner_client, 'get', '/api/shift/fixed-shift/grid/', {'data': {'school_id': school_id}}, False
+        if name == 'conflicts':
+            return self.owner_client, 'get', '/api/shift/fixed-shift/conflicts/', {'data': {'school_id': school_id}}, False
+        if name == 'available_teachers':
+            start = self.shift.start_time.strftime('%H:%M') if self.shift else '10:00'
+            end = self.shift.end_time.strftime('%H:%M') if self.shift else '11:00'
+            return self.owner_client, 'get', '/api/shift/fixed-shift/available_teachers/', {'data': {
+                'school_id': school_id, 'day_id': self.day.id, 'place_id': self.place.id,
+                'start_time': start, 'end_time': end,
+            }}, False
+        if name == 'teachers_by_place':
+            return self.owner_client, 'get', '/api/shift/fixed-shift/teachers_by_place/', {'data': {'school_id': school_id}}, False
+        if name == 'teacher_list':
+            return self.owner_client, 'get', '/api/account/teacher/', {'data': {'page_size': 100}}, False
+        if name == 'statistics':
+            return self.owner_client, 'get', '/api/account/teacher/statistics/', {}, False
+        if name == 'copy_week':
+            return self.owner_client, 'post', '/api/shift/fixed-shift/copy_week/', {
+                'data': {'from_school_id': school_id, 'to_school_id': self.copy_target.id, 'overwrite': False},
+                'content_type': 'application/json',
+            }, True
+        if name == 'bulk_create':
+            shifts = [
+                {'day': self.day.id, 'place': self.place.id, 'start_time': f'05:{minute:02d}',
+                 'end_time': f'05:{minute + 10:02d}', 'teacher_ids': [], 'description': 'bench'}
+                for minute in range(0, 50, 10)
+            ]
+            return self.owner_client, 'post', '/api/shift/fixed-shift/bulk_create/', {
+                'data': {'shifts': shifts}, 'content_type': 'application/json',
+            }, True
+        if name == 'excel_upload':
+            return self.admin_client, 'post', '/api/file/excel-upload/bulk-upload/', {
+                'data': {'file': self.build_workbook(iteration)},
+            }, True
+        raise CommandError(f'Unknown endpoint: {name}')
+
+    def build_workbook(self, iteration):
+        """学校一括登録用のエクセルファイルを生成"""
+        prefix = f'bench{iteration}'
+        sheets = {
+            '学校情報': pd.DataFrame({'学校名': [f'{prefix}-school'], '始業時間': ['08:00'], '終業時間': ['22:00']}),
+            'ユーザー情報': pd.DataFrame({
+                'ユーザー名': [f'{prefix}-owner'] + [f'{prefix}-t{i}' for i in range(20)],
+                'メールアドレス': [f'{prefix}-owner@example.com'] + [f'{prefix}-t{i}@example.com' for i in range(20)],
+                '姓': ['山田'] * 21,
+                '名': ['太郎'] * 21,
+                '権限': ['オーナー'] + ['講師'] * 20,
+            }),
+            '指導場所': pd.DataFrame({'指導場所名': [f'スタジオ{i}' for i in range(10)]}),
+            '曜日設定': pd.DataFrame({'順番': list(range(7)), '曜日名': list('月火水木金土日')}),
+        }
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            for sheet_name, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+        return SimpleUploadedFile(
+            f'{prefix}.xlsx', output.getvalue(),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+
+    def call(self, name, iteration):
+        client, method, path, kwargs, writes = self.build_request(name, iteration)
+        if writes:
+            # 書き込み系はリクエストごとにロールバックしてデータを一定に保つ
+            with transaction.atomic():
+                response = getattr(client, method)(path, **kwargs)
+                transaction.set_rollback(True)
+        else:
+            response = getattr(client, method)(path, **kwargs)
+        return response
+
+    def run_endpoint(self, name, iterations, warmup):
+        for i in range(warmup):
+            self.call(name, -1 - i)
+
+        timings = []
+        queries = 0
+        status_codes = set()
+        for i in range(iterations):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = self.call(name, i)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = max(queries, len(context.captured_queries))
+            status_codes.add(response.status_code)
+
+        # メモリ計測は速度に影響するため別に1回だけ実行
+        tracemalloc.start()
+        try:
+            self.call(name, iterations)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'p50_ms': round(self.percentile(timings, 50), 2),
+            'p95_ms': round(self.percentile(timings, 95), 2),
+            'p99_ms': round(self.percentile(timings, 99), 2),
+            'mean_ms': round(statistics.fmean(timings), 2),
+            'queries': queries,
+            'peak_memory_kb': round(peak / 1024, 1),
+            'status_codes': sorted(status_codes),
+        }
+
+    def percentile(self, values, percent):
+        """線形補間によるパーセンタイル"""
+        ordered = sorted(values)
+        if len(ordered) == 1:
+            return ordered[0]
+        position = (len(ordered) - 1) * percent / 100
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+    def print_results(self, results):
+        header = f"{'endpoint':<20}{'p50':>10}{'p95':>10}{'p99':>10}{'queries':>9}{'peak KB':>11}  status"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<20}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                f"{result['queries']:>9}{result['peak_memory_kb']:>11.1f}  {result['status_codes']}"
+            )
+
+    def compare(self, baseline, results, threshold):
+        """ベースラインと比較し、p95・クエリ数が悪化したエンドポイントを報告"""
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if not base:
+                continue
+            p95_ratio = result['p95_ms'] / base['p95_ms'] if base['p95_ms'] else 1.0
+            messages = []
+            if p95_ratio > 1 + threshold:
+                messages.append(f"p95 {base['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms ({p95_ratio:.2f}x)")
+            if result['queries'] > base['queries']:
+                messages.append(f"queries {base['queries']} -> {result['queries']}")
+
+            if messages:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f"REGRESSION {name}: {', '.join(messages)}"))
+            else:
+                self.stdout.write(f"ok {name}: p95 {p95_ratio:.2f}x, queries {base['queries']} -> {result['queries']}")
+        return regressions
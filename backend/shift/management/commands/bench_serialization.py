@@ -0,0 +1,102 @@
+# shift/management/commands/bench_serialization.py
+
+import random
+import time
+from datetime import time as dt_time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from account.models import CustomUser
+from config.models import Place, Day
+from school.models import School
+from renderers import ORJSONRenderer
+from shift.models import FixedShift
+from shift.serializers import FixedShiftSerializer
+from shift.payloads import fixed_shift_rows
+
+
+class Command(BaseCommand):
+    help = 'Benchmark FixedShift serialization (ModelSerializer + JSONRenderer vs fast path + ORJSONRenderer)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shifts', type=int, default=10000, help='Number of fixed shifts to serialize')
+        parser.add_argument('--teachers', type=int, default=50, help='Number of teachers to assign')
+        parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs (best is reported)')
+
+    def handle(self, *args, **options):
+        # 計測用のデータは最後にロールバックする
+        with transaction.atomic():
+            school = self.create_dataset(options['shifts'], options['teachers'])
+            queryset = FixedShift.objects.filter(place__school=school).order_by(
+                'day__order', 'start_time', 'place__name'
+            )
+
+            def serializer_path():
+                shifts = queryset.select_related('day', 'place').prefetch_related('teacher')
+                return JSONRenderer().render(FixedShiftSerializer(shifts, many=True).data)
+
+            def fast_path():
+                return ORJSONRenderer().render(fixed_shift_rows(queryset))
+
+            baseline = self.measure(serializer_path, options['repeat'])
+            fast = self.measure(fast_path, options['repeat'])
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"shifts: {options['shifts']}")
+        self.stdout.write(f'ModelSerializer + JSONRenderer: {baseline * 1000:.1f} ms')
+        self.stdout.write(f'values_list + ORJSONRenderer:  {fast * 1000:.1f} ms')
+        self.stdout.write(self.style.SUCCESS(f'speedup: {baseline / fast:.1f}x'))
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def create_dataset(self, shift_count, teacher_count):
+        rng = random.Random(0)
+        school = School.objects.create(name=f'bench-{time.time_ns()}')
+        places = Place.objects.bulk_create(
+            [Place(name=f'場所{i}', school=school) for i in range(20)]
+        )
+        days = Day.objects.bulk_create(
+            [Day(name=name, order=i, school=school) for i, name in enumerate('月火水木金土日')]
+        )
+        teachers = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'{school.name}-t{i}',
+                email=f'{school.name}-t{i}@example.com',
+                first_name='太郎',
+                last_name=f'講師{i}',
+                is_teacher=True,
+            )
+            for i in range(teacher_count)
+        ])
+
+        shifts = []
+        for _ in range(shift_count):
+            start_hour = rng.randint(7, 20)
+            start_minute, end_minute = rng.choice((0, 30)), rng.choice((0, 30))
+            shifts.append(FixedShift(
+                day=rng.choice(days),
+                place=rng.choice(places),
+                start_time=dt_time(start_hour, start_minute),
+                end_time=dt_time(start_hour + 1, end_minute),
+                duration_minutes=60 - start_minute + end_minute,
+                description='レッスン',
+            ))
+        shifts = FixedShift.objects.bulk_create(shifts, batch_size=1000)
+
+        through = FixedShift.teacher.through
+        through.objects.bulk_create([
+            through(fixedshift_id=shift.id, customuser_id=teacher.id)
+            for shift in shifts
+            for teacher in rng.sample(teachers, 2)
+        ], batch_size=2000)
+
+        return school
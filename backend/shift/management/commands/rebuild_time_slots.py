@@ -0,0 +1,22 @@
+# shift/management/commands/rebuild_time_slots.py
+
+from django.core.management.base import BaseCommand
+
+from shift.models import TimeSlot
+from shift.slots import rebuild_time_slots
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the time slot catalog from fixed shifts (after bulk imports that bypass signals)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school-id', type=int, action='append', dest='school_ids', help='Only rebuild this school (repeatable)')
+
+    def handle(self, *args, **options):
+        school_ids = options['school_ids']
+        rebuild_time_slots(school_ids)
+
+        slots = TimeSlot.objects.all()
+        if school_ids:
+            slots = slots.filter(school_id__in=school_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt time slot catalog: {slots.count()} slots'))
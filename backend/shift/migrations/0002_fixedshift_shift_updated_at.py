@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shift', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fixedshift',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='更新日時'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shift',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='更新日時'),
+            preserve_default=False,
+        ),
+    ]
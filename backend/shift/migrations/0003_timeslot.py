@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_time_slots(apps, schema_editor):
+    """既存の固定シフトから時間スロットカタログを作成"""
+    FixedShift = apps.get_model('shift', 'FixedShift')
+    TimeSlot = apps.get_model('shift', 'TimeSlot')
+
+    rows = FixedShift.objects.values('day_id', 'day__school_id', 'start_time', 'end_time').annotate(
+        count=models.Count('id')
+    ).order_by()
+    TimeSlot.objects.bulk_create([
+        TimeSlot(
+            school_id=row['day__school_id'],
+            day_id=row['day_id'],
+            start_time=row['start_time'],
+            end_time=row['end_time'],
+            display=f"{row['start_time'].strftime('%H:%M')}-{row['end_time'].strftime('%H:%M')}",
+            ref_count=row['count'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0001_initial'),
+        ('config', '0002_place_day_updated_at'),
+        ('shift', '0002_fixedshift_shift_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.TimeField(verbose_name='開始時間')),
+                ('end_time', models.TimeField(verbose_name='終了時間')),
+                ('display', models.CharField(max_length=11, verbose_name='表示用文字列')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='参照している固定シフト数')),
+                ('day', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_slots', to='config.day', verbose_name='曜日')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_slots', to='school.school', verbose_name='学校')),
+            ],
+            options={
+                'verbose_name': '時間スロット',
+                'verbose_name_plural': '時間スロット',
+                'ordering': ['start_time', 'end_time'],
+                'indexes': [models.Index(fields=['school', 'day', 'start_time'], name='shift_times_school__015a63_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='timeslot',
+            constraint=models.UniqueConstraint(fields=('day', 'start_time', 'end_time'), name='unique_time_slot_per_day'),
+        ),
+        migrations.RunPython(populate_time_slots, migrations.RunPython.noop),
+    ]
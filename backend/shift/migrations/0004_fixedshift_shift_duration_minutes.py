@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:48
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+
+def populate_duration_minutes(apps, schema_editor):
+    """既存のシフトの長さをDB上で計算して保存"""
+    duration = (
+        (ExtractHour('end_time') - ExtractHour('start_time')) * 60
+        + ExtractMinute('end_time') - ExtractMinute('start_time')
+    )
+    for model_name in ('FixedShift', 'Shift'):
+        model = apps.get_model('shift', model_name)
+        model.objects.using(schema_editor.connection.alias).filter(
+            end_time__gt=models.F('start_time')
+        ).update(duration_minutes=duration)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shift', '0003_timeslot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fixedshift',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='固定シフトの長さ（分）'),
+        ),
+        migrations.AddField(
+            model_name='shift',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='シフトの長さ（分）'),
+        ),
+        migrations.RunPython(populate_duration_minutes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='fixedshift',
+            index=models.Index(fields=['place', 'duration_minutes'], name='shift_fixed_place_i_0a575a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['place', 'date', 'duration_minutes'], name='shift_shift_place_i_cfe79d_idx'),
+        ),
+    ]
@@ -3,6 +3,7 @@
 from django.db import models
 from account.models import CustomUser
 from config.models import Place, Day
+from school.models import School
 
 
 class FixedShift(models.Model):
@@ -12,11 +13,17 @@ class FixedShift(models.Model):
     teacher = models.ManyToManyField(CustomUser, blank=True, related_name='fixed_shifts', verbose_name="固定シフト割当講師")
     place = models.ForeignKey(Place, related_name='fixed_shifts', on_delete=models.CASCADE, verbose_name="固定シフト場所")
     description = models.CharField(blank=True, null=True, max_length=200, verbose_name="固定シフト内容")
+    duration_minutes = models.PositiveIntegerField(default=0, editable=False, verbose_name="固定シフトの長さ（分）")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="更新日時")
 
     class Meta:
         verbose_name = "固定シフト"
         verbose_name_plural = "固定シフト"
         ordering = ['day__order', 'start_time']
+        indexes = [
+            # 場所ごとの時間集計をインデックスだけで行う
+            models.Index(fields=['place', 'duration_minutes']),
+        ]
 
     def __str__(self):
         return f"{self.day.name} {self.start_time.strftime('%H:%M')}-{self.end_time.strftime('%H:%M')} - {self.place.name}"
@@ -29,6 +36,14 @@ class FixedShift(models.Model):
         duration = end - start
         return int(duration.total_seconds() / 60)
 
+    def save(self, *args, **kwargs):
+        # 集計用に長さを保存（bulk_create では呼ばれないため duration_minutes を指定すること）
+        self.duration_minutes = max(self.get_duration_minutes(), 0)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'start_time', 'end_time'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'duration_minutes'}
+        super().save(*args, **kwargs)
+
 
 class Shift(models.Model):
     date = models.DateField(verbose_name="日付")
@@ -37,11 +52,17 @@ class Shift(models.Model):
     place = models.ForeignKey(Place, related_name='shifts', on_delete=models.CASCADE, verbose_name="シフト場所")
     teacher = models.ManyToManyField(CustomUser, blank=True, related_name='shifts', verbose_name="シフト割当講師")
     is_empty = models.BooleanField(default=False, verbose_name="このシフトを空けるかどうか")
+    duration_minutes = models.PositiveIntegerField(default=0, editable=False, verbose_name="シフトの長さ（分）")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="更新日時")
 
     class Meta:
         verbose_name = "シフト"
         verbose_name_plural = "シフト"
         ordering = ['date', 'start_time']
+        indexes = [
+            # 期間・場所ごとの時間集計をインデックスだけで行う
+            models.Index(fields=['place', 'date', 'duration_minutes']),
+        ]
 
     def __str__(self):
         return f"{self.date} {self.start_time}-{self.end_time} - {self.place.name}"
@@ -52,4 +73,36 @@ class Shift(models.Model):
         start = datetime.combine(datetime.today(), self.start_time)
         end = datetime.combine(datetime.today(), self.end_time)
         duration = end - start
-        return int(duration.total_seconds() / 60)
\ No newline at end of file
+        return int(duration.total_seconds() / 60)
+
+    def save(self, *args, **kwargs):
+        # 集計用に長さを保存（bulk_create では呼ばれないため duration_minutes を指定すること）
+        self.duration_minutes = max(self.get_duration_minutes(), 0)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'start_time', 'end_time'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'duration_minutes'}
+        super().save(*args, **kwargs)
+
+
+class TimeSlot(models.Model):
+    """固定シフトの時間帯カタログ（曜日ごと・参照カウント付き）"""
+    school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='time_slots', verbose_name="学校")
+    day = models.ForeignKey(Day, on_delete=models.CASCADE, related_name='time_slots', verbose_name="曜日")
+    start_time = models.TimeField(verbose_name="開始時間")
+    end_time = models.TimeField(verbose_name="終了時間")
+    display = models.CharField(max_length=11, verbose_name="表示用文字列")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="参照している固定シフト数")
+
+    class Meta:
+        verbose_name = "時間スロット"
+        verbose_name_plural = "時間スロット"
+        ordering = ['start_time', 'end_time']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'start_time', 'end_time'], name='unique_time_slot_per_day'),
+        ]
+        indexes = [
+            models.Index(fields=['school', 'day', 'start_time']),
+        ]
+
+    def __str__(self):
+        return f"{self.day.name} {self.display} ({self.ref_count})"
@@ -0,0 +1,121 @@
+# shift/payloads.py
+
+"""
+固定シフトの読み取り専用高速シリアライズ
+
+ModelSerializerを経由せず、values_list() のタプルから直接レスポンスを組み立てる。
+出力は FixedShiftSerializer / FixedShiftGridSerializer と同じ形式。
+fieldset（?fields= / ?expand=）を渡すと出力しないフィールドの取得を省略する。
+"""
+
+from config.models import Place, Day
+from fieldsets import Fieldset, includes, prune_rows
+from account.payloads import teacher_profile_map
+from .models import FixedShift
+
+
+# FixedShiftSerializer.Meta.expandable と同じ
+EXPANDABLE_FIELDS = ('teacher',)
+
+SHIFT_COLUMNS = (
+    'id', 'day_id', 'start_time', 'end_time', 'place_id', 'description',
+    'place__name', 'day__name', 'day__order',
+)
+
+
+def format_time(value):
+    """TimeFieldと同じ形式（ISO 8601）で時刻を文字列化"""
+    return value.isoformat() if value is not None else None
+
+
+def duration_minutes(start_time, end_time):
+    """シフトの長さを分単位で計算（FixedShift.get_duration_minutes と同じ結果）"""
+    start = start_time.hour * 3600 + start_time.minute * 60 + start_time.second
+    end = end_time.hour * 3600 + end_time.minute * 60 + end_time.second
+    return int((end - start) / 60)
+
+
+def teacher_ids_by_shift(shift_ids):
+    """固定シフトIDごとの割当講師ID一覧"""
+    through = FixedShift.teacher.through
+    result = {}
+    for shift_id, teacher_id in through.objects.filter(
+        fixedshift_id__in=shift_ids
+    ).values_list('fixedshift_id', 'customuser_id').order_by('id'):
+        result.setdefault(shift_id, []).append(teacher_id)
+    return result
+
+
+def fixed_shift_rows(queryset, fieldset=None):
+    """固定シフト一覧（FixedShiftSerializer相当）をクエリセットの順で組み立て"""
+    rows = list(queryset.prefetch_related(None).values_list(*SHIFT_COLUMNS))
+    if not rows:
+        return []
+
+    teachers_by_shift, teachers = {}, {}
+    if includes(fieldset, 'teacher', expandable=True):
+        teachers_by_shift = teacher_ids_by_shift([row[0] for row in rows])
+        teachers = teacher_profile_map(
+            {teacher_id for ids in teachers_by_shift.values() for teacher_id in ids}
+        )
+
+    results = []
+    for (shift_id, day_id, start_time, end_time, place_id, description,
+         place_name, day_name, day_order) in rows:
+        results.append({
+            'id': shift_id,
+            'day': day_id,
+            'start_time': format_time(start_time),
+            'end_time': format_time(end_time),
+            'teacher': [teachers[teacher_id] for teacher_id in teachers_by_shift.get(shift_id, ())],
+            'place': place_id,
+            'description': description,
+            'place_name': place_name,
+            'day_name': day_name,
+            'day_order': day_order,
+            'duration_minutes': duration_minutes(start_time, end_time),
+        })
+    return prune_rows(results, fieldset, EXPANDABLE_FIELDS)
+
+
+def fixed_shift_rows_by_ids(shift_ids, fieldset=None):
+    """ID一覧の順序を保ったまま固定シフトを組み立て"""
+    if fieldset is not None and not fieldset.includes('id'):
+        # 並べ替えに使う ID は残し、最後に除く
+        rows = fixed_shift_rows_by_ids(shift_ids, Fieldset(fieldset.fields | {'id'}, fieldset.expand))
+        return [{name: value for name, value in row.items() if name != 'id'} for row in rows]
+    rows = {row['id']: row for row in fixed_shift_rows(FixedShift.objects.filter(id__in=shift_ids), fieldset)}
+    return [rows[shift_id] for shift_id in shift_ids if shift_id in rows]
+
+
+def grid_payload(school, start_hour=8, end_hour=18, hour_interval=1):
+    """時間割グリッド（FixedShiftGridSerializer相当）を組み立て"""
+    days = [
+        {'id': day_id, 'name': name, 'order': order, 'school': school_id}
+        for day_id, name, order, school_id in Day.objects.filter(
+            school=school
+        ).order_by('order').values_list('id', 'name', 'order', 'school_id')
+    ]
+    places = [
+        {'id': place_id, 'name': name, 'school': school_id}
+        for place_id, name, school_id in Place.objects.filter(
+            school=school
+        ).order_by('name').values_list('id', 'name', 'school_id')
+    ]
+    shifts = fixed_shift_rows(
+        FixedShift.objects.filter(
+            place__school=school
+        ).order_by('day__order', 'start_time', 'place__name')
+    )
+
+    return {
+        'school_id': school.id,
+        'days': days,
+        'places': places,
+        'shifts': shifts,
+        'start_hour': start_hour,
+        'end_hour': end_hour,
+        'hour_interval': hour_interval,
+        'school_start_time': format_time(school.start_time),
+        'school_end_time': format_time(school.end_time),
+    }
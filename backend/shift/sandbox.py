@@ -0,0 +1,413 @@
+# shift/sandbox.py
+
+"""
+時間割のシミュレーション（サンドボックス）
+
+学校の1週間の固定シフト・講師・指導可能場所をメモリ上の小さなモデル（__slots__ のクラスと集合）に読み込み、
+移動・講師の割当/解除/入れ替え・作成・削除の編集を順に適用して、各手順の後の
+講師の重複・指導可能場所の違反・未割当のシフト・講師ごとの勤務時間を返す。データベースには書き込まない。
+
+他の学校の固定シフトとの重複は読み込み時点の interval_index と比較する（曜日は曜日番号で比較）。
+new_conflicts() は読み込み時点になかった重複・違反のみを返し、保存の可否はこれで判断する。
+apply_sandbox() は最後の状態と読み込み時点の差分だけをまとめて保存する。
+読み込み時点の内容のハッシュ（base_version）を返し、保存時に変わっていれば保存しない。
+"""
+
+import hashlib
+from collections import defaultdict
+from datetime import time
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+import caching
+from account.models import CustomUser
+from config.models import normalize_weekday
+from search.index import index_objects
+from . import events
+from .intervals import interval_index, to_minutes
+from .models import FixedShift
+from .slots import rebuild_time_slots
+
+
+BATCH_SIZE = 1000
+OPERATIONS = ('move', 'assign', 'unassign', 'swap', 'create', 'delete')
+
+
+class SandboxError(Exception):
+    """適用できない編集"""
+
+
+def parse_minutes(value):
+    """'HH:MM' を0時からの分に変換"""
+    try:
+        hour, minute = str(value).split(':')[:2]
+        hour, minute = int(hour), int(minute)
+    except (TypeError, ValueError):
+        raise SandboxError(f'時刻「{value}」の形式が正しくありません（HH:MM形式で入力してください）')
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise SandboxError(f'時刻「{value}」の形式が正しくありません（HH:MM形式で入力してください）')
+    return hour * 60 + minute
+
+
+def parse_id(value, label):
+    """ID（整数）の検証（真偽値・文字列・リストなどは SandboxError）"""
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise SandboxError(f'{label}は整数で指定してください')
+    return value
+
+
+def format_minutes(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+class SandboxShift:
+    """メモリ上の固定シフト（作成したシフトの ID は負の数）"""
+    __slots__ = ('id', 'day_id', 'place_id', 'start', 'end', 'description', 'teachers')
+
+    def __init__(self, shift_id, day_id, place_id, start, end, description, teachers=()):
+        self.id = shift_id
+        self.day_id = day_id
+        self.place_id = place_id
+        self.start = start
+        self.end = end
+        self.description = description
+        self.teachers = set(teachers)
+
+    def key(self):
+        """差分の比較用"""
+        return (self.day_id, self.place_id, self.start, self.end, self.description, frozenset(self.teachers))
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'day_id': self.day_id,
+            'place_id': self.place_id,
+            'start_time': format_minutes(self.start),
+            'end_time': format_minutes(self.end),
+            'description': self.description,
+            'teacher_ids': sorted(self.teachers),
+        }
+
+
+class Timetable:
+    """1つの学校の1週間の時間割"""
+    __slots__ = (
+        'school_id', 'shifts', 'original', 'weekdays', 'places', 'members', 'owners',
+        'eligible', 'external', 'base_version', '_next_id',
+    )
+
+    def __init__(self, school_id):
+        self.school_id = school_id
+        self.shifts = {}  # shift_id -> SandboxShift
+        self.original = {}  # shift_id -> SandboxShift.key()（読み込み時点）
+        self.weekdays = {}  # day_id -> 曜日番号
+        self.places = set()
+        self.members = set()  # 割り当てられる講師・オーナー
+        self.owners = set()  # 全ての場所で指導可能
+        self.eligible = {}  # teacher_id -> {place_id, ...}
+        self.external = {}  # teacher_id -> [(曜日番号, 開始分, 終了分, shift_id), ...]（他の学校）
+        self.base_version = None
+        self._next_id = -1
+
+    @classmethod
+    def load(cls, school, lock=False):
+        """
+        学校の時間割を読み込む（シフトの件数によらず一定回数のクエリ）
+
+        lock=True の場合は固定シフトの行を select_for_update でロックする（保存前の読み込み用）。
+        """
+        timetable = cls(school.id)
+        for day_id, name, order in school.days.values_list('id', 'name', 'order'):
+            timetable.weekdays[day_id] = normalize_weekday(name, order)
+        timetable.places = set(school.places.values_list('id', flat=True))
+
+        shifts = FixedShift.objects.filter(place__school=school)
+        if lock:
+            shifts = shifts.select_for_update(of=('self',))
+        for shift_id, day_id, place_id, start_time, end_time, description in shifts.values_list('id', 'day_id', 'place_id', 'start_time', 'end_time', 'description'):
+            timetable.shifts[shift_id] = SandboxShift(
+                shift_id, day_id, place_id, to_minutes(start_time), to_minutes(end_time), description
+            )
+        for shift_id, teacher_id in FixedShift.teacher.through.objects.filter(
+            fixedshift__place__school=school
+        ).values_list('fixedshift_id', 'customuser_id'):
+            timetable.shifts[shift_id].teachers.add(teacher_id)
+
+        for user_id, is_owner in CustomUser.objects.filter(
+            Q(is_teacher=True) | Q(is_owner=True), schools=school
+        ).values_list('id', 'is_owner'):
+            timetable.members.add(user_id)
+            if is_owner:
+                timetable.owners.add(user_id)
+        for user_id, place_id in CustomUser.place.through.objects.filter(
+            place__school=school
+        ).values_list('customuser_id', 'place_id'):
+            timetable.eligible.setdefault(user_id, set()).add(place_id)
+
+        for teacher_id, week in interval_index.get(timetable.members).items():
+            external = [
+                (weekday, start, end, shift_id)
+                for shift_id, (weekday, start, end, school_id) in week.shifts.items() if school_id != school.id
+            ]
+            if external:
+                timetable.external[teacher_id] = external
+
+        timetable.original = {shift_id: shift.key() for shift_id, shift in timetable.shifts.items()}
+        timetable.base_version = hashlib.md5(
+            repr(sorted((shift_id, *key[:5], sorted(key[5])) for shift_id, key in timetable.original.items())).encode()
+        ).hexdigest()
+        return timetable
+
+    # 編集
+
+    def _shift(self, shift_id):
+        shift = self.shifts.get(parse_id(shift_id, '固定シフトID'))
+        if shift is None:
+            raise SandboxError(f'固定シフト {shift_id} が見つかりません')
+        return shift
+
+    def _teacher(self, teacher_id):
+        if parse_id(teacher_id, '講師ID') not in self.members:
+            raise SandboxError(f'講師 {teacher_id} はこの学校に所属していません')
+        return teacher_id
+
+    def _description(self, value):
+        if value is not None and not isinstance(value, str):
+            raise SandboxError('description は文字列で指定してください')
+        return value
+
+    def _place_and_times(self, shift, edit):
+        day_id = edit.get('day_id', shift.day_id if shift else None)
+        place_id = edit.get('place_id', shift.place_id if shift else None)
+        start = parse_minutes(edit['start_time']) if 'start_time' in edit else shift.start
+        end = parse_minutes(edit['end_time']) if 'end_time' in edit else shift.end
+        if parse_id(day_id, '曜日ID') not in self.weekdays:
+            raise SandboxError(f'曜日 {day_id} が見つかりません')
+        if parse_id(place_id, '指導場所ID') not in self.places:
+            raise SandboxError(f'指導場所 {place_id} が見つかりません')
+        if start >= end:
+            raise SandboxError('開始時間は終了時間より前である必要があります')
+        return day_id, place_id, start, end
+
+    def apply(self, edit):
+        """1件の編集を適用（対象のシフトIDを返す）"""
+        if not isinstance(edit, dict):
+            raise SandboxError('編集はオブジェクトで指定してください')
+        op = edit.get('op')
+        if op not in OPERATIONS:
+            raise SandboxError(f"op は {', '.join(OPERATIONS)} のいずれかを指定してください")
+
+        if op == 'create':
+            for field in ('day_id', 'place_id', 'start_time', 'end_time'):
+                if field not in edit:
+                    raise SandboxError(f'{field} が必要です')
+            day_id, place_id, start, end = self._place_and_times(None, edit)
+            teacher_ids = edit.get('teacher_ids', [])
+            if not isinstance(teacher_ids, list):
+                raise SandboxError('teacher_ids はリスト形式で指定してください')
+            teachers = [self._teacher(teacher_id) for teacher_id in teacher_ids]
+            shift = SandboxShift(
+                self._next_id, day_id, place_id, start, end, self._description(edit.get('description')), teachers
+            )
+            self._next_id -= 1
+            self.shifts[shift.id] = shift
+            return [shift.id]
+
+        shift = self._shift(edit.get('shift_id'))
+        if op == 'move':
+            shift.day_id, shift.place_id, shift.start, shift.end = self._place_and_times(shift, edit)
+            if 'description' in edit:
+                shift.description = self._description(edit['description'])
+        elif op == 'assign':
+            shift.teachers.add(self._teacher(edit.get('teacher_id')))
+        elif op == 'unassign':
+            shift.teachers.discard(parse_id(edit.get('teacher_id'), '講師ID'))
+        elif op == 'swap':
+            # 2つのシフトの講師を入れ替える
+            other = self._shift(edit.get('other_shift_id'))
+            teacher_id = parse_id(edit.get('teacher_id'), '講師ID')
+            other_teacher_id = parse_id(edit.get('other_teacher_id'), '講師ID')
+            if teacher_id not in shift.teachers:
+                raise SandboxError(f'講師 {teacher_id} は固定シフト {shift.id} に割り当てられていません')
+            if other_teacher_id not in other.teachers:
+                raise SandboxError(f'講師 {other_teacher_id} は固定シフト {other.id} に割り当てられていません')
+            shift.teachers.discard(teacher_id)
+            other.teachers.discard(other_teacher_id)
+            shift.teachers.add(other_teacher_id)
+            other.teachers.add(teacher_id)
+            return [shift.id, other.id]
+        elif op == 'delete':
+            del self.shifts[shift.id]
+        return [shift.id]
+
+    # 評価
+
+    def conflicts(self):
+        """講師の時間帯の重複・他の学校との重複・指導可能場所の違反"""
+        by_teacher = defaultdict(list)
+        for shift in self.shifts.values():
+            weekday = self.weekdays[shift.day_id]
+            for teacher_id in shift.teachers:
+                by_teacher[teacher_id].append((weekday, shift.start, shift.end, shift.id, True))
+
+        result = []
+        for teacher_id, intervals in by_teacher.items():
+            intervals.extend((*interval, False) for interval in self.external.get(teacher_id, ()))
+            # 曜日・開始順に走査し、まだ終わっていない区間と比べる
+            active = []
+            for weekday, start, end, shift_id, own in sorted(intervals):
+                active = [entry for entry in active if entry[0] == weekday and entry[1] > start]
+                for _, _, other_id, other_own in active:
+                    if own and other_own:
+                        result.append({'type': 'overlap', 'teacher_id': teacher_id, 'shift_ids': [other_id, shift_id]})
+                    elif own or other_own:
+                        result.append({
+                            'type': 'other_school', 'teacher_id': teacher_id,
+                            'shift_id': shift_id if own else other_id,
+                            'other_shift_id': other_id if own else shift_id,
+                        })
+                active.append((weekday, end, shift_id, own))
+
+        for shift in self.shifts.values():
+            for teacher_id in sorted(shift.teachers):
+                if teacher_id not in self.owners and shift.place_id not in self.eligible.get(teacher_id, ()):
+                    result.append({'type': 'place', 'teacher_id': teacher_id, 'shift_id': shift.id})
+        return result
+
+    def coverage(self):
+        """シフト数・未割当のシフト（曜日ごと）"""
+        by_day = {day_id: {'shifts': 0, 'unassigned': 0} for day_id in self.weekdays}
+        unassigned = []
+        for shift in self.shifts.values():
+            by_day[shift.day_id]['shifts'] += 1
+            if not shift.teachers:
+                by_day[shift.day_id]['unassigned'] += 1
+                unassigned.append(shift.id)
+        return {
+            'shifts': len(self.shifts),
+            'unassigned': len(unassigned),
+            'unassigned_shift_ids': sorted(unassigned),
+            'by_day': by_day,
+        }
+
+    def teacher_minutes(self):
+        """講師ごとのこの学校での週の勤務時間（分）"""
+        minutes = defaultdict(int)
+        for shift in self.shifts.values():
+            for teacher_id in shift.teachers:
+                minutes[teacher_id] += shift.end - shift.start
+        return dict(minutes)
+
+    def diff(self):
+        """読み込み時点からの差分"""
+        created = [shift for shift_id, shift in self.shifts.items() if shift_id < 0]
+        deleted = [shift_id for shift_id in self.original if shift_id not in self.shifts]
+        updated = [
+            shift for shift_id, shift in self.shifts.items()
+            if shift_id > 0 and shift.key() != self.original[shift_id]
+        ]
+        return created, updated, deleted
+
+    def summary(self):
+        created, updated, deleted = self.diff()
+        return {
+            'created': [shift.as_dict() for shift in created],
+            'updated': [shift.as_dict() for shift in updated],
+            'deleted': sorted(deleted),
+        }
+
+
+def _conflict_key(conflict):
+    # 重複の2つのシフトの順番は開始時間で変わるため、順番によらない形にする
+    return tuple(sorted(
+        (field, tuple(sorted(value)) if isinstance(value, list) else value) for field, value in conflict.items()
+    ))
+
+
+def new_conflicts(before, after):
+    """after の重複・違反のうち before（読み込み時点）になかったもの"""
+    existing = {_conflict_key(conflict) for conflict in before}
+    return [conflict for conflict in after if _conflict_key(conflict) not in existing]
+
+
+def simulate(timetable, edits):
+    """編集を順に適用し、手順ごとの評価を返す（適用できない編集があれば SandboxError）"""
+    steps = []
+    for index, edit in enumerate(edits):
+        try:
+            shift_ids = timetable.apply(edit)
+        except SandboxError as e:
+            raise SandboxError(f'{index + 1}件目: {e}')
+        steps.append({
+            'step': index + 1,
+            'op': edit['op'],
+            'shift_ids': shift_ids,
+            'conflicts': timetable.conflicts(),
+            'coverage': timetable.coverage(),
+            'teacher_minutes': timetable.teacher_minutes(),
+        })
+    return steps
+
+
+def _time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+@transaction.atomic
+def apply_sandbox(school, timetable):
+    """シミュレーション結果の差分をまとめて保存し、件数と作成したシフトのID（仮ID -> ID）を返す"""
+    Through = FixedShift.teacher.through
+    created, updated, deleted = timetable.diff()
+    now = timezone.now()
+
+    if deleted:
+        # 削除はシグナルを通す（同期用の削除記録・イベントなど）
+        FixedShift.objects.filter(id__in=deleted).delete()
+
+    previous_teachers = set()
+    if updated:
+        FixedShift.objects.bulk_update([
+            FixedShift(
+                id=shift.id, day_id=shift.day_id, place_id=shift.place_id,
+                start_time=_time(shift.start), end_time=_time(shift.end), description=shift.description,
+                duration_minutes=shift.end - shift.start, updated_at=now,
+            )
+            for shift in updated
+        ], ['day_id', 'place_id', 'start_time', 'end_time', 'description', 'duration_minutes', 'updated_at'],
+            batch_size=BATCH_SIZE)
+
+        # 講師が変わったシフトのみ中間テーブルを作り直す
+        reassigned = [shift for shift in updated if shift.key()[5] != timetable.original[shift.id][5]]
+        for shift in reassigned:
+            previous_teachers |= timetable.original[shift.id][5]
+        Through.objects.filter(fixedshift_id__in=[shift.id for shift in reassigned]).delete()
+        Through.objects.bulk_create([
+            Through(fixedshift_id=shift.id, customuser_id=teacher_id)
+            for shift in reassigned for teacher_id in shift.teachers
+        ], batch_size=BATCH_SIZE)
+
+    objects = FixedShift.objects.bulk_create([
+        FixedShift(
+            day_id=shift.day_id, place_id=shift.place_id,
+            start_time=_time(shift.start), end_time=_time(shift.end), description=shift.description,
+            duration_minutes=shift.end - shift.start,
+        )
+        for shift in created
+    ], batch_size=BATCH_SIZE)
+    Through.objects.bulk_create([
+        Through(fixedshift_id=obj.id, customuser_id=teacher_id)
+        for obj, shift in zip(objects, created) for teacher_id in shift.teachers
+    ], batch_size=BATCH_SIZE)
+
+    # シグナルを通らない更新の反映
+    changed_ids = [*(shift.id for shift in updated), *(obj.id for obj in objects)]
+    rebuild_time_slots([school.id])
+    index_objects('fixed_shift', changed_ids)
+
+    statistics = {'created': len(created), 'updated': len(updated), 'deleted': len(deleted)}
+    transaction.on_commit(lambda: interval_index.refresh_shifts(changed_ids, previous_teachers))
+    transaction.on_commit(lambda: events.publish('shift.sandbox_applied', school.id, **statistics))
+    transaction.on_commit(lambda: caching.invalidate_school(school.id))
+    return statistics, {shift.id: obj.id for obj, shift in zip(objects, created)}
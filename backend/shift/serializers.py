@@ -2,13 +2,16 @@
 
 from rest_framework import serializers
 from django.db.models import Q
+
+from fieldsets import SparseFieldsetMixin
 from .models import FixedShift
+from .intervals import interval_index
 from account.models import CustomUser
 from config.serializers import DaySerializer, PlaceSerializer
 from account.serializers import TeacherProfileSerializer
 
 
-class FixedShiftSerializer(serializers.ModelSerializer):
+class FixedShiftSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """固定シフトシリアライザー"""
     teacher = TeacherProfileSerializer(many=True, read_only=True)
     teacher_ids = serializers.ListField(
@@ -28,6 +31,9 @@ class FixedShiftSerializer(serializers.ModelSerializer):
             'id', 'day', 'start_time', 'end_time', 'teacher', 'teacher_ids', 'place', 'description',
             'place_name', 'day_name', 'day_order', 'duration_minutes'
         ]
+        expandable = ['teacher']
+        select_related_fields = {'place_name': ['place'], 'day_name': ['day'], 'day_order': ['day']}
+        prefetch_related_fields = {'teacher': ['teacher']}
     
     def get_duration_minutes(self, obj):
         """シフトの長さを分単位で計算"""
@@ -95,25 +101,23 @@ class FixedShiftSerializer(serializers.ModelSerializer):
                             f"講師 '{teacher.username}' は場所 '{place.name}' での指導権限がありません。"
                         )
             
-            # 編集の場合は自分自身を除外
-            existing_shifts = FixedShift.objects.filter(day=day)
-            if self.instance:
-                existing_shifts = existing_shifts.exclude(id=self.instance.id)
-            
-            # 時間の重複をチェック
-            for shift in existing_shifts:
-                # 時間が重複しているかチェック
-                if not (end_time <= shift.start_time or start_time >= shift.end_time):
-                    # 重複している講師がいるかチェック
-                    existing_teacher_ids = list(shift.teacher.values_list('id', flat=True))
-                    overlapping_teachers = set(teacher_ids) & set(existing_teacher_ids)
-                    if overlapping_teachers:
-                        teacher_names = CustomUser.objects.filter(
-                            id__in=overlapping_teachers
-                        ).values_list('username', flat=True)
-                        raise serializers.ValidationError(
-                            f"講師 {', '.join(teacher_names)} は{shift.start_time.strftime('%H:%M')}-{shift.end_time.strftime('%H:%M')}の時間に既に別の場所でシフトが組まれています。"
-                        )
+            # 曜日番号で比較し、他の学校のシフトとの重複も検出する（編集の場合は自分自身を除外）
+            conflicts = interval_index.find_conflicts(
+                teacher_ids, day.weekday, start_time, end_time,
+                exclude_shift_id=self.instance.id if self.instance else None
+            )
+            if conflicts:
+                shift = FixedShift.objects.filter(
+                    id__in={shift_id for shift_ids in conflicts.values() for shift_id in shift_ids}
+                ).select_related('place__school').order_by('start_time').first()
+                if shift:
+                    teacher_names = CustomUser.objects.filter(
+                        id__in=[teacher_id for teacher_id, shift_ids in conflicts.items() if shift.id in shift_ids]
+                    ).values_list('username', flat=True)
+                    where = '別の場所' if shift.place.school_id == day.school_id else shift.place.school.name
+                    raise serializers.ValidationError(
+                        f"講師 {', '.join(teacher_names)} は{shift.start_time.strftime('%H:%M')}-{shift.end_time.strftime('%H:%M')}の時間に既に{where}でシフトが組まれています。"
+                    )
         
         return data
 
@@ -134,7 +138,7 @@ class FixedShiftGridSerializer(serializers.Serializer):
     school_end_time = serializers.TimeField(read_only=True)
 
 
-class AvailableTeacherSerializer(serializers.ModelSerializer):
+class AvailableTeacherSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """割り当て可能講師シリアライザー"""
     full_name = serializers.SerializerMethodField()
     is_available = serializers.SerializerMethodField()
@@ -150,6 +154,8 @@ class AvailableTeacherSerializer(serializers.ModelSerializer):
             'is_available', 'current_shifts', 'can_teach_at_place', 'available_places',
             'role_display', 'is_teacher', 'is_owner'
         ]
+        # 講師ごとにクエリを発行するため、指定した場合のみ出力する
+        expandable = ['current_shifts', 'available_places']
     
     def get_full_name(self, obj):
         if obj.last_name and obj.first_name:
@@ -182,18 +188,8 @@ class AvailableTeacherSerializer(serializers.ModelSerializer):
             if not obj.place.filter(id=place_id).exists():
                 return False
         
-        # 同じ時間に他の固定シフトがあるかチェック
-        conflicting_shifts = FixedShift.objects.filter(
-            day_id=day_id,
-            teacher=obj
-        )
-        
-        for shift in conflicting_shifts:
-            # 時間が重複しているかチェック
-            if not (end_time <= shift.start_time or start_time >= shift.end_time):
-                return False
-        
-        return True
+        # 同じ曜日・時間に他の固定シフトがあるか（ビューで interval_index から求めた重複、他の学校を含む）
+        return obj.id not in self.context.get('conflicts', {})
     
     def get_can_teach_at_place(self, obj):
         """指定された場所で指導可能かチェック"""
@@ -226,29 +222,24 @@ class AvailableTeacherSerializer(serializers.ModelSerializer):
         return [{'id': place.id, 'name': place.name} for place in places]
     
     def get_current_shifts(self, obj):
-        """現在の固定シフト情報"""
-        day_id = self.context.get('day_id')
-        start_time = self.context.get('start_time')
-        end_time = self.context.get('end_time')
-        
-        if not all([day_id, start_time, end_time]):
+        """指定された時間と重なる固定シフト（管理していない学校のシフトは場所・内容を返さない）"""
+        shift_ids = self.context.get('conflicts', {}).get(obj.id)
+        if not shift_ids:
             return []
         
-        shifts = FixedShift.objects.filter(
-            day_id=day_id,
-            teacher=obj
-        ).select_related('place')
+        managed_school_ids = self.context.get('managed_school_ids', set())
+        shifts = FixedShift.objects.filter(id__in=shift_ids).select_related('place__school').order_by('start_time')
         
-        # 時間が重複するシフトのみ取得
         conflicting_shifts = []
         for shift in shifts:
-            if not (end_time <= shift.start_time or start_time >= shift.end_time):
-                conflicting_shifts.append({
-                    'place_name': shift.place.name, 
-                    'description': shift.description,
-                    'start_time': shift.start_time.strftime('%H:%M'),
-                    'end_time': shift.end_time.strftime('%H:%M')
-                })
+            managed = shift.place.school_id in managed_school_ids
+            conflicting_shifts.append({
+                'school_name': shift.place.school.name,
+                'place_name': shift.place.name if managed else None,
+                'description': shift.description if managed else None,
+                'start_time': shift.start_time.strftime('%H:%M'),
+                'end_time': shift.end_time.strftime('%H:%M')
+            })
         
         return conflicting_shifts
 
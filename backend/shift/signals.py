@@ -0,0 +1,247 @@
+# shift/signals.py
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+import caching
+from account.models import CustomUser
+from config.models import Day, Place
+from school.models import School
+from .models import FixedShift
+from .slots import increment_slot, decrement_slot
+from .intervals import interval_index
+from . import events
+
+
+def _shift_payload(shift):
+    """イベント用の固定シフト情報（最小限）"""
+    return {
+        'shift_id': shift.id,
+        'day_id': shift.day_id,
+        'place_id': shift.place_id,
+        'start_time': shift.start_time.strftime('%H:%M:%S') if shift.start_time else None,
+        'end_time': shift.end_time.strftime('%H:%M:%S') if shift.end_time else None,
+        'description': shift.description,
+    }
+
+
+def _school_id_for(shift):
+    school_id = getattr(shift, '_event_school_id', None)
+    if school_id is None:
+        school_id = shift.place.school_id
+    return school_id
+
+
+def _publish_on_commit(event_type, school_id, **payload):
+    transaction.on_commit(lambda: events.publish(event_type, school_id, **payload))
+
+
+@receiver(pre_save, sender=FixedShift)
+def fixed_shift_pre_save(sender, instance, **kwargs):
+    # 更新前の時間帯を保持（時間スロットカタログの付け替え用）
+    instance._previous_slot = None
+    if instance.pk:
+        instance._previous_slot = FixedShift.objects.filter(pk=instance.pk).values_list(
+            'day_id', 'start_time', 'end_time'
+        ).first()
+
+
+@receiver(post_save, sender=FixedShift)
+def fixed_shift_update_time_slots(sender, instance, created, **kwargs):
+    """時間スロットカタログの参照カウントを更新"""
+    current = (instance.day_id, instance.start_time, instance.end_time)
+    previous = getattr(instance, '_previous_slot', None)
+    if previous == current:
+        return
+    if previous is not None:
+        decrement_slot(*previous)
+    increment_slot(*current, school_id=instance.day.school_id)
+
+
+@receiver(post_save, sender=FixedShift)
+def fixed_shift_saved(sender, instance, created, **kwargs):
+    """固定シフトの作成・更新イベント"""
+    event_type = 'shift.created' if created else 'shift.updated'
+    _publish_on_commit(event_type, _school_id_for(instance), **_shift_payload(instance))
+
+
+@receiver(post_save, sender=FixedShift)
+def fixed_shift_update_intervals(sender, instance, created, **kwargs):
+    """講師の週間時間帯インデックスを更新（作成時は講師が未割当）"""
+    if not created:
+        shift_ids = [instance.id]
+        transaction.on_commit(lambda: interval_index.refresh_shifts(shift_ids))
+
+
+@receiver(pre_delete, sender=FixedShift)
+def fixed_shift_pre_delete(sender, instance, **kwargs):
+    # カスケード削除で場所が先に消える場合に備えて学校IDを保持
+    instance._event_school_id = instance.place.school_id
+    # 中間テーブルの行はシグナルなしで削除されるため担当講師を保持
+    instance._interval_teacher_ids = list(instance.teacher.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=FixedShift)
+def fixed_shift_release_time_slot(sender, instance, **kwargs):
+    decrement_slot(instance.day_id, instance.start_time, instance.end_time)
+
+
+@receiver(post_delete, sender=FixedShift)
+def fixed_shift_release_intervals(sender, instance, **kwargs):
+    shift_ids = [instance.id]
+    teacher_ids = getattr(instance, '_interval_teacher_ids', [])
+    transaction.on_commit(lambda: interval_index.refresh_shifts(shift_ids, teacher_ids))
+
+
+@receiver(post_delete, sender=FixedShift)
+def fixed_shift_deleted(sender, instance, **kwargs):
+    """固定シフトの削除イベント"""
+    _publish_on_commit(
+        'shift.deleted',
+        _school_id_for(instance),
+        shift_id=instance.id,
+        day_id=instance.day_id,
+        place_id=instance.place_id,
+    )
+
+
+@receiver(m2m_changed, sender=FixedShift.teacher.through)
+def fixed_shift_teachers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """講師割当の変更イベント"""
+    if action == 'pre_clear' and reverse:
+        # 講師側からclearされる場合は対象シフトを事前に記録
+        instance._event_cleared_shift_ids = list(
+            instance.fixed_shifts.values_list('id', flat=True)
+        )
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        shift_ids = pk_set if action != 'post_clear' else getattr(instance, '_event_cleared_shift_ids', [])
+    else:
+        shift_ids = [instance.id]
+
+    if not shift_ids:
+        return
+
+    shifts = FixedShift.objects.filter(
+        id__in=shift_ids
+    ).select_related('place').prefetch_related('teacher')
+    for shift in shifts:
+        _publish_on_commit(
+            'shift.teachers_changed',
+            shift.place.school_id,
+            shift_id=shift.id,
+            day_id=shift.day_id,
+            place_id=shift.place_id,
+            teacher_ids=sorted(teacher.id for teacher in shift.teacher.all()),
+        )
+
+
+@receiver(m2m_changed, sender=FixedShift.teacher.through)
+def fixed_shift_teachers_update_intervals(sender, instance, action, reverse, pk_set, **kwargs):
+    """講師割当の変更を週間時間帯インデックスへ反映"""
+    if action == 'pre_clear':
+        related = instance.fixed_shifts if reverse else instance.teacher
+        instance._interval_cleared_ids = list(related.values_list('id', flat=True))
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    related_ids = list(pk_set or ()) if action != 'post_clear' else getattr(instance, '_interval_cleared_ids', [])
+    if reverse:
+        shift_ids, teacher_ids = related_ids, [instance.id]
+    else:
+        shift_ids, teacher_ids = [instance.id], related_ids
+    transaction.on_commit(lambda: interval_index.refresh_shifts(shift_ids, teacher_ids))
+
+
+@receiver(post_save, sender=Day)
+def day_update_intervals(sender, instance, created, **kwargs):
+    """曜日名・順番の変更（曜日番号が変わる可能性がある）"""
+    if not created:
+        shift_ids = list(instance.fixedshift_set.values_list('id', flat=True))
+        transaction.on_commit(lambda: interval_index.refresh_shifts(shift_ids))
+
+
+# 学校ごとのキャッシュ（singleflight の共有結果など）に含まれるユーザーのフィールド（last_login のみの更新などは無視）
+SHARED_USER_FIELDS = {'username', 'email', 'first_name', 'last_name', 'is_active', 'is_teacher', 'is_owner'}
+
+
+def _invalidate_shared_on_commit(school_ids):
+    school_ids = [school_id for school_id in school_ids if school_id is not None]
+    if school_ids:
+        transaction.on_commit(lambda: caching.invalidate_school(*school_ids))
+
+
+@receiver(post_save, sender=FixedShift)
+@receiver(post_delete, sender=FixedShift)
+def fixed_shift_invalidate_shared(sender, instance, **kwargs):
+    """時間割グリッドなどの共有結果を無効化"""
+    _invalidate_shared_on_commit([_school_id_for(instance)])
+
+
+@receiver(m2m_changed, sender=FixedShift.teacher.through)
+def fixed_shift_teachers_invalidate_shared(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        _invalidate_shared_on_commit(list(instance.schools.values_list('id', flat=True)))
+    else:
+        _invalidate_shared_on_commit([instance.place.school_id])
+
+
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+@receiver(post_save, sender=Day)
+@receiver(post_delete, sender=Day)
+def school_config_invalidate_shared(sender, instance, **kwargs):
+    _invalidate_shared_on_commit([instance.school_id])
+
+
+@receiver(post_save, sender=School)
+def school_invalidate_shared(sender, instance, created, **kwargs):
+    if not created:
+        _invalidate_shared_on_commit([instance.id])
+
+
+@receiver(post_save, sender=CustomUser)
+def user_invalidate_shared(sender, instance, created, update_fields=None, **kwargs):
+    """講師名・権限の変更（所属する全ての学校）"""
+    if created or (update_fields is not None and not SHARED_USER_FIELDS & set(update_fields)):
+        return
+    _invalidate_shared_on_commit(list(instance.schools.values_list('id', flat=True)))
+
+
+@receiver(m2m_changed, sender=CustomUser.schools.through)
+def membership_invalidate_shared(sender, instance, action, reverse, pk_set, **kwargs):
+    """所属学校の追加・削除（スタッフ一覧）"""
+    if action == 'pre_clear' and not reverse:
+        instance._cleared_school_ids = list(instance.schools.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if reverse:
+            _invalidate_shared_on_commit([instance.id])
+        elif action == 'post_clear':
+            _invalidate_shared_on_commit(getattr(instance, '_cleared_school_ids', []))
+        else:
+            _invalidate_shared_on_commit(pk_set or [])
+
+
+@receiver(m2m_changed, sender=CustomUser.place.through)
+def place_assignment_invalidate_shared(sender, instance, action, reverse, pk_set, **kwargs):
+    """指導可能場所の追加・削除"""
+    if action == 'pre_clear' and not reverse:
+        instance._cleared_place_school_ids = list(instance.place.values_list('school_id', flat=True).distinct())
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if reverse:
+            _invalidate_shared_on_commit([instance.school_id])
+        elif action == 'post_clear':
+            _invalidate_shared_on_commit(getattr(instance, '_cleared_place_school_ids', []))
+        elif pk_set:
+            _invalidate_shared_on_commit(
+                list(Place.objects.filter(id__in=pk_set).values_list('school_id', flat=True).distinct())
+            )
@@ -0,0 +1,75 @@
+# shift/slots.py
+
+"""
+時間スロットカタログの管理
+
+固定シフトの保存・削除に合わせて (曜日, 開始, 終了) ごとの参照カウントを増減し、
+最後の固定シフトが無くなったスロットは削除する。
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from config.models import Day
+from .models import FixedShift, TimeSlot
+
+
+def format_slot(start_time, end_time):
+    return f"{start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')}"
+
+
+def increment_slot(day_id, start_time, end_time, school_id=None):
+    """スロットの参照カウントを1増やす（無ければ作成）"""
+    slots = TimeSlot.objects.filter(day_id=day_id, start_time=start_time, end_time=end_time)
+    if slots.update(ref_count=F('ref_count') + 1):
+        return
+
+    if school_id is None:
+        school_id = Day.objects.values_list('school_id', flat=True).get(id=day_id)
+    try:
+        with transaction.atomic():
+            TimeSlot.objects.create(
+                school_id=school_id,
+                day_id=day_id,
+                start_time=start_time,
+                end_time=end_time,
+                display=format_slot(start_time, end_time),
+                ref_count=1,
+            )
+    except IntegrityError:
+        # 同時に作成された場合は加算し直す
+        slots.update(ref_count=F('ref_count') + 1)
+
+
+def decrement_slot(day_id, start_time, end_time):
+    """スロットの参照カウントを1減らす（0になれば削除）"""
+    slots = TimeSlot.objects.filter(day_id=day_id, start_time=start_time, end_time=end_time)
+    slots.filter(ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    slots.filter(ref_count=0).delete()
+
+
+def rebuild_time_slots(school_ids=None):
+    """固定シフトからカタログを作り直す（一括登録などシグナルを通らない更新の後に使用）"""
+    shifts = FixedShift.objects.all()
+    slots = TimeSlot.objects.all()
+    if school_ids is not None:
+        shifts = shifts.filter(day__school_id__in=school_ids)
+        slots = slots.filter(school_id__in=school_ids)
+
+    rows = shifts.values('day_id', 'day__school_id', 'start_time', 'end_time').annotate(
+        count=Count('id')
+    ).order_by()
+
+    with transaction.atomic():
+        slots.delete()
+        TimeSlot.objects.bulk_create([
+            TimeSlot(
+                school_id=row['day__school_id'],
+                day_id=row['day_id'],
+                start_time=row['start_time'],
+                end_time=row['end_time'],
+                display=format_slot(row['start_time'], row['end_time']),
+                ref_count=row['count'],
+            )
+            for row in rows
+        ], batch_size=1000)
@@ -1,3 +1,520 @@
-from django.test import TestCase
+from datetime import date, time
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+
+from account.models import CustomUser
+from config.models import Day, Place
+from fieldsets import Fieldset, prune_queryset
+from school.models import School
+
+from .assignment import AssignmentSolver
+from .coverage import fixed_shift_coverage, shift_coverage
+from .events import EventHub
+from .intervals import interval_index
+from .layout import assign_lanes, grid_layout
+from .models import FixedShift, Shift, TimeSlot
+from .serializers import FixedShiftSerializer
+from .slots import rebuild_time_slots
+
+
+class ShiftFixtureMixin:
+    """2つの学校に所属する講師と、各学校の月曜・場所"""
+
+    def setUp(self):
+        self.school = School.objects.create(name='学校A')
+        self.other_school = School.objects.create(name='学校B')
+        self.day = Day.objects.create(name='月', order=0, school=self.school)
+        self.other_day = Day.objects.create(name='月曜日', order=3, school=self.other_school)
+        self.place = Place.objects.create(name='教室A', school=self.school)
+        self.other_place = Place.objects.create(name='教室B', school=self.other_school)
+
+        self.owner = CustomUser.objects.create_user(
+            'owner', email='owner@example.com', password='pass', is_owner=True
+        )
+        self.owner.schools.add(self.school)
+        self.teacher = CustomUser.objects.create_user(
+            'teacher', email='teacher@example.com', password='pass', is_teacher=True
+        )
+        self.teacher.schools.add(self.school, self.other_school)
+        self.teacher.place.add(self.place, self.other_place)
+        self.client.force_login(self.owner)
+
+    def fixed_shift(self, start, end, day=None, place=None, teachers=()):
+        shift = FixedShift.objects.create(
+            day=day or self.day, place=place or self.place,
+            start_time=time(*start), end_time=time(*end),
+        )
+        shift.teacher.set(teachers)
+        # テストのトランザクションでは on_commit が呼ばれないため、インデックスを読み直させる
+        interval_index.invalidate_all()
+        return shift
+
+
+class EventHubReplayTests(SimpleTestCase):
+    def setUp(self):
+        self.hub = EventHub(backlog=3)
+        for event_id in range(1, 6):
+            self.hub.dispatch({'id': event_id, 'school_id': 1, 'type': 'updated'})
+
+    def test_replay_returns_events_after_last_id(self):
+        self.assertEqual([event['id'] for event in self.hub.replay(1, 3)], [4, 5])
+        self.assertEqual(self.hub.replay(1, 5), [])
+
+    def test_replay_older_than_backlog_requires_resync(self):
+        self.assertIsNone(self.hub.replay(1, 1))
+
+    def test_replay_ahead_of_backlog_requires_resync(self):
+        # 再起動でIDが振り直された場合、クライアントのIDの方が新しくなる
+        self.assertIsNone(self.hub.replay(1, 42))
+        self.assertIsNone(self.hub.replay(2, 1))
+
+
+class EventStreamTests(TestCase):
+    def test_wsgi_request_is_rejected(self):
+        school = School.objects.create(name='学校')
+        user = CustomUser.objects.create_user('owner', email='owner@example.com', password='pass', is_owner=True)
+        user.schools.add(school)
+        self.client.force_login(user)
+
+        response = self.client.get(f'/api/shift/events/{school.id}/')
+        self.assertEqual(response.status_code, 501)
+
+
+class AssignmentSolverTests(SimpleTestCase):
+    def test_overlapping_existing_assignments_block_contained_interval(self):
+        # 既存の割当 (0, 600) と (100, 200) が重なっていても (300, 400) は (0, 600) と重なる
+        busy = {1: [(0, 0, 600, 10), (0, 100, 200, 11)]}
+        solver = AssignmentSolver({20: (0, 300, 400, 5)}, {5: [1]}, busy)
+        self.assertEqual(solver.solve([20]), [20])
+        self.assertEqual(solver.assignment, {})
+
+    def test_assigns_without_overlap(self):
+        shifts = {20: (0, 540, 600, 5), 21: (0, 570, 630, 5), 22: (0, 660, 720, 5)}
+        solver = AssignmentSolver(shifts, {5: [1, 2]}, {})
+        self.assertEqual(solver.solve(list(shifts)), [])
+
+        by_teacher = {}
+        for shift_id, teacher_id in solver.assignment.items():
+            by_teacher.setdefault(teacher_id, []).append(shifts[shift_id][1:3])
+        for intervals in by_teacher.values():
+            intervals.sort()
+            for (_, end), (start, _) in zip(intervals, intervals[1:]):
+                self.assertLessEqual(end, start)
+
+
+class AutoAssignTests(ShiftFixtureMixin, TestCase):
+    url = '/api/shift/fixed-shift/auto_assign/'
+
+    def test_fixed_shift_at_other_school_blocks_assignment(self):
+        self.fixed_shift((10, 0), (12, 0), day=self.other_day, place=self.other_place, teachers=[self.teacher])
+        target = self.fixed_shift((10, 30), (11, 30))
+
+        response = self.client.post(self.url, {'school_id': self.school.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unassigned_shift_ids'], [target.id])
+
+    def test_assigns_free_teacher(self):
+        target = self.fixed_shift((13, 0), (14, 0))
+
+        response = self.client.post(
+            self.url, {'school_id': self.school.id, 'apply': True}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['shift_id'] for row in response.json()['assignments']], [target.id])
+        self.assertEqual(list(target.teacher.values_list('id', flat=True)), [self.teacher.id])
+
+    def test_boolean_params_are_parsed_strictly(self):
+        target = self.fixed_shift((13, 0), (14, 0))
+
+        response = self.client.post(
+            self.url, {'school_id': self.school.id, 'apply': 'false'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['applied'])
+        self.assertFalse(target.teacher.exists())
+
+        response = self.client.post(
+            self.url, {'school_id': self.school.id, 'apply': 'maybe'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_shift_ids_must_be_integers(self):
+        target = self.fixed_shift((13, 0), (14, 0))
+
+        for shift_ids in ([{'id': target.id}], [str(target.id)], [True]):
+            response = self.client.post(
+                self.url, {'school_id': self.school.id, 'shift_ids': shift_ids}, content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            self.url, {'school_id': self.school.id, 'shift_ids': [target.id]}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['shift_id'] for row in response.json()['assignments']], [target.id])
+
+
+class AssignLanesTests(SimpleTestCase):
+    def max_overlap(self, intervals):
+        points = sorted([(start, 1) for start, _, _ in intervals] + [(end, -1) for _, end, _ in intervals])
+        current = best = 0
+        for _, delta in points:
+            current += delta
+            best = max(best, current)
+        return best
+
+    def test_lane_is_reused_after_shift_ends(self):
+        lanes, lane_count = assign_lanes([(60, 120, 'b'), (0, 60, 'a')])
+        self.assertEqual(lanes, {'a': (0, 1), 'b': (0, 1)})
+        self.assertEqual(lane_count, 1)
+
+    def test_nested_overlaps(self):
+        intervals = [(0, 300, 'a'), (30, 60, 'b'), (90, 120, 'c'), (100, 110, 'd')]
+        lanes, lane_count = assign_lanes(intervals)
+        self.assertEqual(lanes, {'a': (0, 3), 'b': (1, 3), 'c': (1, 3), 'd': (2, 3)})
+        self.assertEqual(lane_count, self.max_overlap(intervals))
+
+    def test_chained_overlaps(self):
+        # a と c は重ならないため、c は a の列を再利用する
+        intervals = [(0, 60, 'a'), (30, 90, 'b'), (60, 120, 'c'), (90, 150, 'd')]
+        lanes, lane_count = assign_lanes(intervals)
+        self.assertEqual(lanes, {'a': (0, 2), 'b': (1, 2), 'c': (0, 2), 'd': (1, 2)})
+        self.assertEqual(lane_count, self.max_overlap(intervals))
+
+    def test_lane_count_per_group(self):
+        intervals = [(0, 60, 'a'), (0, 60, 'b'), (0, 60, 'c'), (120, 180, 'd'), (150, 200, 'e')]
+        lanes, lane_count = assign_lanes(intervals)
+        self.assertEqual({key: lanes[key][1] for key in 'abc'}, {'a': 3, 'b': 3, 'c': 3})
+        self.assertEqual((lanes['d'], lanes['e']), ((0, 2), (1, 2)))
+        self.assertEqual(lane_count, 3)
+
+
+class GridLayoutTests(SimpleTestCase):
+    def payload(self, shifts, school_start_time=None, school_end_time=None):
+        return {
+            'days': [{'id': 2}, {'id': 1}],
+            'places': [{'id': 10}],
+            'shifts': [
+                {'id': shift_id, 'day': day_id, 'place': 10, 'start_time': start, 'end_time': end}
+                for shift_id, day_id, start, end in shifts
+            ],
+            'school_start_time': school_start_time,
+            'school_end_time': school_end_time,
+        }
+
+    def test_hours_are_derived_from_shifts_and_school_hours(self):
+        shifts = [(1, 1, '09:15:00', '10:45:00')]
+        layout = grid_layout(self.payload(shifts))
+        self.assertEqual((layout['start_hour'], layout['end_hour']), (9, 11))
+
+        layout = grid_layout(self.payload(shifts, '08:30:00', '17:10:00'))
+        self.assertEqual((layout['start_hour'], layout['end_hour']), (8, 18))
+
+        layout = grid_layout(self.payload([]))
+        self.assertEqual((layout['start_hour'], layout['end_hour'], layout['cells']), (8, 18, []))
+
+    def test_row_and_span_per_slot_minutes(self):
+        payload = self.payload([(1, 1, '09:15:00', '10:45:00')])
+        for slot_minutes, rows, row, span in ((15, 8, 1, 6), (30, 4, 0, 4), (60, 2, 0, 2)):
+            layout = grid_layout(payload, slot_minutes)
+            self.assertEqual(layout['rows'], rows)
+            self.assertEqual(
+                layout['cells'][0]['shifts'], [{'id': 1, 'lane': 0, 'lanes': 1, 'row': row, 'span': span}]
+            )
+
+    def test_cells_follow_day_order(self):
+        payload = self.payload([(1, 1, '09:00:00', '10:00:00'), (2, 2, '09:00:00', '10:00:00')])
+        self.assertEqual([cell['day'] for cell in grid_layout(payload)['cells']], [2, 1])
+
+
+class TimeSlotCatalogTests(ShiftFixtureMixin, TestCase):
+    url = '/api/shift/fixed-shift/time_slots/'
+
+    def slots(self):
+        return list(TimeSlot.objects.filter(school=self.school).order_by('start_time').values_list(
+            'day_id', 'start_time', 'end_time', 'display', 'ref_count'
+        ))
+
+    def test_shared_slot_is_reference_counted(self):
+        first = self.fixed_shift((9, 0), (10, 0))
+        second = self.fixed_shift((9, 0), (10, 0))
+        self.assertEqual(self.slots(), [(self.day.id, time(9, 0), time(10, 0), '09:00-10:00', 2)])
+
+        first.delete()
+        self.assertEqual(self.slots(), [(self.day.id, time(9, 0), time(10, 0), '09:00-10:00', 1)])
+
+        # 最後の参照が無くなったスロットは削除する
+        second.delete()
+        self.assertEqual(self.slots(), [])
+
+    def test_moved_shift_releases_previous_slot(self):
+        kept = self.fixed_shift((9, 0), (10, 0))
+        moved = self.fixed_shift((9, 0), (10, 0))
+
+        moved.start_time, moved.end_time = time(10, 0), time(11, 0)
+        moved.save()
+        self.assertEqual(self.slots(), [
+            (self.day.id, time(9, 0), time(10, 0), '09:00-10:00', 1),
+            (self.day.id, time(10, 0), time(11, 0), '10:00-11:00', 1),
+        ])
+
+        # 時間帯を変えない保存ではカウントは変わらない
+        moved.save()
+        kept.start_time, kept.end_time = time(10, 0), time(11, 0)
+        kept.save()
+        self.assertEqual(self.slots(), [(self.day.id, time(10, 0), time(11, 0), '10:00-11:00', 2)])
+
+    def test_rebuild_matches_fixed_shifts(self):
+        self.fixed_shift((9, 0), (10, 0))
+        self.fixed_shift((9, 0), (10, 0))
+        self.fixed_shift((13, 0), (14, 0))
+        self.fixed_shift((9, 0), (10, 0), day=self.other_day, place=self.other_place)
+        expected = self.slots()
+        other_school_slots = TimeSlot.objects.filter(school=self.other_school).count()
+
+        TimeSlot.objects.filter(school=self.school).update(ref_count=7)
+        TimeSlot.objects.create(
+            school=self.school, day=self.day, start_time=time(20, 0), end_time=time(21, 0),
+            display='20:00-21:00', ref_count=1,
+        )
+        rebuild_time_slots([self.school.id])
+
+        self.assertEqual(self.slots(), expected)
+        self.assertEqual(TimeSlot.objects.filter(school=self.other_school).count(), other_school_slots)
+
+    def test_time_slots_response(self):
+        self.fixed_shift((13, 0), (14, 0))
+        self.fixed_shift((9, 0), (10, 0))
+        slot_9 = {'start_time': '09:00:00', 'end_time': '10:00:00', 'display': '09:00-10:00'}
+        slot_13 = {'start_time': '13:00:00', 'end_time': '14:00:00', 'display': '13:00-14:00'}
+
+        response = self.client.get(self.url, {'school_id': self.school.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['time_slots_by_day'], {str(self.day.id): [slot_9, slot_13]})
+
+        response = self.client.get(self.url, {'school_id': self.school.id, 'day_id': self.day.id})
+        self.assertEqual(response.json()['time_slots'], [slot_9, slot_13])
+
+
+class GridViewTests(ShiftFixtureMixin, TestCase):
+    url = '/api/shift/fixed-shift/grid/'
+
+    def test_layout(self):
+        first = self.fixed_shift((9, 0), (11, 0))
+        second = self.fixed_shift((10, 0), (10, 30))
+
+        response = self.client.get(self.url, {'school_id': self.school.id, 'layout': 1, 'slot_minutes': 30})
+        self.assertEqual(response.status_code, 200)
+        layout = response.json()['layout']
+        self.assertEqual((layout['start_hour'], layout['end_hour'], layout['rows']), (9, 11, 4))
+        self.assertEqual(layout['cells'], [{
+            'day': self.day.id,
+            'place': self.place.id,
+            'lanes': 2,
+            'shifts': [
+                {'id': first.id, 'lane': 0, 'lanes': 2, 'row': 0, 'span': 4},
+                {'id': second.id, 'lane': 1, 'lanes': 2, 'row': 2, 'span': 1},
+            ],
+        }])
+
+        response = self.client.get(self.url, {'school_id': self.school.id})
+        self.assertNotIn('layout', response.json())
+
+        response = self.client.get(self.url, {'school_id': self.school.id, 'layout': 1, 'slot_minutes': 20})
+        self.assertEqual(response.status_code, 400)
+
+
+class PruneQuerysetTests(SimpleTestCase):
+    def queryset(self):
+        return FixedShift.objects.select_related('day', 'place', 'place__school').prefetch_related('teacher')
+
+    def test_keeps_relations_for_requested_fields(self):
+        queryset = prune_queryset(self.queryset(), FixedShiftSerializer, Fieldset(['id', 'place_name']))
+        self.assertEqual(queryset.query.select_related, {'place': {}})
+        self.assertEqual(queryset._prefetch_related_lookups, ())
+
+        queryset = prune_queryset(self.queryset(), FixedShiftSerializer, Fieldset(expand=['teacher']))
+        self.assertEqual(queryset.query.select_related, {'place': {}, 'day': {}})
+        self.assertEqual(queryset._prefetch_related_lookups, ('teacher',))
+
+    def test_without_fieldset_queryset_is_unchanged(self):
+        queryset = self.queryset()
+        self.assertIs(prune_queryset(queryset, FixedShiftSerializer, None), queryset)
+
+
+class FixedShiftFieldsetTests(ShiftFixtureMixin, TestCase):
+    url = '/api/shift/fixed-shift/'
+
+    def setUp(self):
+        super().setUp()
+        self.shift = self.fixed_shift((9, 0), (10, 0), teachers=[self.teacher])
+
+    def get(self, url, query):
+        response = self.client.get(url + query)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return data['results'][0] if 'results' in data else data
+
+    def test_list_and_retrieve_keys(self):
+        detail = f'{self.url}{self.shift.id}/'
+        for url in (self.url, detail):
+            self.assertIn('teacher', self.get(url, ''))
+            self.assertEqual(sorted(self.get(url, '?fields=id,place_name')), ['id', 'place_name'])
+            self.assertEqual(sorted(self.get(url, '?fields=id&expand=teacher')), ['id', 'teacher'])
+            # 空の expand は重いフィールド（teacher）を省略する
+            self.assertNotIn('teacher', self.get(url, '?expand='))
+            self.assertIn('duration_minutes', self.get(url, '?expand='))
+
+        row = self.get(self.url, '?fields=teacher')
+        self.assertEqual([teacher['id'] for teacher in row['teacher']], [self.teacher.id])
+
+    def test_fields_do_not_restrict_input(self):
+        response = self.client.post(self.url + '?fields=id', {
+            'day': self.day.id, 'place': self.place.id, 'start_time': '13:00', 'end_time': '14:00',
+            'teacher_ids': [self.teacher.id],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(response.json()), ['id'])
+
+        shift = FixedShift.objects.get(id=response.json()['id'])
+        self.assertEqual(list(shift.teacher.values_list('id', flat=True)), [self.teacher.id])
+
+
+class WeekdayConflictTests(ShiftFixtureMixin, TestCase):
+    def test_conflicts_compare_weekday_within_school(self):
+        # 同じ学校に「月」と「月曜日」の2つの Day があっても同じ曜日として比較する
+        monday = Day.objects.create(name='月曜日', order=7, school=self.school)
+        first = self.fixed_shift((9, 0), (12, 0), teachers=[self.teacher])
+        second = self.fixed_shift((10, 0), (11, 0), day=monday, teachers=[self.teacher])
+        self.fixed_shift((10, 0), (11, 0), day=self.other_day, place=self.other_place, teachers=[self.teacher])
+
+        response = self.client.get('/api/shift/fixed-shift/conflicts/', {'school_id': self.school.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['conflict_count'], 1)
+        shift_ids = {row['shift_id'] for row in response.json()['conflicts'][0]['conflicting_shifts']}
+        self.assertEqual(shift_ids, {first.id, second.id})
+
+    def test_available_teachers_include_other_school_shifts(self):
+        self.fixed_shift((10, 0), (12, 0), day=self.other_day, place=self.other_place, teachers=[self.teacher])
+
+        response = self.client.get('/api/shift/fixed-shift/available_teachers/', {
+            'school_id': self.school.id, 'day_id': self.day.id, 'start_time': '11:00', 'end_time': '13:00',
+            'place_id': self.place.id, 'expand': 'current_shifts',
+        })
+        self.assertEqual(response.status_code, 200)
+        teacher = next(row for row in response.json() if row['id'] == self.teacher.id)
+        self.assertFalse(teacher['is_available'])
+        self.assertEqual(teacher['current_shifts'][0]['school_name'], '学校B')
+        # 管理していない学校のシフトの場所は返さない
+        self.assertIsNone(teacher['current_shifts'][0]['place_name'])
+
+
+class CoverageTests(ShiftFixtureMixin, TestCase):
+    def cells(self, payload):
+        return {
+            tuple(cell.tolist()): (staff.tolist(), unstaffed.tolist())
+            for cell, staff, unstaffed in zip(payload['cells'], payload['staff'], payload['unstaffed'])
+        }
+
+    def test_fixed_shift_coverage(self):
+        self.fixed_shift((9, 0), (9, 30), teachers=[self.teacher])
+        self.fixed_shift((9, 15), (9, 45))
+        # 他の学校のシフトは含まない
+        self.fixed_shift((9, 0), (9, 30), day=self.other_day, place=self.other_place, teachers=[self.teacher])
+
+        payload = fixed_shift_coverage(self.school, 9 * 60, 10 * 60)
+        self.assertEqual(self.cells(payload), {(0, 0): ([1, 1, 0, 0], [0, 1, 1, 0])})
+
+    def test_shift_coverage_by_date(self):
+        staffed = Shift.objects.create(
+            date=date(2026, 4, 7), place=self.place, start_time=time(9, 0), end_time=time(9, 30)
+        )
+        staffed.teacher.set([self.teacher])
+        Shift.objects.create(date=date(2026, 4, 6), place=self.place, start_time=time(9, 0), end_time=time(9, 15))
+        # 空けるシフトは未割当として数えない
+        Shift.objects.create(
+            date=date(2026, 4, 7), place=self.place, start_time=time(9, 30), end_time=time(10, 0), is_empty=True
+        )
+
+        payload = shift_coverage(self.school, date(2026, 4, 6), date(2026, 4, 7), 9 * 60, 10 * 60)
+        self.assertEqual(payload['columns'], [{'date': '2026-04-06'}, {'date': '2026-04-07'}])
+        self.assertEqual(self.cells(payload), {
+            (0, 0): ([0, 0, 0, 0], [1, 0, 0, 0]),
+            (0, 1): ([1, 1, 0, 0], [0, 0, 0, 0]),
+        })
+
+
+class SandboxTests(ShiftFixtureMixin, TestCase):
+    url = '/api/shift/fixed-shift/sandbox/'
+    commit_url = '/api/shift/fixed-shift/sandbox_commit/'
+
+    def post(self, url, **data):
+        return self.client.post(url, {'school_id': self.school.id, **data}, content_type='application/json')
+
+    def simulate(self, edits):
+        response = self.post(self.url, edits=edits)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_simulation_returns_diff_without_writing(self):
+        shift = self.fixed_shift((10, 0), (11, 0))
+        data = self.simulate([
+            {'op': 'assign', 'shift_id': shift.id, 'teacher_id': self.teacher.id},
+            {
+                'op': 'create', 'day_id': self.day.id, 'place_id': self.place.id,
+                'start_time': '12:00', 'end_time': '13:00',
+            },
+        ])
+        self.assertEqual([row['teacher_ids'] for row in data['diff']['updated']], [[self.teacher.id]])
+        self.assertEqual(len(data['diff']['created']), 1)
+        self.assertEqual(data['steps'][-1]['coverage']['unassigned'], 1)
+        self.assertFalse(shift.teacher.exists())
+
+    def test_commit_applies_diff(self):
+        shift = self.fixed_shift((10, 0), (11, 0))
+        edits = [{'op': 'assign', 'shift_id': shift.id, 'teacher_id': self.teacher.id}]
+        base_version = self.simulate(edits)['base_version']
+
+        response = self.post(self.commit_url, edits=edits, base_version=base_version)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['statistics']['updated'], 1)
+        self.assertEqual(list(shift.teacher.values_list('id', flat=True)), [self.teacher.id])
+
+        # 保存後は時間割が変わっているため、同じ base_version では保存できない
+        response = self.post(self.commit_url, edits=edits, base_version=base_version)
+        self.assertEqual(response.status_code, 409)
+
+    def test_commit_requires_base_version(self):
+        self.assertEqual(self.post(self.commit_url, edits=[]).status_code, 400)
+
+    def test_existing_conflicts_do_not_block_commit(self):
+        self.fixed_shift((10, 0), (12, 0), teachers=[self.teacher])
+        self.fixed_shift((11, 0), (13, 0), teachers=[self.teacher])
+        base_version = self.simulate([])['base_version']
+
+        response = self.post(self.commit_url, edits=[], base_version=base_version)
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_conflicts_block_commit(self):
+        self.fixed_shift((10, 0), (12, 0), teachers=[self.teacher])
+        shift = self.fixed_shift((11, 0), (13, 0))
+        edits = [{'op': 'assign', 'shift_id': shift.id, 'teacher_id': self.teacher.id}]
+        base_version = self.simulate(edits)['base_version']
+
+        response = self.post(self.commit_url, edits=edits, base_version=base_version, force='false')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([conflict['type'] for conflict in response.json()['conflicts']], ['overlap'])
+
+        response = self.post(self.commit_url, edits=edits, base_version=base_version, force=True)
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_ids_are_rejected(self):
+        shift = self.fixed_shift((10, 0), (11, 0))
+        for edit in (
+            {'op': 'assign', 'shift_id': shift.id, 'teacher_id': [self.teacher.id]},
+            {'op': 'unassign', 'shift_id': [shift.id], 'teacher_id': self.teacher.id},
+            {'op': 'create', 'day_id': self.day.id, 'place_id': self.place.id,
+             'start_time': '12:00', 'end_time': '13:00', 'teacher_ids': 5},
+        ):
+            response = self.post(self.url, edits=[edit])
+            self.assertEqual(response.status_code, 400, edit)
@@ -2,11 +2,12 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import FixedShiftViewSet
+from .views import FixedShiftViewSet, fixed_shift_events
 
 router = DefaultRouter()
 router.register('fixed-shift', FixedShiftViewSet, basename='fixed-shift')
 
 urlpatterns = [
+    path('events/<int:school_id>/', fixed_shift_events, name='fixed_shift_events'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
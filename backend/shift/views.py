@@ -4,31 +4,99 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from django.db.models import Q
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from datetime import datetime
+import asyncio
+import json
 
-from .models import FixedShift
+from .models import FixedShift, TimeSlot
 from .serializers import (
     FixedShiftSerializer,
-    FixedShiftGridSerializer,
     AvailableTeacherSerializer,
     BulkFixedShiftSerializer
 )
 from account.models import CustomUser
 from config.models import Place, Day
 from school.models import School
+from . import events
+from .payloads import grid_payload, fixed_shift_rows, fixed_shift_rows_by_ids
+from .layout import DEFAULT_SLOT_MINUTES, SLOT_MINUTES, grid_layout
+from .assignment import AssignmentSolver, load_problem, apply_assignment
+from .sandbox import SandboxError, Timetable, apply_sandbox, new_conflicts, simulate
+from .intervals import interval_index
+from .coverage import fixed_shift_coverage, shift_coverage
+from .freeslots import find_free_slots, find_common_free_slots, format_minutes
+from .workload import workload_columns, workload_rows
+from search.filters import FullTextSearchFilter
+from fieldsets import Fieldset, prune_queryset
+from singleflight import coalesce
+from params import parse_bool
+from file.exports import csv_stream
+
+
+# 曜日番号（月曜 = 0）の表示名
+WEEKDAY_LABELS = '月火水木金土日'
+
+# 配置人数ヒートマップで指定できる最大日数
+COVERAGE_MAX_DAYS = 366
+
+# 空き時間検索の既定の最短時間（分）
+FREE_SLOT_DEFAULT_MINUTES = 60
+
+
+def _is_school_member(request):
+    """school_id の学校に所属しているか（共有結果を受け取れるリクエストの判定）"""
+    school_id = request.query_params.get('school_id', '')
+    return school_id.isdigit() and request.user.schools.filter(id=school_id).exists()
+
+
+def _id_list(value):
+    """カンマ区切りのID（不正な値は ValueError）"""
+    return [int(item) for item in value.split(',') if item.strip()] if value else []
+
+
+def _minute_window(request, school):
+    """
+    start_time / end_time（HH:MM）から検索する時間帯を0時からの分で求める
+
+    省略時は学校の始業・終業時間（未設定なら8:00〜18:00）。不正な場合はエラーの Response を返す。
+    """
+    try:
+        start_time = request.query_params.get('start_time')
+        end_time = request.query_params.get('end_time')
+        start_time = datetime.strptime(start_time, '%H:%M').time() if start_time else school.start_time
+        end_time = datetime.strptime(end_time, '%H:%M').time() if end_time else school.end_time
+    except ValueError:
+        return Response(
+            {'error': '時間の形式が正しくありません（HH:MM形式で入力してください）'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    start_minute = start_time.hour * 60 + start_time.minute if start_time else 8 * 60
+    end_minute = end_time.hour * 60 + end_time.minute if end_time else 18 * 60
+    if start_minute >= end_minute:
+        return Response(
+            {'error': '終了時間は開始時間より後である必要があります'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return start_minute, end_minute
 
 
 class FixedShiftViewSet(viewsets.ModelViewSet):
     """固定シフト管理ViewSet"""
     serializer_class = FixedShiftSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['day', 'place', 'teacher']
     search_fields = ['description', 'teacher__username', 'teacher__first_name', 'teacher__last_name']
+    search_kind = 'fixed_shift'
     ordering_fields = ['day__order', 'start_time', 'place__name']
     ordering = ['day__order', 'start_time', 'place__name']
     
@@ -55,18 +123,47 @@ class FixedShiftViewSet(viewsets.ModelViewSet):
         if school_id:
             queryset = queryset.filter(place__school_id=school_id)
         
+        if self.action == 'retrieve':
+            queryset = prune_queryset(queryset, FixedShiftSerializer, Fieldset.from_request(self.request))
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        """固定シフト一覧取得（読み取り専用の高速シリアライズ）"""
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        fieldset = Fieldset.from_request(request)
+        
+        page = self.paginate_queryset(queryset.values_list('id', flat=True))
+        if page is not None:
+            return self.get_paginated_response(fixed_shift_rows_by_ids(list(page), fieldset))
+        
+        return Response(fixed_shift_rows(queryset, fieldset))
+    
     @action(detail=False, methods=['get'])
+    @coalesce(['school_id', 'layout', 'slot_minutes'], authorize=_is_school_member)
     def grid(self, request):
-        """固定シフト時間割グリッド表示用データ取得"""
+        """
+        固定シフト時間割グリッド表示用データ取得
+
+        layout=1 の場合は (曜日, 場所) ごとの重なるシフトの列・表示時間帯・行番号と行数も返す
+        （slot_minutes で行の単位を 15 / 30 / 60 分から指定、既定は30分）。
+        """
         school_id = request.query_params.get('school_id')
+        with_layout = request.query_params.get('layout') in ('1', 'true')
         
         if not school_id:
             return Response(
                 {'error': '学校IDが必要です'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        try:
+            slot_minutes = int(request.query_params.get('slot_minutes', DEFAULT_SLOT_MINUTES))
+        except ValueError:
+            slot_minutes = None
+        if slot_minutes not in SLOT_MINUTES:
+            return Response(
+                {'error': f"slot_minutes は {', '.join(map(str, SLOT_MINUTES))} のいずれかを指定してください"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # 学校の存在確認とアクセス権限チェック
         school = get_object_or_404(School, id=school_id)
@@ -76,37 +173,135 @@ class FixedShiftViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # 曜日データ取得
-        days = Day.objects.filter(school=school).order_by('order')
-        
-        # 場所データ取得
-        places = Place.objects.filter(school=school).order_by('name')
-        
-        # 固定シフトデータ取得
-        shifts = FixedShift.objects.filter(
-            place__school=school
-        ).select_related(
-            'day', 'place'
-        ).prefetch_related(
-            'teacher'
-        ).order_by('day__order', 'start_time', 'place__name')
-        
-        # シリアライズ
-        grid_data = {
-            'school_id': school.id,
-            'days': days,
-            'places': places,
-            'shifts': shifts,
-            'start_hour': 8,
-            'end_hour': 18,
-            'hour_interval': 1,
-            'school_start_time': school.start_time,  # 追加
-            'school_end_time': school.end_time,      # 追加
-        }
-        
-        serializer = FixedShiftGridSerializer(grid_data)
-        return Response(serializer.data)
-    
+        # values_list() から直接組み立てる（FixedShiftGridSerializer と同じ形式）
+        payload = grid_payload(school)
+        if with_layout:
+            # グリッドと同じく学校のバージョンごとにキャッシュされる（coalesce）
+            payload['layout'] = grid_layout(payload, slot_minutes)
+        return Response(payload)
+
+    @action(detail=False, methods=['get'])
+    def coverage(self, request):
+        """
+        配置人数ヒートマップ（場所 × 曜日または日付 × 15分ごとの講師数・未割当シフト数）
+
+        source=fixed（既定）は固定シフト、source=shift は start_date〜end_date の日付指定シフトを集計する。
+        時間帯は start_time / end_time（HH:MM）で指定し、省略時は学校の始業・終業時間（未設定なら8:00〜18:00）。
+        """
+        school_id = request.query_params.get('school_id')
+        source = request.query_params.get('source', 'fixed')
+
+        if not school_id:
+            return Response(
+                {'error': '学校IDが必要です'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if source not in ('fixed', 'shift'):
+            return Response(
+                {'error': 'source は fixed または shift を指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        school = get_object_or_404(School, id=school_id)
+        if not request.user.schools.filter(id=school_id).exists():
+            return Response(
+                {'error': 'この学校にアクセスする権限がありません'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        window = _minute_window(request, school)
+        if isinstance(window, Response):
+            return window
+        start_minute, end_minute = window
+
+        if source == 'fixed':
+            return Response(fixed_shift_coverage(school, start_minute, end_minute))
+
+        try:
+            start_date = datetime.strptime(request.query_params.get('start_date', ''), '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.query_params.get('end_date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': '開始日と終了日をYYYY-MM-DD形式で指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 0 <= (end_date - start_date).days < COVERAGE_MAX_DAYS:
+            return Response(
+                {'error': f'期間は{COVERAGE_MAX_DAYS}日以内で指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(shift_coverage(school, start_date, end_date, start_minute, end_minute))
+
+    @action(detail=False, methods=['get'])
+    def workload(self, request):
+        """
+        勤務時間集計
+
+        source=fixed（既定）は固定シフトの1週間あたり、source=shift は start_date〜end_date の
+        日付指定シフトの月ごとの時間を group_by（teacher / place / school）ごとに集計する。
+        school_id を省略した場合は管理する全ての学校が対象。output=csv で CSV をストリーミングで返す。
+        """
+        school_id = request.query_params.get('school_id')
+        source = request.query_params.get('source', 'fixed')
+        group_by = request.query_params.get('group_by', 'teacher')
+
+        if source not in ('fixed', 'shift'):
+            return Response(
+                {'error': 'source は fixed または shift を指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if group_by not in ('teacher', 'place', 'school'):
+            return Response(
+                {'error': 'group_by は teacher、place、school のいずれかを指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        school_ids = list(request.user.schools.values_list('id', flat=True))
+        if school_id:
+            if not school_id.isdigit() or int(school_id) not in school_ids:
+                return Response(
+                    {'error': 'この学校にアクセスする権限がありません'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            school_ids = [int(school_id)]
+
+        start_date = end_date = None
+        if source == 'shift':
+            try:
+                start_date = datetime.strptime(request.query_params.get('start_date', ''), '%Y-%m-%d').date()
+                end_date = datetime.strptime(request.query_params.get('end_date', ''), '%Y-%m-%d').date()
+            except ValueError:
+                return Response(
+                    {'error': '開始日と終了日をYYYY-MM-DD形式で指定してください'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if start_date > end_date:
+                return Response(
+                    {'error': '終了日は開始日以降である必要があります'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        rows = workload_rows(source, group_by, school_ids, start_date, end_date)
+
+        if request.query_params.get('output') == 'csv':
+            columns = workload_columns(source, group_by)
+            response = StreamingHttpResponse(
+                csv_stream(columns, ([row[column] for column in columns] for row in rows)),
+                content_type='text/csv; charset=utf-8'
+            )
+            response['Content-Disposition'] = f'attachment; filename="workload_{source}_{group_by}.csv"'
+            return response
+
+        return Response({
+            'source': source,
+            'group_by': group_by,
+            'school_ids': school_ids,
+            'start_date': start_date,
+            'end_date': end_date,
+            'rows': list(rows),
+        })
+
     @action(detail=False, methods=['get'])
     def available_teachers(self, request):
         """指定された時間と場所に割り当て可能な講師一覧取得"""
@@ -162,21 +357,146 @@ class FixedShiftViewSet(viewsets.ModelViewSet):
                 )
         
         teachers_and_owners = teachers_and_owners.order_by('last_name', 'first_name', 'username')
+
+        # 曜日番号で比較し、他の学校の固定シフトとの重複も含める
+        day = get_object_or_404(Day, id=day_id, school=school)
+        conflicts = interval_index.find_conflicts(
+            teachers_and_owners.values_list('id', flat=True), day.weekday, start_time, end_time
+        )
         
         serializer = AvailableTeacherSerializer(
             teachers_and_owners, 
             many=True,
             context={
+                'request': request,
                 'school_id': school_id,
                 'day_id': day_id,
                 'start_time': start_time,
                 'end_time': end_time,
-                'place_id': place_id
+                'place_id': place_id,
+                'conflicts': conflicts,
+                'managed_school_ids': set(request.user.schools.values_list('id', flat=True)),
             }
         )
         
         return Response(serializer.data)
-    
+
+    @action(detail=False, methods=['get'])
+    def free_slots(self, request):
+        """
+        講師の空き時間検索
+
+        day_ids（カンマ区切り、省略時は全曜日）の start_time〜end_time の中で、
+        min_duration 分以上続く空き時間を講師ごとに返す。他の学校の固定シフトも使用中として扱う。
+        teacher_ids で講師を絞り込み、place_id を指定するとその場所で指導可能な講師・場所も空いている時間に限る。
+        together=true の場合は指定した講師全員が同時に空いている時間を返す。
+        """
+        school_id = request.query_params.get('school_id')
+        if not school_id:
+            return Response(
+                {'error': '学校IDが必要です'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        school = get_object_or_404(School, id=school_id)
+        if not request.user.schools.filter(id=school_id).exists():
+            return Response(
+                {'error': 'この学校にアクセスする権限がありません'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            day_ids = _id_list(request.query_params.get('day_ids'))
+            teacher_ids = _id_list(request.query_params.get('teacher_ids'))
+            place_id = request.query_params.get('place_id')
+            place_id = int(place_id) if place_id else None
+            min_duration = int(request.query_params.get('min_duration', FREE_SLOT_DEFAULT_MINUTES))
+        except ValueError:
+            return Response(
+                {'error': '曜日ID・講師ID・場所ID・最短時間は整数で指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 0 < min_duration <= 24 * 60:
+            return Response(
+                {'error': '最短時間は1〜1440分で指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        together = request.query_params.get('together', '').lower() in ('1', 'true')
+
+        window = _minute_window(request, school)
+        if isinstance(window, Response):
+            return window
+        start_minute, end_minute = window
+
+        days = Day.objects.filter(school=school).order_by('order')
+        if day_ids:
+            days = days.filter(id__in=day_ids)
+        # 曜日番号ごとに学校の曜日（同じ曜日番号が複数ある場合は最初の曜日）を対応させる
+        day_by_weekday = {}
+        for day in days:
+            day_by_weekday.setdefault(day.weekday, day)
+
+        if place_id is not None and not Place.objects.filter(id=place_id, school=school).exists():
+            return Response(
+                {'error': '指定された場所が見つかりません'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        teachers = CustomUser.objects.filter(schools=school).filter(Q(is_teacher=True) | Q(is_owner=True))
+        if teacher_ids:
+            teachers = teachers.filter(id__in=teacher_ids)
+        if place_id is not None:
+            # オーナーは全ての場所で指導可能、講師は指導可能場所に登録されている場所のみ
+            teachers = teachers.filter(Q(is_owner=True) | Q(place__id=place_id))
+        teachers = {
+            teacher_id: (username, first_name, last_name, is_owner)
+            for teacher_id, username, first_name, last_name, is_owner in teachers.distinct().order_by(
+                'last_name', 'first_name', 'username'
+            ).values_list('id', 'username', 'first_name', 'last_name', 'is_owner')
+        }
+
+        def slot_rows(windows):
+            return [
+                {
+                    'day_id': day_by_weekday[weekday].id,
+                    'day_name': day_by_weekday[weekday].name,
+                    'start_time': format_minutes(start),
+                    'end_time': format_minutes(end),
+                    'duration_minutes': end - start,
+                }
+                for weekday, start, end in windows
+            ]
+
+        response = {
+            'school_id': school.id,
+            'min_duration': min_duration,
+            'start_time': format_minutes(start_minute),
+            'end_time': format_minutes(end_minute),
+            'place_id': place_id,
+        }
+        if together:
+            windows = find_common_free_slots(
+                teachers, day_by_weekday, start_minute, end_minute, min_duration, place_id
+            ) if teachers else []
+            response['teacher_ids'] = list(teachers)
+            response['free_slots'] = slot_rows(windows)
+            return Response(response)
+
+        slots = find_free_slots(teachers, day_by_weekday, start_minute, end_minute, min_duration, place_id)
+        response['teachers'] = [
+            {
+                'teacher_id': teacher_id,
+                'username': username,
+                'first_name': first_name,
+                'last_name': last_name,
+                'is_owner': is_owner,
+                'free_slots': slot_rows(slots[teacher_id]),
+            }
+            for teacher_id, (username, first_name, last_name, is_owner) in teachers.items()
+            if teacher_id in slots
+        ]
+        return Response(response)
+
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
         """固定シフト一括作成"""
@@ -217,7 +537,11 @@ class FixedShiftViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def conflicts(self, request):
-        """シフト競合チェック"""
+        """
+        シフト競合チェック（学校内で同じ講師の時間が重なる固定シフトの組）
+
+        曜日は曜日番号で比較する。他の学校との重複は cross_school_conflicts で確認する。
+        """
         school_id = request.query_params.get('school_id')
         
         if not school_id:
@@ -225,66 +549,136 @@ class FixedShiftViewSet(viewsets.ModelViewSet):
                 {'error': '学校IDが必要です'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # 同じ曜日・時間に複数の場所で割り当てられている講師を検出
-        conflicts = []
-        
-        # 学校の全固定シフトを取得
-        shifts = FixedShift.objects.filter(
-            place__school_id=school_id
-        ).select_related('day', 'place').prefetch_related('teacher')
-        
-        # 曜日ごとにグループ化して競合をチェック
-        shift_groups = {}
-        for shift in shifts:
-            key = shift.day.id
-            if key not in shift_groups:
-                shift_groups[key] = []
-            shift_groups[key].append(shift)
-        
-        for day_id, group_shifts in shift_groups.items():
-            # 各グループ内で講師の重複をチェック
-            for i, shift1 in enumerate(group_shifts):
-                for j, shift2 in enumerate(group_shifts[i+1:], i+1):
-                    # 時間が重複しているかチェック
-                    if not (shift1.end_time <= shift2.start_time or shift1.start_time >= shift2.end_time):
-                        # 重複する講師がいるかチェック
-                        shift1_teachers = set(shift1.teacher.values_list('id', flat=True))
-                        shift2_teachers = set(shift2.teacher.values_list('id', flat=True))
-                        overlapping_teachers = shift1_teachers & shift2_teachers
-                        
-                        if overlapping_teachers:
-                            for teacher_id in overlapping_teachers:
-                                teacher = CustomUser.objects.get(id=teacher_id)
-                                day = Day.objects.get(id=day_id)
-                                
-                                conflicts.append({
-                                    'teacher_id': teacher_id,
-                                    'teacher_name': teacher.username,
-                                    'day_name': day.name,
-                                    'conflicting_shifts': [
-                                        {
-                                            'shift_id': shift1.id,
-                                            'start_time': shift1.start_time,
-                                            'end_time': shift1.end_time,
-                                            'place_name': shift1.place.name,
-                                            'description': shift1.description
-                                        },
-                                        {
-                                            'shift_id': shift2.id,
-                                            'start_time': shift2.start_time,
-                                            'end_time': shift2.end_time,
-                                            'place_name': shift2.place.name,
-                                            'description': shift2.description
-                                        }
-                                    ]
-                                })
+        if not school_id.isdigit() or not request.user.schools.filter(id=school_id).exists():
+            return Response(
+                {'error': 'この学校にアクセスする権限がありません'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        school_id = int(school_id)
+
+        teacher_ids = FixedShift.teacher.through.objects.filter(
+            fixedshift__place__school_id=school_id
+        ).values_list('customuser_id', flat=True).distinct()
+
+        pairs = []
+        for teacher_id, week in interval_index.get(teacher_ids).items():
+            for shift_id, other_id in week.conflicts():
+                if week.shifts[shift_id][3] == school_id and week.shifts[other_id][3] == school_id:
+                    pairs.append((teacher_id, shift_id, other_id))
+
+        shifts = {
+            shift['id']: shift for shift in FixedShift.objects.filter(
+                id__in={shift_id for pair in pairs for shift_id in pair[1:]}
+            ).values('id', 'day__name', 'start_time', 'end_time', 'place__name', 'description')
+        }
+        teacher_names = dict(CustomUser.objects.filter(
+            id__in={pair[0] for pair in pairs}
+        ).values_list('id', 'username'))
+
+        def shift_row(shift):
+            return {
+                'shift_id': shift['id'],
+                'start_time': shift['start_time'],
+                'end_time': shift['end_time'],
+                'place_name': shift['place__name'],
+                'description': shift['description'],
+            }
+
+        conflicts = [
+            {
+                'teacher_id': teacher_id,
+                'teacher_name': teacher_names.get(teacher_id),
+                'day_name': shifts[shift_id]['day__name'],
+                'conflicting_shifts': [shift_row(shifts[shift_id]), shift_row(shifts[other_id])],
+            }
+            for teacher_id, shift_id, other_id in pairs
+            if shift_id in shifts and other_id in shifts
+        ]
+        conflicts.sort(key=lambda c: (c['conflicting_shifts'][0]['start_time'], c['teacher_id']))
         
         return Response({
             'conflicts': conflicts,
             'conflict_count': len(conflicts)
         })
-    
+
+    @action(detail=False, methods=['get'])
+    def cross_school_conflicts(self, request):
+        """
+        学校をまたいだ講師の重複チェック
+
+        曜日は曜日番号で比較する。school_id を省略した場合は管理する全ての学校が対象。
+        include_same_school=true で同じ学校内の重複も含める。
+        管理していない学校のシフトは場所・内容を返さない。
+        """
+        school_id = request.query_params.get('school_id')
+        include_same_school = request.query_params.get('include_same_school', '').lower() in ('1', 'true')
+
+        user_school_ids = set(request.user.schools.values_list('id', flat=True))
+        if school_id:
+            if not school_id.isdigit() or int(school_id) not in user_school_ids:
+                return Response(
+                    {'error': 'この学校にアクセスする権限がありません'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            school_ids = {int(school_id)}
+        else:
+            school_ids = user_school_ids
+
+        teacher_ids = FixedShift.teacher.through.objects.filter(
+            fixedshift__place__school_id__in=school_ids
+        ).values_list('customuser_id', flat=True).distinct()
+
+        pairs = []
+        for teacher_id, week in interval_index.get(teacher_ids).items():
+            for shift_id, other_id in week.conflicts():
+                school, other_school = week.shifts[shift_id][3], week.shifts[other_id][3]
+                if school not in school_ids and other_school not in school_ids:
+                    continue
+                if school == other_school and not include_same_school:
+                    continue
+                pairs.append((teacher_id, week.shifts[shift_id][0], shift_id, other_id))
+
+        shift_ids = {shift_id for pair in pairs for shift_id in pair[2:]}
+        shifts = {}
+        for row in FixedShift.objects.filter(id__in=shift_ids).values_list(
+            'id', 'day__name', 'start_time', 'end_time', 'place__name', 'description',
+            'place__school_id', 'place__school__name'
+        ):
+            shift_id, day_name, start_time, end_time, place_name, description, shift_school_id, school_name = row
+            managed = shift_school_id in user_school_ids
+            shifts[shift_id] = {
+                'shift_id': shift_id,
+                'school_id': shift_school_id,
+                'school_name': school_name,
+                'day_name': day_name,
+                'start_time': start_time,
+                'end_time': end_time,
+                'place_name': place_name if managed else None,
+                'description': description if managed else None,
+            }
+        teacher_names = dict(CustomUser.objects.filter(
+            id__in={pair[0] for pair in pairs}
+        ).values_list('id', 'username'))
+
+        conflicts = [
+            {
+                'teacher_id': teacher_id,
+                'teacher_name': teacher_names.get(teacher_id),
+                'weekday': weekday,
+                'weekday_name': WEEKDAY_LABELS[weekday],
+                'conflicting_shifts': [shifts[shift_id], shifts[other_id]],
+            }
+            for teacher_id, weekday, shift_id, other_id in pairs
+            if shift_id in shifts and other_id in shifts
+        ]
+        conflicts.sort(key=lambda c: (c['weekday'], c['conflicting_shifts'][0]['start_time'], c['teacher_id']))
+
+        return Response({
+            'school_ids': sorted(school_ids),
+            'conflicts': conflicts,
+            'conflict_count': len(conflicts)
+        })
+
     @action(detail=False, methods=['post'])
     def copy_week(self, request):
         """固定シフトの週コピー機能"""
@@ -443,6 +837,7 @@ class FixedShiftViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @coalesce(['school_id', 'teacher_id'], authorize=_is_school_member)
     def teacher_schedules(self, request):
         """講師・オーナーの週間スケジュール取得"""
         school_id = request.query_params.get('school_id')
@@ -511,13 +906,18 @@ class FixedShiftViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def time_slots(self, request):
-        """指定された曜日の時間スロット一覧取得（既存シフトから抽出）"""
+        """
+        時間スロット一覧取得（時間スロットカタログから取得）
+
+        day_id を指定した場合はその曜日のみ、省略した場合は全曜日分を
+        曜日IDごとにまとめて返す。
+        """
         school_id = request.query_params.get('school_id')
         day_id = request.query_params.get('day_id')
         
-        if not all([school_id, day_id]):
+        if not school_id:
             return Response(
-                {'error': '学校IDと曜日IDが必要です'}, 
+                {'error': '学校IDが必要です'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
@@ -529,22 +929,319 @@ class FixedShiftViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # その曜日の全シフトから時間帯を抽出
-        shifts = FixedShift.objects.filter(
-            day_id=day_id,
-            place__school=school
-        ).values('start_time', 'end_time').distinct().order_by('start_time')
+        slots = TimeSlot.objects.filter(school=school)
+        if day_id:
+            slots = slots.filter(day_id=day_id)
+        slots = slots.order_by('day_id', 'start_time', 'end_time').values_list(
+            'day_id', 'start_time', 'end_time', 'display'
+        )
         
-        time_slots = []
-        for shift in shifts:
-            time_slots.append({
-                'start_time': shift['start_time'],
-                'end_time': shift['end_time'],
-                'display': f"{shift['start_time'].strftime('%H:%M')}-{shift['end_time'].strftime('%H:%M')}"
+        slots_by_day = {}
+        for slot_day_id, start_time, end_time, display in slots:
+            slots_by_day.setdefault(slot_day_id, []).append({
+                'start_time': start_time,
+                'end_time': end_time,
+                'display': display
+            })
+        
+        if day_id:
+            time_slots = next(iter(slots_by_day.values()), [])
+            return Response({
+                'school_id': school.id,
+                'day_id': day_id,
+                'time_slots': time_slots
             })
         
         return Response({
             'school_id': school.id,
-            'day_id': day_id,
-            'time_slots': time_slots
-        })
\ No newline at end of file
+            'time_slots_by_day': {
+                day.id: slots_by_day.get(day.id, [])
+                for day in Day.objects.filter(school=school).only('id').order_by('order')
+            }
+        })
+
+    @action(detail=False, methods=['post'])
+    def auto_assign(self, request):
+        """
+        講師未割当の固定シフトへの自動割当
+
+        apply が false の場合は割当案のみを返し、true の場合は1トランザクションで保存する。
+        fairness で割当時間の少ない講師を優先し、max_minutes で講師ごとの週あたり上限（分）を指定できる。
+        既存の割当（他の学校の固定シフトを含む）と重なる講師には割り当てない。
+        """
+        school_id = request.data.get('school_id')
+        shift_ids = request.data.get('shift_ids')
+        max_minutes = request.data.get('max_minutes')
+
+        try:
+            fairness = parse_bool(request.data.get('fairness', True))
+            include_owners = parse_bool(request.data.get('include_owners', False))
+            apply = parse_bool(request.data.get('apply', False))
+        except ValueError:
+            return Response(
+                {'error': 'fairness・include_owners・applyはtrueまたはfalseで指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not school_id:
+            return Response(
+                {'error': '学校IDが必要です'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if shift_ids is not None and not isinstance(shift_ids, list):
+            return Response(
+                {'error': 'shift_idsはリスト形式で指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # 文字列のIDは一致せず、辞書などは set() で例外になるため要素ごとに検証する
+        if shift_ids is not None and any(
+            isinstance(shift_id, bool) or not isinstance(shift_id, int) for shift_id in shift_ids
+        ):
+            return Response(
+                {'error': 'shift_idsは整数のリストで指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if max_minutes is not None:
+            try:
+                max_minutes = int(max_minutes)
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': 'max_minutesは整数で指定してください'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        # 学校のアクセス権限チェック
+        school = get_object_or_404(School, id=school_id)
+        if not request.user.schools.filter(id=school_id).exists():
+            return Response(
+                {'error': 'この学校にアクセスする権限がありません'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        shifts, eligible, busy, targets, day_ids = load_problem(school, include_owners, shift_ids)
+        solver = AssignmentSolver(shifts, eligible, busy, max_minutes=max_minutes, fairness=fairness)
+        unassigned = solver.solve(targets)
+        assignment = solver.assignment
+
+        if apply:
+            assignment = apply_assignment(assignment)
+
+        assignments = []
+        for shift_id, teacher_id in sorted(assignment.items(), key=lambda item: shifts[item[0]][:3]):
+            _, start, end, place_id = shifts[shift_id]
+            assignments.append({
+                'shift_id': shift_id,
+                'teacher_id': teacher_id,
+                'day_id': day_ids[shift_id],
+                'place_id': place_id,
+                'start_time': f'{start // 60:02d}:{start % 60:02d}',
+                'end_time': f'{end // 60:02d}:{end % 60:02d}',
+            })
+
+        return Response({
+            'school_id': school.id,
+            'applied': apply,
+            'assignments': assignments,
+            'assigned_count': len(assignments),
+            'unassigned_shift_ids': sorted(unassigned),
+            'teacher_minutes': {
+                teacher_id: minutes for teacher_id, minutes in solver.load.items() if minutes
+            },
+        })
+
+    def _run_sandbox(self, request, lock=False):
+        """
+        サンドボックスの共通処理
+
+        lock=True の場合は学校の行と固定シフトの行をロックして読み込む（トランザクション内で呼ぶ）。
+        戻り値は ((学校, 時間割, 読み込み時点の重複・違反, 手順ごとの評価), None) または (None, エラーの Response)
+        """
+        school_id = request.data.get('school_id')
+        edits = request.data.get('edits', [])
+
+        if not school_id:
+            return None, Response(
+                {'error': '学校IDが必要です'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_edits = getattr(settings, 'SANDBOX_MAX_EDITS', 200)
+        if not isinstance(edits, list) or len(edits) > max_edits:
+            return None, Response(
+                {'error': f'editsは{max_edits}件までのリスト形式で指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        school = get_object_or_404(School.objects.select_for_update() if lock else School, id=school_id)
+        if not request.user.is_owner or not request.user.schools.filter(id=school_id).exists():
+            return None, Response(
+                {'error': 'この学校にアクセスする権限がありません'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        timetable = Timetable.load(school, lock=lock)
+        initial_conflicts = timetable.conflicts()
+        try:
+            steps = simulate(timetable, edits)
+        except SandboxError as e:
+            return None, Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return (school, timetable, initial_conflicts, steps), None
+
+    @action(detail=False, methods=['post'])
+    def sandbox(self, request):
+        """
+        時間割のシミュレーション（データベースには書き込まない）
+
+        edits の編集（move / assign / unassign / swap / create / delete）を順に適用し、
+        手順ごとの重複・未割当・講師ごとの勤務時間と、最後の状態の差分を返す。
+        """
+        result, error = self._run_sandbox(request)
+        if error is not None:
+            return error
+        school, timetable, _, steps = result
+
+        return Response({
+            'school_id': school.id,
+            'base_version': timetable.base_version,
+            'steps': steps,
+            'diff': timetable.summary(),
+        })
+
+    @action(detail=False, methods=['post'])
+    def sandbox_commit(self, request):
+        """
+        シミュレーションの結果を保存
+
+        同じ edits を現在のデータに適用し直し、差分をまとめて保存する。
+        base_version（シミュレーションの結果の値）は必須で、その後に時間割が変更されていれば保存しない。
+        編集で新たに生じた重複・指導場所の違反がある場合（force が true の場合を除く）も保存しない。
+        """
+        base_version = request.data.get('base_version')
+        if not base_version:
+            return Response(
+                {'error': 'base_version が必要です（シミュレーションの結果の値を指定してください）'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            force = parse_bool(request.data.get('force', False))
+        except ValueError:
+            return Response(
+                {'error': 'force は true または false で指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # 読み込み・base_version と重複の確認・保存を1つのトランザクションで行い、
+        # 確認後に他のリクエストが変更した内容を上書きしないようにする
+        with transaction.atomic():
+            result, error = self._run_sandbox(request, lock=True)
+            if error is not None:
+                return error
+            school, timetable, initial_conflicts, steps = result
+
+            if base_version != timetable.base_version:
+                return Response(
+                    {'error': 'シミュレーション後に時間割が変更されました。もう一度シミュレーションしてください'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            # 読み込み時点からある重複・違反は、この編集では保存を妨げない
+            conflicts = new_conflicts(initial_conflicts, timetable.conflicts())
+            if conflicts and not force:
+                return Response(
+                    {'error': '編集で重複または指導場所の違反が生じるため保存できません', 'conflicts': conflicts},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            diff = timetable.summary()
+            statistics, created_ids = {'created': 0, 'updated': 0, 'deleted': 0}, {}
+            if diff['created'] or diff['updated'] or diff['deleted']:
+                statistics, created_ids = apply_sandbox(school, timetable)
+
+        return Response({
+            'school_id': school.id,
+            'statistics': statistics,
+            'created_ids': created_ids,
+            'diff': diff,
+        })
+
+
+# SSE接続のハートビート間隔（秒）
+EVENT_STREAM_HEARTBEAT = 15
+
+
+def _format_sse(event):
+    """SSE形式の1メッセージに整形"""
+    data = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+def _check_event_access(request, school_id):
+    """SSE接続のアクセス権限チェック"""
+    user = request.user
+    if not user.is_authenticated:
+        return 401
+    if not School.objects.filter(id=school_id).exists():
+        return 404
+    if not user.schools.filter(id=school_id).exists():
+        return 403
+    return None
+
+
+async def fixed_shift_events(request, school_id):
+    """
+    固定シフト変更イベントのSSEストリーム（ASGI用）
+
+    WSGI では終わらないストリームが最後までバッファされるため、ASGI サーバー
+    （uvicorn backend.asgi:application など）で起動している場合のみ配信する。
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'イベントの配信にはASGIサーバーでの起動が必要です'}, status=501)
+
+    error_status = await sync_to_async(_check_event_access)(request, school_id)
+    if error_status == 401:
+        return JsonResponse({'error': '認証が必要です'}, status=401)
+    if error_status == 404:
+        return JsonResponse({'error': '学校が見つかりません'}, status=404)
+    if error_status == 403:
+        return JsonResponse({'error': 'この学校にアクセスする権限がありません'}, status=403)
+
+    await sync_to_async(events.get_backend)()
+    subscription = events.hub.subscribe(school_id, asyncio.get_running_loop())
+
+    last_event_id = request.headers.get('Last-Event-ID')
+    missed = None
+    if last_event_id and last_event_id.isdigit():
+        missed = events.hub.replay(school_id, int(last_event_id))
+
+    async def stream():
+        # 購読してから補完するため、補完済みのIDまでのイベントは読み飛ばす
+        sent_id = 0
+        try:
+            yield 'retry: 3000\n\n'
+            if last_event_id and missed is None:
+                # 取りこぼしを補完できない場合は全件再取得を促す
+                yield 'event: resync\ndata: {}\n\n'
+            for event in missed or []:
+                sent_id = event['id']
+                yield _format_sse(event)
+
+            while True:
+                try:
+                    event = await subscription.get(EVENT_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    yield 'event: resync\ndata: {}\n\n'
+                if event['id'] <= sent_id:
+                    continue
+                yield _format_sse(event)
+        finally:
+            events.hub.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,109 @@
+# shift/workload.py
+
+"""
+勤務時間の集計
+
+固定シフト（1週間あたり）と日付指定シフト（月ごと）の時間を、講師・場所・学校ごとに
+values().annotate(Sum(...)) でデータベース上で集計する。
+
+シフトの長さは保存済みの duration_minutes 列を合計する（場所・期間の集計はインデックスのみで済む）。
+settings.WORKLOAD_STORED_DURATION = False の場合は開始・終了時間から DB 上で計算する。
+"""
+
+from django.conf import settings
+from django.db.models import Count, ExpressionWrapper, IntegerField, Sum
+from django.db.models.functions import ExtractHour, ExtractMinute, TruncMonth
+
+from .models import FixedShift, Shift
+
+
+# 集計単位ごとの出力列 -> 参照するフィールド（{prefix} は中間テーブルから辿る場合のシフトへのパス）
+GROUP_FIELDS = {
+    'teacher': {
+        'teacher_id': 'customuser_id',
+        'username': 'customuser__username',
+        'first_name': 'customuser__first_name',
+        'last_name': 'customuser__last_name',
+    },
+    'place': {
+        'place_id': '{prefix}place_id',
+        'place_name': '{prefix}place__name',
+        'school_id': '{prefix}place__school_id',
+    },
+    'school': {
+        'school_id': '{prefix}place__school_id',
+        'school_name': '{prefix}place__school__name',
+    },
+}
+
+
+def duration_expression(prefix=''):
+    """シフトの長さ（分）を DB 上で計算する式"""
+    start, end = f'{prefix}start_time', f'{prefix}end_time'
+    return ExpressionWrapper(
+        (ExtractHour(end) - ExtractHour(start)) * 60 + ExtractMinute(end) - ExtractMinute(start),
+        output_field=IntegerField()
+    )
+
+
+def minutes_sum(prefix=''):
+    if getattr(settings, 'WORKLOAD_STORED_DURATION', True):
+        return Sum(f'{prefix}duration_minutes')
+    return Sum(duration_expression(prefix))
+
+
+def _prefix(source, group_by):
+    """講師ごとの集計は中間テーブルから辿るため、シフトへのパスを前に付ける"""
+    if group_by == 'teacher':
+        return f"{'fixedshift' if source == 'fixed' else 'shift'}__"
+    return ''
+
+
+def workload_queryset(source, group_by, school_ids, start_date=None, end_date=None):
+    """
+    集計結果のクエリセット
+
+    source: 'fixed'（固定シフト、1週間あたり）または 'shift'（日付指定シフト、月ごと）
+    group_by: 'teacher' / 'place' / 'school'
+    講師ごとの集計は割り当てられているシフトのみ、日付指定シフトは空けるシフトを除く。
+    """
+    model = FixedShift if source == 'fixed' else Shift
+    prefix = _prefix(source, group_by)
+    queryset = model.teacher.through.objects.all() if prefix else model.objects.all()
+
+    queryset = queryset.filter(**{f'{prefix}place__school_id__in': school_ids})
+    fields = [path.format(prefix=prefix) for path in GROUP_FIELDS[group_by].values()]
+    months = {}
+    if source == 'shift':
+        queryset = queryset.filter(**{
+            f'{prefix}date__range': (start_date, end_date),
+            f'{prefix}is_empty': False,
+        })
+        months = {'month': TruncMonth(f'{prefix}date')}
+
+    return queryset.values(*fields, **months).annotate(
+        minutes=minutes_sum(prefix),
+        shift_count=Count(f'{prefix}id'),
+    ).order_by(*months, *fields)
+
+
+def workload_columns(source, group_by):
+    return [*(['month'] if source == 'shift' else []), *GROUP_FIELDS[group_by], 'minutes', 'hours', 'shift_count']
+
+
+def workload_rows(source, group_by, school_ids, start_date=None, end_date=None, chunk_size=2000):
+    """
+    集計行を出力用の列名・形式で返すジェネレーター（月は YYYY-MM、時間は小数第2位まで）
+
+    CSV のストリーミングでも使うため、結果は chunk_size 行ずつ読み込む。
+    """
+    prefix = _prefix(source, group_by)
+    paths = {alias: path.format(prefix=prefix) for alias, path in GROUP_FIELDS[group_by].items()}
+    queryset = workload_queryset(source, group_by, school_ids, start_date, end_date)
+    for row in queryset.iterator(chunk_size=chunk_size):
+        result = {'month': row['month'].strftime('%Y-%m')} if source == 'shift' else {}
+        for alias, path in paths.items():
+            result[alias] = row[path]
+        minutes = row['minutes'] or 0
+        result.update(minutes=minutes, hours=round(minutes / 60, 2), shift_count=row['shift_count'])
+        yield result
@@ -0,0 +1,192 @@
+# backend/singleflight.py
+
+"""
+同じ計算の同時実行をまとめる（シングルフライト）
+
+同じキーの計算が実行中であれば、後から来たスレッドは計算せずに先行する計算の結果を待って共有する。
+キャッシュの有効期間（SINGLEFLIGHT_CACHE_TIMEOUT）を指定した場合は結果をキャッシュにも保存する。
+期限の SINGLEFLIGHT_EARLY_RECOMPUTE 秒前からは、ロック（cache.add）を取得できた1つのリクエストだけが
+早めに再計算し、他のリクエストは保存済みの結果を返す（期限切れの瞬間に全員で再計算しないようにする）。
+
+キーには学校ごとのバージョン（caching.Namespace）を含め、学校のデータが変更されたら
+caching.invalidate_school() でまとめて無効化する。
+早めの再計算で同じキーを上書きするため、キーはプロセス内のキャッシュには置かない（local=False）。
+トランザクション内の計算は確定前の内容を含むため、共有・キャッシュしない（caching.in_transaction）。
+"""
+
+import functools
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+import caching
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'singleflight'
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _setting(name, default):
+    return getattr(settings, f'SINGLEFLIGHT_{name}', default)
+
+
+class _Call:
+    """実行中の計算（完了するまで待つスレッドが結果を受け取る）"""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    """キーごとに実行中の計算を1つにまとめる（同じプロセス内のスレッド間）"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """fn() の結果を返す。同じキーの計算が実行中ならその結果を待つ（戻り値は (結果, 共有したか)）"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+group = Group()
+
+
+namespace = caching.Namespace(KEY_PREFIX, local=False)
+
+
+def make_key(name, values, school_id=None):
+    """ビュー名・パラメーター（・学校のバージョン）からキャッシュキーを作成"""
+    if school_id:
+        return namespace.key(school_id, name, *values)
+    digest = hashlib.md5(repr(list(values)).encode()).hexdigest()
+    return f'{KEY_PREFIX}:{name}:{digest}'
+
+
+def _store(key, compute, timeout, early, cacheable):
+    value = compute()
+    if cacheable(value):
+        cache.set(key, (value, time.time() + max(timeout - early, 0)), timeout)
+    return value
+
+
+def _wait_for(key, lock_timeout):
+    """他のプロセスが計算中の結果を待つ（ロックの有効期間を過ぎたら None）"""
+    deadline = time.time() + lock_timeout
+    while time.time() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def fetch(key, compute, timeout=None, cacheable=lambda value: True):
+    """
+    同じキーの計算をまとめて結果を返す
+
+    timeout（秒）が 0 の場合は実行中の計算の共有のみ行い、キャッシュには保存しない。
+    cacheable(結果) が False の結果（エラーなど）はキャッシュに保存しない。
+    トランザクション内（atomic なバッチのサブリクエストなど）では共有もキャッシュもせずに計算する。
+    """
+    if caching.in_transaction():
+        return compute()
+    timeout = _setting('CACHE_TIMEOUT', 30) if timeout is None else timeout
+    if not timeout:
+        return group.do(key, compute)[0]
+
+    early = _setting('EARLY_RECOMPUTE', 5)
+    lock_timeout = _setting('LOCK_TIMEOUT', 10)
+    lock_key = f'{key}:lock'
+    store = functools.partial(_store, key, compute, timeout, early, cacheable)
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, refresh_at = entry
+        # 再計算の時期でない、または他のリクエストが再計算中の場合は保存済みの結果を返す
+        if time.time() < refresh_at or not cache.add(lock_key, 1, lock_timeout):
+            return value
+        try:
+            return group.do(key, store)[0]
+        except Exception:
+            logger.exception('Early recompute failed: %s', key)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    def compute_once():
+        # 他のプロセスが計算中なら結果が保存されるのを待つ
+        if not cache.add(lock_key, 1, lock_timeout):
+            entry = _wait_for(key, lock_timeout)
+            if entry is not None:
+                return entry[0]
+        try:
+            return store()
+        finally:
+            cache.delete(lock_key)
+
+    return group.do(key, compute_once)[0]
+
+
+def coalesce(params, authorize=None, timeout=None):
+    """
+    DRF のアクションの結果を、同じビュー・同じパラメーターのリクエストで共有するデコレーター
+
+    params: キーに含めるクエリパラメーター（school_id を含めると学校ごとのバージョンもキーに含める）
+    authorize(request): False のリクエストは共有せずにそのままビューを実行する（権限エラーはビューが返す）
+    共有するのは Response のデータとステータスのみで、キャッシュに保存するのはステータス 200 の結果のみ。
+    """
+    def decorator(method):
+        name = f'{method.__module__}.{method.__qualname__}'
+
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method != 'GET' or (authorize is not None and not authorize(request)):
+                return method(view, request, *args, **kwargs)
+
+            values = [request.query_params.get(param, '') for param in params]
+            school_id = request.query_params.get('school_id') if 'school_id' in params else None
+
+            def compute():
+                response = method(view, request, *args, **kwargs)
+                return response.data, response.status_code
+
+            data, status_code = fetch(
+                make_key(name, values, school_id), compute, timeout,
+                cacheable=lambda value: value[1] == 200
+            )
+            return Response(data, status=status_code)
+
+        return wrapper
+    return decorator